@@ -1,11 +1,14 @@
 # rag_groq_chatbot.py
 import streamlit as st
-import PyPDF2
-from io import BytesIO
-from sentence_transformers import SentenceTransformer
-import numpy as np
-import faiss
-import requests
+import embeddings
+from conversation import ConversationMemory
+from groq_client import get_client
+from index_store import IndexStore
+import knowledge_base
+from knowledge_base import KnowledgeBaseRegistry, format_citation
+import retrieval
+import session_store
+import vector_index
 
 # ---- Streamlit Config ----
 st.set_page_config(page_title="CareerCraft AI - RAG Chatbot", layout="wide")
@@ -20,98 +23,254 @@ st.markdown("""
 
 # ---- Groq Setup ----
 GROQ_API_KEY = st.secrets.get("GROQ_API_KEY", None) or "your_api_key_here"
-GROQ_LLM_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
+
+# ---- Embedding model: loaded once per process, shared across sessions ----
+EMBED_MODEL = embeddings.DEFAULT_MODEL
+embeddings.warm_up([EMBED_MODEL])
+
+@st.cache_resource
+def get_index_store():
+    return IndexStore()
+
+@st.cache_resource
+def get_kb_registry():
+    registry = KnowledgeBaseRegistry(store=get_index_store())
+    prune_kbs(registry)
+    return registry
+
+def prune_kbs(registry):
+    # Drop committed knowledge bases that no session points to any more; every
+    # settings change or upload commits a new one, so this repeats on commit.
+    registry.maybe_prune(lambda: set(session_store.get_store().handle_values("kb")))
+
+# Settings for a session's first knowledge base. Vectors default to fp16 codes
+# memory-mapped from the index store, so sessions share one copy of each PDF's vectors.
+KB_PARAMS = dict(model_name=EMBED_MODEL, codec=knowledge_base.CODEC, shared=knowledge_base.SHARED)
 
 # ---- Helpers ----
-def extract_text_from_pdf(file_bytes):
-    reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-    text = [p.extract_text() or "" for p in reader.pages]
-    return "\n".join(text)
-
-def embed_texts(texts, model):
-    return model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
-
-def build_faiss_index(embs):
-    dim = embs.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(embs)
-    return index
-
-def search_index(query, chunks, model, index, embs, k=3):
-    q_emb = embed_texts([query], model)
-    D, I = index.search(q_emb, k)
-    return [chunks[i] for i in I[0]]
-
-def call_groq(prompt):
+def call_groq(prompt, on_text=None, stats=None):
+    """Stream the answer from Groq, passing the text so far to on_text; returns the full text."""
     try:
-        headers = {"Authorization": f"Bearer {GROQ_API_KEY}"}
-        payload = {
-            "model": "llama-3.1-8b-instant",  # Groq recommended fast LLM
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.2,
-            "max_tokens": 300
-        }
-        r = requests.post(GROQ_LLM_ENDPOINT, headers=headers, json=payload, timeout=60)
-        r.raise_for_status()
-        data = r.json()
-        return data["choices"][0]["message"]["content"].strip()
+        parts = []
+        for piece in get_client(GROQ_API_KEY).stream_chat(
+            prompt,
+            model="llama-3.1-8b-instant",  # Groq recommended fast LLM
+            temperature=0.2,
+            max_tokens=300,
+            deadline=60,
+            stats=stats,
+        ):
+            parts.append(piece)
+            if on_text:
+                on_text("".join(parts))
+        return "".join(parts).strip()
     except Exception as e:
         st.markdown(f'<div class="error-box">⚠️ Error: {e}</div>', unsafe_allow_html=True)
         return None
 
+def reformulate(question, n=2):
+    """n rewordings of the question to widen retrieval; [] if Groq is unavailable."""
+    prompt = (f"Rewrite this question {n} different ways for searching a document. "
+              f"One per line, no numbering.\n\nQuestion: {question}")
+    try:
+        text = get_client(GROQ_API_KEY).chat(prompt, model="llama-3.1-8b-instant", temperature=0.2,
+                                              max_tokens=120, deadline=15)
+    except Exception:
+        return []
+    lines = [l.strip(" -*0123456789.").strip() for l in text.splitlines()]
+    return [l for l in lines if l][:n]
+
+def summarize_history(summary, messages):
+    """Rolling summary for ConversationMemory. Raises on Groq errors; ConversationMemory.add
+    catches them and falls back to an extractive summary."""
+    convo = "\n".join(f"{m['role']}: {m['text']}" for m in messages)
+    prompt = ("Update the running summary of a chat between a student and a career assistant. "
+              "Keep facts the student shared and topics discussed, under 120 words.\n\n"
+              f"Summary so far:\n{summary or '(none)'}\n\nNew messages:\n{convo}\n\nUpdated summary:")
+    return get_client(GROQ_API_KEY).chat(prompt, model="llama-3.1-8b-instant", temperature=0,
+                                         max_tokens=200, deadline=20).strip()
+
+def render_message(m):
+    if m["role"] == "user":
+        st.markdown(f'<div class="chat-user"><b>You:</b> {m["text"]}</div>', unsafe_allow_html=True)
+    else:
+        text = m["text"] + ("\n\n📎 Sources: " + "; ".join(m["sources"]) if m["sources"] else "")
+        st.markdown(f'<div class="chat-bot"><b>CareerCraft Bot:</b> {text}</div>', unsafe_allow_html=True)
+
 # ---- App Logic ----
 st.title("💬 CareerCraft AI — RAG Chatbot")
 
-if "convo" not in st.session_state:
-    st.session_state.convo = []
-if "chunks" not in st.session_state:
-    st.session_state.chunks, st.session_state.embs, st.session_state.index = [], None, None
-
-uploaded = st.file_uploader("📄 Upload PDF (Knowledge Base)", type=["pdf"], accept_multiple_files=False)
-if uploaded and st.button("Process PDF"):
-    with st.spinner("Processing PDF..."):
-        text = extract_text_from_pdf(uploaded.read())
-        chunks = [text[i:i+500] for i in range(0, len(text), 500)]
-        model = SentenceTransformer("all-MiniLM-L6-v2")
-        embs = embed_texts(chunks, model)
-        index = build_faiss_index(embs)
-
-        st.session_state.chunks = chunks
-        st.session_state.embs = embs
-        st.session_state.index = index
-    st.success("✅ PDF indexed. Ask questions now!")
+# The session holds handles only: the knowledge base's signature (sessions with
+# the same PDFs and settings share one loaded copy) and the chat state, both in
+# the session store, so they also survive a restart.
+sess = session_store.streamlit_session(st)
+registry = get_kb_registry()
+chat = sess.get("chat")
+memory = (ConversationMemory.from_dict(chat, summarize=summarize_history) if chat
+          else ConversationMemory(summarize=summarize_history))
+kb = registry.checkout(sess.get("kb"))
+if kb is None:
+    # Never committed, or its files are gone: start over instead of retrying every rerun.
+    sess.delete("kb")
+    kb = registry.fork(None, **KB_PARAMS)
+
+def edit_kb():
+    """A private copy of the knowledge base; publish it with commit_kb once edited."""
+    return registry.fork(sess.get("kb"), **KB_PARAMS)
+
+def commit_kb(new_kb):
+    sess.put("kb", registry.commit(new_kb))
+    prune_kbs(registry)
+    return new_kb
+
+uploaded = st.file_uploader("📄 Upload PDFs (Knowledge Base)", type=["pdf"], accept_multiple_files=True)
+if uploaded and st.button("Process PDFs"):
+    new_kb = edit_kb()
+    before = len(new_kb.docs)
+    progress = st.progress(0.0, text="Processing PDFs...")
+    for n, f in enumerate(uploaded):
+        # Pages are chunked as they are extracted, so long PDFs show progress page by page.
+        on_page = lambda done, total, n=n, name=f.name: progress.progress(
+            (n + done / total) / len(uploaded), text=f"📄 {name}: page {done}/{total}")
+        if new_kb.add_document(f.getvalue(), f.name, on_page=on_page) is None:
+            st.warning(f"⚠️ No text found in {f.name}.")
+    with st.spinner("Saving knowledge base..."):
+        added = len(new_kb.docs) - before
+        kb = commit_kb(new_kb)
+    progress.empty()
+    st.success(f"✅ {added} new PDF(s) indexed ({len(kb.docs)} in knowledge base). Ask questions now!")
+
+# ---- Knowledge base contents ----
+with st.sidebar.expander(f"📚 Knowledge Base ({len(kb.docs)} docs, {kb.ntotal} chunks)"):
+    for doc_id, doc in list(kb.docs.items()):
+        c1, c2 = st.columns([4, 1])
+        c1.write(f"{doc['name']} ({doc['pages']} pages)")
+        if c2.button("🗑", key=f"rm_{doc_id}"):
+            new_kb = edit_kb()
+            new_kb.remove_document(doc_id)
+            commit_kb(new_kb)
+            st.rerun()
+
+# ---- Index backend ----
+with st.sidebar.expander("🧭 Index Settings"):
+    shared = st.checkbox("Share vectors across sessions (memory-mapped)", value=kb.shared,
+                         help="One on-disk copy of each PDF's vectors serves every session; "
+                              "otherwise this session builds its own FAISS index")
+    codec = st.selectbox("Vector precision", vector_index.CODECS, index=vector_index.CODECS.index(kb.codec),
+                         help="fp16 halves memory at no measurable recall cost; sq8 quarters it "
+                              "at a small recall cost")
+    kinds = ["auto", *vector_index.KINDS]
+    kind = st.selectbox("Index type", kinds, index=kinds.index(kb.index_kind), disabled=shared,
+                        help="auto = exact search for small corpora, IVF / IVF-PQ as it grows")
+    # Query-time settings: kept per session, the shared knowledge base is not touched.
+    search = sess.get("search") or {"nprobe": vector_index.DEFAULT_NPROBE,
+                                    "ef_search": vector_index.DEFAULT_EF_SEARCH}
+    nprobe = st.slider("nprobe (IVF)", 1, 256, search["nprobe"], disabled=shared)
+    ef_search = st.slider("efSearch (HNSW)", 8, 512, search["ef_search"], disabled=shared)
+    if (nprobe, ef_search) != (search["nprobe"], search["ef_search"]):
+        sess.put("search", {"nprobe": nprobe, "ef_search": ef_search})
+    wanted = (kind, codec, shared)
+    # A failed build is reported once, not retried on every rerun while the widgets still hold it.
+    if wanted != (kb.index_kind, kb.codec, kb.shared) and wanted != st.session_state.get("failed_index_settings"):
+        with st.spinner("Applying index settings..."):
+            new_kb = edit_kb()
+            try:
+                new_kb.rebuild_index(kind, codec, shared)
+            except (RuntimeError, ValueError, OSError) as e:
+                st.session_state.failed_index_settings = wanted
+                st.error(f"Could not build a {kind} / {codec} index: {e}")
+            else:
+                kb = commit_kb(new_kb)
+    vb = kb.vector_bytes()
+    st.caption(f"Active backend: {kb.kind or '—'} ({kb.storage}) · "
+               f"{vb['private'] / 1e6:.1f} MB private, {vb['shared'] / 1e6:.1f} MB shared")
+
+# ---- Retrieval ----
+with st.sidebar.expander("🔎 Retrieval"):
+    retrieval_mode = st.selectbox("Search mode", retrieval.MODES, index=retrieval.MODES.index("hybrid"),
+                                  help="hybrid fuses keyword (BM25) and semantic results, so exact tool "
+                                       "names, certifications and acronyms are not missed")
+    rerank_method = st.selectbox("Re-ranking", retrieval.RERANKERS, index=retrieval.RERANKERS.index("mmr"),
+                                 help="MMR favours relevant but non-overlapping passages; "
+                                      "the cross-encoder scores each passage against the question")
+    expand_query = st.checkbox("Search with reworded questions too", value=False,
+                               help="Asks the LLM for rewordings and retrieves for all of them in one batch")
 
 st.markdown("---")
 
-for role, msg in st.session_state.convo:
-    if role == "user":
-        st.markdown(f'<div class="chat-user"><b>You:</b> {msg}</div>', unsafe_allow_html=True)
-    else:
-        st.markdown(f'<div class="chat-bot"><b>CareerCraft Bot:</b> {msg}</div>', unsafe_allow_html=True)
+# ---- Latency metrics ----
+with st.sidebar.expander("⏱️ Performance"):
+    m = embeddings.stats()
+    load_s = m["load_seconds"].get(EMBED_MODEL)
+    st.write(f"Model `{EMBED_MODEL}`: " + (f"loaded once in {load_s:.2f}s" if load_s is not None else "warming up..."))
+    st.write(f"Encode calls: {m['encode_calls']} (avg {m['avg_encode_seconds'] * 1000:.1f} ms)")
+    t = st.session_state.get("last_timings")
+    if t:
+        parts = [f"{name} {t[key]:.1f} ms" for name, key in
+                 (("encode", "encode_ms"), ("search", "search_ms"), ("BM25", "sparse_ms"), ("rerank", "rerank_ms"))
+                 if key in t]
+        st.write(f"Last question: {' + '.join(parts)} ({t['candidates']} candidates)")
+    g = st.session_state.get("last_stream")
+    if g and g.get("ttft_s") is not None:
+        rate = f", {g['tokens_per_s']:.0f} tok/s" if g.get("tokens_per_s") else ""
+        cached = " (cached)" if g.get("cached") else ""
+        st.write(f"LLM: first token {g['ttft_s'] * 1000:.0f} ms, total {g['total_s']:.1f}s{rate}{cached}")
+    p = st.session_state.get("last_prompt")
+    if p:
+        st.write(f"Prompt: {p['tokens']}/{p['budget']} tokens, {p['passages']} passages, "
+                 f"{p['turns']} recent messages" + (" + summary" if p["summary"] else ""))
+    cache = get_client(GROQ_API_KEY).cache
+    if cache is not None:
+        c = cache.stats()
+        st.write(f"LLM cache: {c['hit_rate']:.0%} hit rate, {c['entries']} entries")
+
+with st.sidebar.expander("🧠 Session memory"):
+    session_store.render_report(st, sess)
+    session_store.render_resume(st)
+    r = registry.stats()
+    st.caption(f"Knowledge bases: {r['loaded']} loaded for all sessions ({r['committed']} on disk), "
+               f"{r['private_bytes'] / 1e6:.1f} MB of private indexes")
+
+# Only the recent window is kept and drawn; older turns live on in the summary.
+if memory.summary:
+    with st.expander(f"🗂️ Earlier in this chat ({memory.total - len(memory.messages)} messages)"):
+        st.write(memory.summary)
+for m in memory.messages:
+    render_message(m)
 
 user_q = st.text_input("💡 Ask a question:")
 
 if st.button("Ask") and user_q.strip():
-    if not st.session_state.index:
+    if not kb.ntotal:
         st.warning("⚠️ Please upload and process a PDF first.")
     else:
-        model = SentenceTransformer("all-MiniLM-L6-v2")
-        context = search_index(user_q, st.session_state.chunks, model, st.session_state.index, st.session_state.embs)
-        context_text = "\n".join(context)
-
-        prompt = f"""You are CareerCraft AI assistant.
-Use the following context to answer the user's question.
-
-Context:
-{context_text}
-
-Question: {user_q}
-Answer clearly for a student/job seeker:"""
+        # Follow-ups are also searched together with the previous question.
+        queries = memory.retrieval_queries(user_q)
+        if expand_query:
+            queries += reformulate(user_q)
+        timings = {}
+        hits = retrieval.retrieve(kb.with_search_params(nprobe, ef_search), queries, k=4,
+                                  method=rerank_method, mode=retrieval_mode, timings=timings)
+        st.session_state.last_timings = timings
+        passages = [f"[{format_citation(h)}] {h['text']}" for h in hits]
+        prompt, prompt_stats = memory.build_prompt(user_q, passages, reserve=300)
+        st.session_state.last_prompt = prompt_stats
+        sources = sorted({format_citation(h) for h in hits[:prompt_stats["passages"]]})
 
-        answer = call_groq(prompt)
+        # New messages are drawn in place instead of rerunning the whole page.
+        render_message({"role": "user", "text": user_q})
+        placeholder = st.empty()
+        show = lambda text: placeholder.markdown(
+            f'<div class="chat-bot"><b>CareerCraft Bot:</b> {text}▌</div>', unsafe_allow_html=True)
+        stream_stats = {}
+        answer = call_groq(prompt, on_text=show, stats=stream_stats)
+        st.session_state.last_stream = stream_stats
         if not answer:  # Fallback if Groq fails
-            answer = "Fallback Answer:\n" + context_text[:300]
+            answer = "Fallback Answer:\n" + "\n".join(passages)[:300]
+        bot = {"role": "bot", "text": answer, "sources": sources}
+        with placeholder.container():
+            render_message(bot)
 
-        st.session_state.convo.append(("user", user_q))
-        st.session_state.convo.append(("bot", answer))
-        st.rerun()
+        memory.add("user", user_q)
+        memory.add("bot", answer, sources)
+        sess.put("chat", memory.to_dict())
@@ -1,22 +1,15 @@
 import streamlit as st
-import pandas as pd
-from web_scraper import get_latest_skills
+from web_scraper import get_domains, get_latest_skills, get_skill_aliases
 from utils import extract_text_from_pdf
-from rapidfuzz import fuzz
+from skill_matcher import ats_score, get_matcher
 import datetime
 
 # --- Skill Matching Logic ---
-def fuzzy_match(skill, text, threshold=80):
-    return fuzz.partial_ratio(skill.lower(), text.lower()) >= threshold
-
 def match_resume_with_skills(text, skill_list, threshold=80):
-    matched = [s for s in skill_list if fuzzy_match(s, text, threshold)]
-    missing = [s for s in skill_list if s not in matched]
-    return matched, missing
+    return get_matcher(skill_list, get_skill_aliases(skill_list)).match(text, threshold)
 
 def calculate_score(matched, total_skills):
-    total = len(total_skills)
-    return round((len(matched) / total) * 100, 2) if total > 0 else 0
+    return ats_score(matched, total_skills)
 
 # --- Page Setup ---
 st.set_page_config("Live Resume Skill Analyzer", layout="wide")
@@ -48,9 +41,7 @@ st.markdown("---")
 
 # --- Sidebar ---
 st.sidebar.title("⚙️ Settings")
-domain = st.sidebar.selectbox("Choose Domain", [
-    "Web Development", "Data Science", "Machine Learning", "Android Development", "DevOps", "Software Engineering"
-])
+domain = st.sidebar.selectbox("Choose Domain", get_domains())
 threshold = st.sidebar.slider("Skill Match Sensitivity (%)", 60, 100, 80, step=5)
 show_tips = st.sidebar.checkbox("💡 Show Resume Improvement Tips", value=True)
 
@@ -99,6 +90,7 @@ if uploaded_resume:
             st.markdown(f"- Add relevant experience with **{s}** if possible.")
 
     # --- Download Report ---
+    import pandas as pd   # only needed once there is a report to export
     df = pd.DataFrame([{
         "Filename": uploaded_resume.name,
         "Domain": domain,
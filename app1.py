@@ -1,6 +1,10 @@
 import streamlit as st
 import os
-import requests
+from ats_scorer import LATENCY_BUDGET_MS, jd_keywords, score_resume
+from groq_client import get_client
+from pdf_extract import extract_text
+import question_bank
+from web_scraper import get_domains, get_latest_skills
 
 # ------------------- PAGE CONFIG -------------------
 st.set_page_config(
@@ -53,7 +57,6 @@ st.markdown("""
 # ------------------- LLM (Groq) -------------------
 
 GROQ_API_KEY = "***********************************************"
-GROQ_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
 
 
 
@@ -61,44 +64,45 @@ def get_llm_response(prompt):
     if not GROQ_API_KEY:
         return "⚠️ Please set your GROQ_API_KEY."
     try:
-        headers = {"Authorization": f"Bearer {GROQ_API_KEY}", "Content-Type": "application/json"}
-        payload = {
-            "model": "llama-3.3-70b-versatile",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 300,
-            "temperature": 0.7
-        }
-        response = requests.post(GROQ_ENDPOINT, headers=headers, json=payload, timeout=30)
-        return response.json()['choices'][0]['message']['content']
+        return get_client(GROQ_API_KEY).chat(
+            prompt, model="llama-3.3-70b-versatile", max_tokens=300, temperature=0.7, deadline=30
+        )
     except Exception as e:
         return f"❌ Error: {e}"
 
 
-import requests
-import os
+def stream_llm_response(prompt, stats=None):
+    """Like get_llm_response, but yields the reply as it is generated."""
+    if not GROQ_API_KEY:
+        yield "⚠️ Please set your GROQ_API_KEY."
+        return
+    try:
+        yield from get_client(GROQ_API_KEY).stream_chat(
+            prompt, model="llama-3.3-70b-versatile", max_tokens=300, temperature=0.7, deadline=30, stats=stats
+        )
+    except Exception as e:
+        yield f"❌ Error: {e}"
+
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
 def ask_groq(prompt):
     try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers={"Authorization": f"Bearer {GROQ_API_KEY}"},
-            json={"model": "llama3-8b-8192", "messages": [{"role": "user", "content": prompt}]},
-            timeout=30
-        )
-        data = response.json()
-
-        # ✅ Check if 'choices' exists before accessing
-        if "choices" in data and len(data["choices"]) > 0:
-            return data["choices"][0]["message"]["content"]
-        else:
-            return f"⚠️ API returned unexpected response: {data}"
+        return get_client(GROQ_API_KEY).chat(prompt, model="llama3-8b-8192", deadline=30)
     except Exception as e:
         return f"❌ Error: {str(e)}"
 
 
 
+# ------------------- JOB INDEX -------------------
+@st.cache_resource(show_spinner="📚 Indexing job descriptions...")
+def get_job_matcher():
+    # Embedded once per corpus version; later starts load the index from disk.
+    # Imported here so the other features never load FAISS.
+    from index_store import IndexStore
+    from job_matcher import JobMatcher
+    return JobMatcher.build(store=IndexStore())
+
 
 # ------------------- SIDEBAR -------------------
 st.sidebar.title("🧭 CareerCraft AI ")
@@ -111,32 +115,76 @@ page = st.sidebar.radio(
 if page == "📄 ATS Resume Optimizer":
     st.markdown("<p class='big-title'>📄 ATS Resume Optimizer</p>", unsafe_allow_html=True)
     uploaded_file = st.file_uploader("📂 Upload Resume (PDF/DOCX)", type=["pdf", "docx"])
-    if uploaded_file:
+    target = st.radio("Score against", ["Domain skills", "Job description"], horizontal=True)
+    if target == "Domain skills":
+        keywords = get_latest_skills(st.selectbox("Domain", get_domains()))
+    else:
+        jd = st.text_area("Paste the job description", height=150)
+        keywords = jd_keywords(jd) if jd.strip() else []
+
+    if uploaded_file and not keywords:
+        st.info("Paste a job description to score against.")
+    elif uploaded_file:
+        try:
+            result = score_resume(uploaded_file.name, uploaded_file.getvalue(), keywords)
+        except Exception as e:
+            # Corrupt or encrypted PDFs, or a .docx that is not really one.
+            st.error(f"Error reading {uploaded_file.name}: {e}")
+            st.stop()
         st.success("✅ Resume uploaded successfully!")
         st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<div class='metric'><h2>85%</h2><p>ATS Score</p></div>", unsafe_allow_html=True)
+        col1, col2, col3 = st.columns(3)
+        col1.markdown(f"<div class='metric'><h2>{result['score']:.0f}%</h2><p>ATS Score</p></div>",
+                      unsafe_allow_html=True)
+        col2.markdown(f"<div class='metric'><h2>{result['keyword_coverage']:.0f}%</h2><p>Keyword Coverage</p></div>",
+                      unsafe_allow_html=True)
+        col3.markdown(f"<div class='metric'><h2>{len(result['sections'])}</h2><p>Sections Detected</p></div>",
+                      unsafe_allow_html=True)
+        st.markdown("**Sections:** " + (", ".join(s.title() for s in result["sections"]) or "none detected"))
+        if result["matched"]:
+            st.markdown("**✅ Keywords found:** " + ", ".join(result["matched"]))
+        if result["missing"]:
+            st.markdown("**⚠️ Keywords missing:** " + ", ".join(result["missing"]))
         st.markdown("**Suggestions to improve:**")
-        st.markdown("""
-        - Add **job-specific keywords**.  
-        - Highlight **quantifiable achievements** (e.g., *boosted accuracy by 20%*).  
-        - Optimize **Skills** & **Experience** for the target job.  
-        """)
+        st.markdown("\n".join(f"- {tip}" for tip in result["suggestions"]) or "- Looks good! 🎯")
         st.markdown("</div>", unsafe_allow_html=True)
+        source = "cached result" if result["cached"] else \
+            " · ".join(f"{k[:-3]} {v:.0f} ms" for k, v in result["timings"].items())
+        st.caption(f"⏱️ {result['total_ms']:.0f} ms ({source}); budget {LATENCY_BUDGET_MS:.0f} ms")
+        if not result["within_budget"]:
+            st.warning("⚠️ Scoring took longer than the latency budget.")
 
 # ------------------- PAGE 2: Job Matcher -------------------
 elif page == "💼 Job Matcher":
     st.markdown("<p class='big-title'>💼 Smart Job Matcher</p>", unsafe_allow_html=True)
-    jobs = [
-        {"role": "Data Scientist Intern", "company": "TechCorp", "match": 92},
-        {"role": "NLP Engineer", "company": "OpenAI", "match": 85},
-        {"role": "AI Research Assistant", "company": "DeepMind", "match": 78},
-    ]
-    for job in jobs:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.subheader(f"🔹 {job['role']} @ {job['company']}")
-        st.progress(job['match']/100)
-        st.write(f"✅ Match Score: **{job['match']}%**")
-        st.markdown("</div>", unsafe_allow_html=True)
+    resume_file = st.file_uploader("📂 Upload Resume (PDF/TXT)", type=["pdf", "txt"], key="job_resume")
+    resume_text = st.text_area("...or paste your resume", height=150)
+    top_k = st.slider("Jobs to show", 3, 20, 5)
+    if resume_file:
+        data = resume_file.getvalue()
+        resume_text = extract_text(data) if resume_file.name.lower().endswith(".pdf") else data.decode("utf-8", "replace")
+
+    if resume_text.strip():
+        matcher = get_job_matcher()
+        timings = {}
+        jobs = matcher.match(resume_text, k=top_k, timings=timings)
+        st.caption(f"⚡ Matched against {len(matcher)} jobs in {timings['total_ms']:.0f} ms "
+                   f"(embed {timings['encode_ms']:.0f} ms · search + rerank {timings['search_ms']:.1f} ms)")
+        for job in jobs:
+            match = round(job["score"] * 100)
+            st.markdown("<div class='card'>", unsafe_allow_html=True)
+            company = f" @ {job['company']}" if job["company"] else ""
+            st.subheader(f"🔹 {job['title']}{company}")
+            st.progress(min(match, 100) / 100)
+            st.write(f"✅ Match Score: **{match}%** · similarity {job['similarity']:.2f} · "
+                     f"skill overlap {job['skill_overlap']:.0%}")
+            if job["matched_skills"]:
+                st.write("🧩 Your matching skills: " + ", ".join(job["matched_skills"]))
+            if job["missing_skills"]:
+                st.write("📌 Skills to add: " + ", ".join(job["missing_skills"]))
+            st.markdown("</div>", unsafe_allow_html=True)
+    else:
+        st.info("Upload or paste your resume to find matching jobs.")
 
 # ------------------- PAGE 3: AI Interview Prep -------------------
 elif page == "🎤 AI Interview Prep":
@@ -144,12 +192,26 @@ elif page == "🎤 AI Interview Prep":
     role = st.text_input("Enter Job Role", placeholder="e.g., Data Scientist")
     if st.button("🚀 Generate AI Questions"):
         if role:
-            prompt = (f"Generate 5 interview questions for a {role} role. "
-                      "Mix HR, behavioral, scenario-based, and technical questions.")
-            st.info("⏳ Fetching interview questions from LLaMA-3 (Groq API)...")
-            result = get_llm_response(prompt)
             st.subheader("🤖 AI-Generated Questions:")
-            st.write(result)
+            try:
+                # Pre-generated bank first; one LLM call fills it if the role is new.
+                qs, info = question_bank.get_questions(role, counts={"Technical": 2, "Scenario": 1, "Behavioral": 1,
+                                                                     "HR": 1}, client=get_client(GROQ_API_KEY))
+            except Exception:
+                qs = None
+            if qs:
+                for n, (cat, q) in enumerate(((c, q) for c, items in qs.items() for q in items), start=1):
+                    st.markdown(f"{n}. **{cat}:** {q}")
+                st.caption(f"⚡ {'From the question bank' if info['source'] == 'bank' else 'New role added to the question bank'}"
+                           f" in {info['ms']:.0f} ms")
+            else:
+                prompt = (f"Generate 5 interview questions for a {role} role. "
+                          "Mix HR, behavioral, scenario-based, and technical questions.")
+                stream_stats = {}
+                st.write_stream(stream_llm_response(prompt, stream_stats))
+                if stream_stats.get("ttft_s") is not None:
+                    st.caption(f"⚡ First token in {stream_stats['ttft_s'] * 1000:.0f} ms · "
+                               f"total {stream_stats['total_s']:.1f}s")
         else:
             st.warning("⚠️ Please enter a job role first.")
 
@@ -1,26 +1,25 @@
 import streamlit as st
-import requests, os
-from PyPDF2 import PdfReader
+from groq_client import get_client
+from page_utils import groq_api_key
+from pdf_extract import extract_text
+import question_bank
 
 # --- CONFIG ---
 st.set_page_config(page_title="AI Interview Prep", page_icon="🤖", layout="wide")
 
 # --- GET API KEY ---
-GROQ_API_KEY = st.secrets.get("GROQ_API_KEY", os.getenv("GROQ_API_KEY"))
+GROQ_API_KEY = groq_api_key()
 if not GROQ_API_KEY:
     st.error("❌ Missing API key. Please add GROQ_API_KEY to .streamlit/secrets.toml.")
     st.stop()
 
 # --- HELPER: Extract text from PDF ---
 def extract_text_from_pdf(file):
-    reader = PdfReader(file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text.strip()
+    return extract_text(file)
 
 # --- HELPER: Generate questions using Groq ---
-def generate_questions(job_role, resume_text):
+def generate_questions(job_role, resume_text, stats=None):
+    """Yields the questions as Groq streams them."""
     prompt = f"""
     You are an experienced technical interviewer. 
     Based on the following job role and resume, generate **6 interview questions**:
@@ -31,22 +30,16 @@ def generate_questions(job_role, resume_text):
     Resume Summary: {resume_text[:1500]}  # limited for context
     """
     try:
-        r = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers={"Authorization": f"Bearer {GROQ_API_KEY}"},
-            json={
-                "model": "llama-3.3-70b-versatile",
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7
-            },
-            timeout=30
+        yield from get_client(GROQ_API_KEY).stream_chat(
+            prompt, model="llama-3.3-70b-versatile", temperature=0.7, deadline=30, stats=stats
         )
-        data = r.json()
-        if "choices" in data:
-            return data["choices"][0]["message"]["content"]
-        return f"⚠️ API Error: {data}"
     except Exception as e:
-        return f"⚠️ Request failed: {e}"
+        yield f"⚠️ Request failed: {e}"
+
+def bank_questions(job_role, resume_text):
+    """(questions, info) from the pre-generated bank; fills the bank with one LLM call for a new role."""
+    return question_bank.get_questions(job_role, resume_text, {"Technical": 2, "Behavioral": 2, "Scenario": 2},
+                                       client=get_client(GROQ_API_KEY))
 
 # --- UI ---
 st.title("🤖 AI Interview Preparation")
@@ -62,10 +55,24 @@ with col2:
 if uploaded_file and job_role:
     resume_text = extract_text_from_pdf(uploaded_file)
     if st.button("Generate Interview Questions"):
-        with st.spinner("🔎 Analyzing resume and job role... Generating questions..."):
-            questions = generate_questions(job_role, resume_text)
         st.subheader("📋 AI-Generated Interview Questions")
-        st.write(questions)
+        try:
+            with st.spinner("Picking questions..."):
+                qs, info = bank_questions(job_role, resume_text)
+        except Exception:
+            qs = None
+        if qs:
+            for cat, items in qs.items():
+                st.markdown(f"**{cat}**\n" + "\n".join(f"- {q}" for q in items))
+            st.caption(f"⚡ {'From the question bank' if info['source'] == 'bank' else 'New role added to the question bank'}"
+                       f" in {info['ms']:.0f} ms")
+        else:
+            # Bank unavailable: generate directly, streamed.
+            stream_stats = {}
+            st.write_stream(generate_questions(job_role, resume_text, stream_stats))
+            if stream_stats.get("ttft_s") is not None:
+                st.caption(f"⚡ First token in {stream_stats['ttft_s'] * 1000:.0f} ms · "
+                           f"total {stream_stats['total_s']:.1f}s")
 else:
     st.info("ℹ️ Please upload a resume and enter a job role to proceed.")
 
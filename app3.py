@@ -1,8 +1,10 @@
 import streamlit as st
-import requests, json, base64, os
-import pandas as pd
-from io import StringIO
-import PyPDF2
+import time
+import question_bank
+import session_store
+from groq_client import GroqError, get_client, map_concurrent
+from page_utils import groq_api_key, read_resume, render_parse_stats
+from structured_output import StructuredOutputError, structured_chat, validate_evaluation
 
 # Optional audio recorder
 try:
@@ -13,52 +15,25 @@ except:
 
 st.set_page_config(page_title="CareerCraft AI - Groq Interview Coach", layout="centered")
 
-# --- Helper functions ---
-def extract_text_from_pdf(file):
-    text = ""
-    reader = PyPDF2.PdfReader(file)
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text
-
-def load_text_file(file):
-    return StringIO(file.getvalue().decode("utf-8")).read()
-
-def groq_request(api_key, prompt, max_tokens=600):
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {
-        "model": "llama-3.3-70b-versatile",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.7,
-        "max_tokens": max_tokens
-    }
-    resp = requests.post(url, headers=headers, json=payload)
-    if resp.status_code != 200:
-        st.error(f"Groq API Error: {resp.text}")
-        return None
-    return resp.json()["choices"][0]["message"]["content"]
+api_key = groq_api_key()
 
-def generate_questions(api_key, resume, job_title, jd, n_each=3):
-    prompt = f"""
-Generate {n_each} interview questions each for:
-1. Technical
-2. Scenario-based
-3. Behavioral
-4. HR
+# Questions and answers live in the shared session store; st.session_state keeps handles.
+sess = session_store.streamlit_session(st, "coach")
 
-Tailor them for Job Title: {job_title}
-Job Description: {jd or 'N/A'}
-Resume (first 1000 chars): {resume[:1000]}
+# --- Helper functions ---
+def groq_json(api_key, prompt, validate, name, max_tokens=600):
+    # Validated JSON (one repair retry on a malformed reply).
+    return structured_chat(get_client(api_key), prompt, validate, name, model="llama-3.3-70b-versatile",
+                           temperature=0.7, max_tokens=max_tokens)
 
-Return JSON with keys: Technical, Scenario, Behavioral, HR.
-"""
-    out = groq_request(api_key, prompt)
-    try:
-        return json.loads(out)
-    except:
-        # fallback parse
-        return {"Technical": [out]}
+def generate_questions(api_key, resume, job_title, jd, n_each=3):
+    # Picked from the pre-generated bank by role and resume/JD skills; the LLM
+    # is only called (once, to fill the bank) for a role it doesn't cover yet.
+    # Questions this session has already seen are skipped while unseen ones remain.
+    qs, info = question_bank.get_questions(job_title, f"{resume}\n{jd or ''}", n_each, client=get_client(api_key),
+                                           exclude=sess.get("seen_question_ids", ()))
+    sess.put("seen_question_ids", [*sess.get("seen_question_ids", ()), *info["ids"]])
+    return qs, info
 
 def evaluate_answer(api_key, question, answer):
     prompt = f"""
@@ -66,13 +41,9 @@ Question: {question}
 Candidate Answer: {answer}
 
 Rate this answer on a scale of 1–5 and provide one-sentence constructive feedback.
-Return JSON: {{"score": int, "feedback": "string"}}
+Return only JSON: {{"score": int, "feedback": "string"}}
 """
-    out = groq_request(api_key, prompt)
-    try:
-        return json.loads(out)
-    except:
-        return {"score": 3, "feedback": out}
+    return groq_json(api_key, prompt, validate_evaluation, "evaluation", max_tokens=200)
 
 # --- UI ---
 st.title("🤖 CareerCraft AI — Groq Interview Coach")
@@ -81,31 +52,42 @@ st.markdown("Practice AI-powered mock interviews tailored to your **resume** and
 with st.sidebar:
     n_each = st.slider("Questions per Category", 1, 5, 3)
     use_audio = st.checkbox("Enable Audio Recorder", value=AUDIO)
+    render_parse_stats()
 
 st.subheader("Step 1: Upload Your Resume")
 uploaded = st.file_uploader("Upload PDF or TXT resume", type=["pdf","txt"])
 resume_text = ""
 if uploaded:
-    if uploaded.type == "application/pdf":
-        resume_text = extract_text_from_pdf(uploaded)
-    else:
-        resume_text = load_text_file(uploaded)
+    resume_text = read_resume(uploaded)
 
 resume_text = st.text_area("Or paste your resume:", value=resume_text, height=200)
 
 job_title = st.text_input("Step 2: Enter Job Title", placeholder="e.g. Data Scientist - NLP")
 jd = st.text_area("Step 3: Paste Job Description (optional)")
 
-if st.button("🚀 Generate Questions") and api_key:
+generate = st.button("🚀 Generate Questions") and api_key
+if generate and not question_bank.role_key(job_title):
+    st.error("Please enter a job title, e.g. Data Scientist.")
+elif generate:
     with st.spinner("Generating tailored questions..."):
-        qs = generate_questions(api_key, resume_text, job_title, jd, n_each=n_each)
-        st.session_state["qs"] = qs
-        st.session_state["answers"] = []
-        st.success("Questions ready! Scroll down.")
-
-if "qs" in st.session_state:
+        try:
+            qs, info = generate_questions(api_key, resume_text, job_title, jd, n_each=n_each)
+        except GroqError as e:
+            st.error(f"Groq API Error: {e.body or e}")
+        except StructuredOutputError as e:
+            st.error(f"Could not read questions from the model's reply: {e}")
+        else:
+            sess.put("qs", qs)
+            sess.put("answers", [])
+            st.success("Questions ready! Scroll down.")
+            st.caption(f"⚡ {'From the question bank' if info['source'] == 'bank' else 'New role added to the question bank'}"
+                       f" ({info['role']}) in {info['ms']:.0f} ms"
+                       + (f" · matched to your skills: {', '.join(info['skills'][:6])}" if info["skills"] else ""))
+
+if "qs" in sess:
+    import pandas as pd   # tables only appear once there are questions
     st.subheader("Step 4: Practice Interview")
-    for cat, qlist in st.session_state["qs"].items():
+    for cat, qlist in sess.get("qs").items():
         st.markdown(f"### 📌 {cat}")
         for idx, q in enumerate(qlist):
             st.write(f"**Q{idx+1}:** {q}")
@@ -115,19 +97,64 @@ if "qs" in st.session_state:
                 if audio:
                     st.audio(audio)
             if st.button(f"Evaluate Answer {cat}-{idx+1}", key=f"eval_{cat}_{idx}") and api_key:
-                feedback = evaluate_answer(api_key, q, ans)
-                st.session_state["answers"].append({
+                try:
+                    feedback = evaluate_answer(api_key, q, ans)
+                except (GroqError, StructuredOutputError) as e:
+                    st.error(f"Evaluation failed: {e}")
+                    continue
+                sess.put("answers", [*sess.get("answers", []), {
                     "category": cat,
                     "question": q,
                     "answer": ans,
                     "score": feedback.get("score"),
                     "feedback": feedback.get("feedback")
-                })
+                }])
                 st.success(f"Score: {feedback.get('score')} — {feedback.get('feedback')}")
 
-if st.session_state.get("answers"):
+    # --- Batch mode: evaluate every answered question concurrently ---
+    if st.button("⚡ Evaluate all answers") and api_key:
+        items = [
+            {"category": cat, "question": q, "answer": st.session_state.get(f"a_{cat}_{idx}", "")}
+            for cat, qlist in sess.get("qs").items()
+            for idx, q in enumerate(qlist)
+        ]
+        items = [it for it in items if it["answer"].strip()]
+        if not items:
+            st.warning("Write at least one answer first.")
+        else:
+            done = {(a["category"], a["question"]) for a in items}
+            answers = [a for a in sess.get("answers", []) if (a["category"], a["question"]) not in done]
+            progress = st.progress(0.0, text=f"Evaluating {len(items)} answers...")
+            live = st.empty()
+            t0 = time.perf_counter()
+            serial_s = 0.0
+            for n, (i, feedback, err, secs) in enumerate(
+                map_concurrent(lambda it: evaluate_answer(api_key, it["question"], it["answer"]), items), start=1
+            ):
+                serial_s += secs
+                feedback = feedback or {"score": None, "feedback": f"Evaluation failed: {err}"}
+                answers.append({
+                    **items[i],
+                    "score": feedback.get("score"),
+                    "feedback": feedback.get("feedback")
+                })
+                # Saved as each one completes, so a rerun mid-batch keeps what is done.
+                sess.put("answers", answers)
+                progress.progress(n / len(items), text=f"Evaluated {n}/{len(items)}")
+                live.dataframe(pd.DataFrame(answers))
+            wall_s = time.perf_counter() - t0
+            live.empty()
+            st.success(f"Evaluated {len(items)} answers in {wall_s:.1f}s "
+                       f"(one by one: ~{serial_s:.1f}s, {serial_s / max(wall_s, 1e-9):.1f}× faster)")
+
+if sess.get("answers"):
+    import pandas as pd
     st.subheader("📊 Session Summary")
-    df = pd.DataFrame(st.session_state["answers"])
+    df = pd.DataFrame(sess.get("answers"))
     st.dataframe(df)
     st.download_button("⬇ Download CSV", df.to_csv(index=False), "interview_results.csv")
 
+with st.sidebar.expander("🧠 Session memory"):
+    session_store.render_report(st, sess)
+    session_store.render_resume(st)
+
@@ -1,8 +1,11 @@
 import streamlit as st
-from streamlit_webrtc import webrtc_streamer, AudioProcessorBase, WebRtcMode
-import av, numpy as np, requests, json, pandas as pd, PyPDF2
-from io import StringIO
-import os
+from groq_client import GroqError, get_client, map_concurrent
+from page_utils import groq_api_key, read_resume, render_parse_stats
+from structured_output import StructuredOutputError, structured_chat, validate_evaluation
+import question_bank
+import session_store
+import speech
+import time
 
 
 # --- CONFIG ---
@@ -10,58 +13,36 @@ st.set_page_config(page_title="CareerCraft AI – Interview Coach", layout="wide
 
 #GROQ_API_KEY = st.secrets["************************************"]
 
-GROQ_API_KEY = st.secrets.get("GROQ_API_KEY", os.getenv("GROQ_API_KEY"))
+GROQ_API_KEY = groq_api_key()
+
+# Questions, results and transcripts live in the shared session store; st.session_state keeps handles.
+sess = session_store.streamlit_session(st, "voice")
 
 # --- UTILITIES ---
-def extract_pdf(file):
-    text = ""
-    reader = PyPDF2.PdfReader(file)
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text
-
-def groq_request(prompt, max_tokens=400):
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {GROQ_API_KEY}", "Content-Type": "application/json"}
-    payload = {
-        "model": "llama-3.3-70b-versatile",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.7,
-        "max_tokens": max_tokens
-    }
-    res = requests.post(url, headers=headers, json=payload)
-    return res.json()["choices"][0]["message"]["content"]
+def groq_json(prompt, validate, name, max_tokens=400):
+    # Validated JSON with one automatic repair retry; raises instead of guessing.
+    return structured_chat(get_client(GROQ_API_KEY), prompt, validate, name, model="llama-3.3-70b-versatile",
+                           temperature=0.7, max_tokens=max_tokens)
 
 def generate_questions(resume, job_title, jd):
-    prompt = f"""
-Create 1 questions each for Technical, Scenario-based, Behavioral, and HR interviews.
-Job Title: {job_title}
-Job Description: {jd}
-Resume: {resume[:1000]}
-Format response oganized subheadings as : Technical, Scenario, Behavioral, HR.
-"""
-    out = groq_request(prompt)
-    try:
-        return json.loads(out)
-    except:
-        return {"Technical": [out]}
+    # From the pre-generated bank by role and resume/JD skills; the LLM only fills roles it lacks.
+    qs, info = question_bank.get_questions(job_title, f"{resume}\n{jd or ''}", 1, client=get_client(GROQ_API_KEY),
+                                           exclude=sess.get("seen_question_ids", ()))
+    sess.put("seen_question_ids", [*sess.get("seen_question_ids", ()), *info["ids"]])
+    return qs, info
 
 def evaluate_answer(question, answer):
     prompt = f"""
 Evaluate this answer:
 Question: {question}
 Answer: {answer}
-Rate 1-5 and give concise feedback. Return JSON: {{"score":int,"feedback":"string"}}.
+Rate 1-5 and give concise feedback. Return only JSON: {{"score":int,"feedback":"string"}}.
 """
-    out = groq_request(prompt)
-    try:
-        return json.loads(out)
-    except:
-        return {"score": 3, "feedback": out}
+    return groq_json(prompt, validate_evaluation, "evaluation", max_tokens=200)
 
 def transcribe_audio(audio_array):
-    prompt = "Simulate transcription: summarize the user’s audio response as text."
-    return groq_request(prompt)
+    # Runs on the shared speech worker thread; this script only waits for the result.
+    return speech.get_worker().submit(audio_array).result()
 
 # --- HEADER ---
 st.markdown(
@@ -70,14 +51,14 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+with st.sidebar.expander("📈 LLM reply parsing"):
+    render_parse_stats()
+
 # --- INPUT ---
 uploaded = st.file_uploader("📄 Upload Resume (PDF or TXT):", type=["pdf", "txt"])
 resume_text = ""
 if uploaded:
-    if uploaded.type == "application/pdf":
-        resume_text = extract_pdf(uploaded)
-    else:
-        resume_text = StringIO(uploaded.getvalue().decode("utf-8")).read()
+    resume_text = read_resume(uploaded)
 
 resume_text = st.text_area("Or paste your resume:", value=resume_text, height=200)
 job_title = st.text_input("🎯 Job Title", placeholder="e.g., Data Scientist")
@@ -85,28 +66,47 @@ jd = st.text_area("📝 Job Description (Optional)")
 
 # --- GENERATE QUESTIONS ---
 if st.button("🚀 Generate Questions"):
-    if not resume_text or not job_title:
+    if not resume_text or not question_bank.role_key(job_title):
         st.error("Please upload/paste a resume and enter a job title.")
     else:
         with st.spinner("Generating questions..."):
-            st.session_state["qs"] = generate_questions(resume_text, job_title, jd)
-            st.session_state["results"] = []
+            try:
+                qs, info = generate_questions(resume_text, job_title, jd)
+                sess.put("qs", qs)
+                sess.put("results", [])
+                sess.put("transcripts", {})
+                st.caption(f"⚡ {'From the question bank' if info['source'] == 'bank' else 'New role added to the question bank'}"
+                           f" ({info['role']}) in {info['ms']:.0f} ms")
+            except GroqError as e:
+                st.error(f"Groq API Error: {e.body or e}")
+            except StructuredOutputError as e:
+                st.error(f"Could not read questions from the model's reply: {e}")
 
 # --- AUDIO PROCESSOR CLASS ---
-class AudioProcessor(AudioProcessorBase):
-    def recv_audio(self, frame: av.AudioFrame) -> av.AudioFrame:
-        audio = frame.to_ndarray()
-        mono = audio.mean(axis=1) if audio.ndim > 1 else audio
-        # Here we just store audio samples for later transcription
-        if not hasattr(self, "recorded"):
-            self.recorded = []
-        self.recorded.extend(mono.tolist())
-        return frame
+@st.cache_resource
+def audio_processor_class():
+    # WebRTC (aiortc, av) is only imported once there are questions to answer.
+    from streamlit_webrtc import AudioProcessorBase
+
+    class AudioProcessor(AudioProcessorBase):
+        def __init__(self):
+            # Bounded 16 kHz buffer for this answer; the callback only copies into it.
+            self.recorder = speech.AnswerRecorder()
+
+        def recv(self, frame):
+            self.recorder.push(frame.to_ndarray(), frame.sample_rate,
+                               channels=len(frame.layout.channels), planar=frame.format.is_planar)
+            return frame
+
+    return AudioProcessor
 
 # --- DISPLAY QUESTIONS ---
-if "qs" in st.session_state:
+if "qs" in sess:
+    import pandas as pd
+    from streamlit_webrtc import webrtc_streamer, WebRtcMode
+    AudioProcessor = audio_processor_class()
     st.subheader("📋 Your AI Interview Questions")
-    for category, qlist in st.session_state["qs"].items():
+    for category, qlist in sess.get("qs").items():
         st.markdown(f"### {category}")
         for i, q in enumerate(qlist):
             st.markdown(f"**Q{i+1}:** {q}")
@@ -121,33 +121,94 @@ if "qs" in st.session_state:
                 audio_processor_factory=AudioProcessor
             )
 
-            audio_text = ""
-            if ctx and ctx.audio_receiver and st.button(f"📝 Transcribe {category}-{i+1}", key=f"t_{category}_{i}"):
+            tx_key = f"tx_{category}_{i}"
+            if ctx and ctx.audio_processor and st.button(f"📝 Transcribe {category}-{i+1}", key=f"t_{category}_{i}"):
+                audio_data, dropped = ctx.audio_processor.recorder.take()
                 with st.spinner("Transcribing..."):
-                    audio_data = np.array(ctx.audio_processor.recorded) if hasattr(ctx.audio_processor, "recorded") else np.array([])
-                    audio_text = transcribe_audio(audio_data)
-                    st.success(f"Transcribed Answer: {audio_text}")
+                    try:
+                        result = transcribe_audio(audio_data)
+                    except Exception as e:
+                        st.error(f"Transcription failed: {e}")
+                    else:
+                        sess.put("transcripts", {**sess.get("transcripts", {}), tx_key: result["text"]})
+                        st.caption(f"{result['audio_s']:.1f} s audio ({result['speech_s']:.1f} s speech) "
+                                   f"transcribed in {result['compute_s']:.1f} s · RTF {result['rtf']:.2f}"
+                                   + (f" · first {dropped:.0f} s dropped (answer over "
+                                      f"{speech.MAX_ANSWER_SECONDS:.0f} s)" if dropped else ""))
+                        if not result["text"]:
+                            st.warning("No speech detected in the recording.")
+            audio_text = sess.get("transcripts", {}).get(tx_key, "")
+            if audio_text:
+                st.success(f"Transcribed Answer: {audio_text}")
 
             final_answer = ans if ans else audio_text
             if final_answer and st.button(f"✅ Evaluate {category}-{i+1}", key=f"eval_{category}_{i}"):
                 with st.spinner("Evaluating..."):
-                    feedback = evaluate_answer(q, final_answer)
+                    try:
+                        feedback = evaluate_answer(q, final_answer)
+                    except (GroqError, StructuredOutputError) as e:
+                        st.error(f"Evaluation failed: {e}")
+                        continue
                     st.success(f"⭐ Score: {feedback['score']} — {feedback['feedback']}")
-                    st.session_state["results"].append({
+                    sess.put("results", [*sess.get("results", []), {
                         "category": category,
                         "question": q,
                         "answer": final_answer,
                         "score": feedback['score'],
                         "feedback": feedback['feedback'],
-                    })
+                    }])
+
+    # --- Batch mode: evaluate every answered question concurrently ---
+    if st.button("⚡ Evaluate All Answers"):
+        # Like single evaluation: the typed answer, else the transcribed recording.
+        transcripts = sess.get("transcripts", {})
+        items = [
+            {"category": category, "question": q,
+             "answer": st.session_state.get(f"a_{category}_{i}", "") or transcripts.get(f"tx_{category}_{i}", "")}
+            for category, qlist in sess.get("qs").items()
+            for i, q in enumerate(qlist)
+        ]
+        items = [it for it in items if it["answer"].strip()]
+        if not items:
+            st.warning("Write or record and transcribe at least one answer first.")
+        else:
+            done = {(r["category"], r["question"]) for r in items}
+            results = [r for r in sess.get("results", []) if (r["category"], r["question"]) not in done]
+            progress = st.progress(0.0, text=f"Evaluating {len(items)} answers...")
+            live = st.empty()
+            t0 = time.perf_counter()
+            serial_s = 0.0
+            for n, (i, feedback, err, secs) in enumerate(
+                map_concurrent(lambda it: evaluate_answer(it["question"], it["answer"]), items), start=1
+            ):
+                serial_s += secs
+                feedback = feedback or {"score": None, "feedback": f"Evaluation failed: {err}"}
+                results.append({
+                    **items[i],
+                    "score": feedback["score"],
+                    "feedback": feedback["feedback"],
+                })
+                # Saved as each one completes, so a rerun mid-batch keeps what is done.
+                sess.put("results", results)
+                progress.progress(n / len(items), text=f"Evaluated {n}/{len(items)}")
+                live.dataframe(pd.DataFrame(results))
+            wall_s = time.perf_counter() - t0
+            live.empty()
+            st.success(f"⚡ Evaluated {len(items)} answers in {wall_s:.1f}s "
+                       f"(one by one: ~{serial_s:.1f}s, {serial_s / max(wall_s, 1e-9):.1f}× faster)")
 
 # --- SUMMARY ---
-if st.session_state.get("results"):
+if sess.get("results"):
+    import pandas as pd
     st.subheader("📊 Performance Summary")
-    df = pd.DataFrame(st.session_state["results"])
+    df = pd.DataFrame(sess.get("results"))
     st.dataframe(df)
     st.download_button("⬇ Download Results", df.to_csv(index=False), "interview_results.csv")
 
+with st.sidebar.expander("🧠 Session memory"):
+    session_store.render_report(st, sess)
+    session_store.render_resume(st)
+
 
 
 
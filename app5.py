@@ -0,0 +1,89 @@
+import streamlit as st
+import os
+import io
+import importlib.util
+import zipfile
+import datetime
+from web_scraper import get_domains, get_latest_skills, get_skill_aliases
+from bulk_screen import screen, RESUME_EXTS
+from utils import CACHE_DIR
+
+# --- Page Setup ---
+st.set_page_config("Bulk Resume Screening", layout="wide")
+
+st.markdown("<h1 style='text-align:center;'>📂 Bulk Resume Screening</h1>", unsafe_allow_html=True)
+st.markdown("<p style='text-align:center;'>Score hundreds of resumes against a domain's skills in one go.</p>",
+            unsafe_allow_html=True)
+st.markdown("---")
+
+# --- Sidebar ---
+st.sidebar.title("⚙️ Settings")
+domain = st.sidebar.selectbox("Choose Domain", get_domains())
+threshold = st.sidebar.slider("Skill Match Sensitivity (%)", 60, 100, 80, step=5)
+cpus = os.cpu_count() or 1
+# A slider needs min < max; on a single CPU there is nothing to choose.
+workers = st.sidebar.slider("Worker processes", 1, cpus, cpus) if cpus > 1 else 1
+# Parquet reports need pyarrow, an optional dependency; find_spec checks without importing it.
+formats = ["CSV", "Parquet"] if importlib.util.find_spec("pyarrow") else ["CSV"]
+out_format = st.sidebar.radio("Report format", formats, horizontal=True)
+
+# --- Upload ---
+uploads = st.file_uploader("📄 Upload resumes (PDF/TXT) or ZIP archives", type=["pdf", "txt", "zip"],
+                           accept_multiple_files=True)
+
+
+def iter_uploads(files):
+    # ZIPs are expanded one member at a time so only a few resumes sit in memory.
+    for f in files:
+        if f.name.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(f.getvalue())) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(RESUME_EXTS):
+                        yield info.filename, zf.read(info)
+        else:
+            yield f.name, f.getvalue()
+
+
+if uploads and st.button("🚀 Screen Resumes"):
+    skills = get_latest_skills(domain)
+    out_dir = os.path.join(CACHE_DIR, "bulk_reports")
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_path = os.path.join(out_dir, f"ATS_Report_{stamp}.{out_format.lower()}")
+
+    status = st.empty()
+
+    def on_row(row, stats):
+        if stats["resumes"] % 10 == 0:
+            status.info(f"⏳ Screened {stats['resumes']} resumes...")
+
+    stats = screen(iter_uploads(uploads), domain, skills, out_path, threshold, workers, on_row=on_row,
+                   aliases=get_skill_aliases(skills))
+    status.success(f"✅ Screened {stats['resumes']} resumes in {stats['wall_s']:.1f}s "
+                   f"({stats['resumes_per_s']:.1f} resumes/sec on {stats['workers']} workers)")
+    st.session_state["bulk_report"] = out_path
+    st.session_state["bulk_stats"] = stats
+
+if st.session_state.get("bulk_report"):
+    path = st.session_state["bulk_report"]
+    stats = st.session_state["bulk_stats"]
+
+    st.subheader("📊 Throughput")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Resumes", stats["resumes"])
+    col2.metric("Resumes / sec", f"{stats['resumes_per_s']:.1f}")
+    col3.metric("Avg extract", f"{stats['avg_extract_ms']:.0f} ms")
+    col4.metric("Avg match", f"{stats['avg_match_ms']:.0f} ms")
+    if stats["errors"]:
+        st.warning(f"⚠️ {stats['errors']} resumes could not be read (see the Error column).")
+
+    st.subheader("🏆 Top Candidates")
+    import pandas as pd   # only needed once a report exists
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path, columns=["Filename", "ATS Score", "Matched Skills"])
+    else:
+        df = pd.read_csv(path, usecols=["Filename", "ATS Score", "Matched Skills"])
+    st.dataframe(df.nlargest(50, "ATS Score"), use_container_width=True)
+
+    with open(path, "rb") as f:
+        st.download_button("📥 Download Full Report", f, file_name=os.path.basename(path))
@@ -0,0 +1,256 @@
+# ats_scorer.py  ATS scoring of a resume (PDF/DOCX/TXT): sections, keyword coverage, cached by file hash
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from io import BytesIO
+
+from pdf_extract import extract_text, file_hash
+from skill_matcher import get_matcher
+from skill_taxonomy import get_taxonomy
+from utils import CACHE_DIR
+
+RESULT_CACHE_DIR = os.path.join(CACHE_DIR, "ats")
+# End-to-end budget for scoring one resume on a cold cache.
+LATENCY_BUDGET_MS = float(os.getenv("ATS_LATENCY_BUDGET_MS", "1500"))
+MEMORY_CACHE_SIZE = 128
+# Bump when scoring changes so stale cached results are not served.
+SCORER_VERSION = 1
+
+# Weights of the final score.
+W_KEYWORDS = 0.6
+W_SECTIONS = 0.25
+W_FORMAT = 0.15
+
+SECTION_PATTERNS = {
+    "summary": r"summary|profile|objective|about me",
+    "skills": r"(technical |key |core )?skills|technologies|tech stack|competencies",
+    "experience": r"(work |professional )?experience|employment( history)?|internships?|work history",
+    "education": r"education|academics?|qualifications",
+    "projects": r"(academic |personal |key )?projects",
+    "certifications": r"certifications?|courses|licenses",
+}
+REQUIRED_SECTIONS = ("skills", "experience", "education")
+_SECTION_RE = {name: re.compile(rf"^\W*({pat})\W*$", re.IGNORECASE) for name, pat in SECTION_PATTERNS.items()}
+_QUANTIFIED = re.compile(r"\b\d+(\.\d+)?\s*(%|x\b|k\b|\+|percent|users|customers|ms\b)", re.IGNORECASE)
+_WORD = re.compile(r"[A-Za-z][A-Za-z+#.]{2,}")
+_STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being both but by can could did do does doing
+for from had has have having he her here his how i if in into is it its just me more most must my no nor not
+of on once only or other our out over own same she should so some such than that the their them then there
+these they this those through to too under until up very was we were what when where which while who whom
+why will with would you your work working team teams role candidate candidates experience years year strong
+ability skills knowledge using use including required preferred plus etc job looking join we're you'll
+""".split())
+
+_memory_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# ---- Extraction ----
+def extract_docx(data):
+    from docx import Document
+
+    doc = Document(BytesIO(data))
+    lines = [p.text for p in doc.paragraphs]
+    for table in doc.tables:
+        for row in table.rows:
+            lines.append(" | ".join(cell.text for cell in row.cells))
+    return "\n".join(lines)
+
+
+def extract_resume(name, data):
+    """Plain text of a PDF, DOCX or TXT resume."""
+    lower = name.lower()
+    if lower.endswith(".pdf"):
+        return extract_text(data)
+    if lower.endswith(".docx"):
+        return extract_docx(data)
+    return data.decode("utf-8", errors="replace")
+
+
+# ---- Analysis ----
+def detect_sections(text):
+    """section -> body text, keyed by the headings found (short lines matching SECTION_PATTERNS)."""
+    sections, current = {}, None
+    for line in text.splitlines():
+        stripped = line.strip()
+        name = None
+        if stripped and len(stripped) <= 40:
+            name = next((n for n, rx in _SECTION_RE.items() if rx.match(stripped)), None)
+        if name:
+            current = name
+            sections.setdefault(name, "")
+        elif current and stripped:
+            sections[current] += stripped + "\n"
+    return sections
+
+
+def jd_keywords(jd, limit=30):
+    """Taxonomy skills named in a job description, topped up with its most frequent content words."""
+    tax = get_taxonomy()
+    skills = tax.matcher().match(jd, threshold=100)[0] if tax else []
+    seen = {s.lower() for s in skills}
+    counts = Counter(w.lower().rstrip(".") for w in _WORD.findall(jd))
+    extra = [w for w, n in counts.most_common() if n >= 2 and w not in _STOPWORDS and w not in seen]
+    return (skills + extra)[:max(limit, len(skills))]
+
+
+def keyword_coverage(text, keywords):
+    """(matched, missing) keywords, counting taxonomy aliases as mentions."""
+    tax = get_taxonomy()
+    aliases = tax.aliases_for(keywords) if tax is not None else None
+    return get_matcher(keywords, aliases).match(text, threshold=90)
+
+
+def format_checks(text):
+    words = len(text.split())
+    return {
+        "words": words,
+        "length_ok": 250 <= words <= 1200,
+        "quantified": len(_QUANTIFIED.findall(text)),
+        "has_email": bool(re.search(r"[\w.+-]+@[\w-]+\.[\w.]+", text)),
+        "has_phone": bool(re.search(r"(\+?\d[\d\s().-]{8,}\d)", text)),
+    }
+
+
+def suggestions(sections, missing, fmt):
+    tips = []
+    for s in REQUIRED_SECTIONS:
+        if s not in sections:
+            tips.append(f"Add a clearly titled **{s.title()}** section so ATS parsers can find it.")
+    if missing:
+        tips.append("Add job-specific keywords you genuinely have: " + ", ".join(f"**{m}**" for m in missing[:8]) + ".")
+    if fmt["quantified"] < 3:
+        tips.append("Highlight **quantifiable achievements** (e.g., *boosted accuracy by 20%*).")
+    if not fmt["length_ok"]:
+        tips.append("Keep the resume between roughly 250 and 1200 words." if fmt["words"] > 250
+                    else "Your resume looks short; expand on projects and experience.")
+    if not (fmt["has_email"] and fmt["has_phone"]):
+        tips.append("Include an email address and phone number as plain text.")
+    return tips
+
+
+def score_text(text, keywords):
+    t0 = time.perf_counter()
+    sections = detect_sections(text)
+    t1 = time.perf_counter()
+    matched, missing = keyword_coverage(text, keywords) if keywords else ([], [])
+    t2 = time.perf_counter()
+    fmt = format_checks(text)
+    coverage = len(matched) / len(keywords) if keywords else 0.0
+    section_score = sum(s in sections for s in REQUIRED_SECTIONS) / len(REQUIRED_SECTIONS)
+    format_score = (fmt["length_ok"] + min(fmt["quantified"], 3) / 3 + (fmt["has_email"] and fmt["has_phone"])) / 3
+    score = 100 * (W_KEYWORDS * coverage + W_SECTIONS * section_score + W_FORMAT * format_score)
+    return {
+        "score": round(score, 1),
+        "keyword_coverage": round(coverage * 100, 1),
+        "matched": matched,
+        "missing": missing,
+        "sections": sorted(sections),
+        "missing_sections": [s for s in REQUIRED_SECTIONS if s not in sections],
+        "format": fmt,
+        "suggestions": suggestions(sections, missing, fmt),
+        "timings": {"sections_ms": (t1 - t0) * 1000, "keywords_ms": (t2 - t1) * 1000},
+    }
+
+
+# ---- Cache ----
+def _cache_key(digest, keywords):
+    tax = get_taxonomy()
+    h = hashlib.sha256(f"{SCORER_VERSION}\0{digest}\0{tax.version if tax else ''}\0".encode("utf-8"))
+    h.update("\n".join(keywords).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _cache_get(key):
+    with _cache_lock:
+        hit = _memory_cache.get(key)
+        if hit is not None:
+            _memory_cache.move_to_end(key)
+            return hit
+    try:
+        with open(os.path.join(RESULT_CACHE_DIR, key + ".json"), encoding="utf-8") as f:
+            hit = json.load(f)
+    except (OSError, ValueError):
+        return None
+    _memory_put(key, hit)
+    return hit
+
+
+def _memory_put(key, result):
+    with _cache_lock:
+        _memory_cache[key] = result
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _cache_put(key, result):
+    _memory_put(key, result)
+    try:
+        os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+        path = os.path.join(RESULT_CACHE_DIR, key + ".json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+# ---- Entry point ----
+def score_resume(name, data, keywords, use_cache=True):
+    """
+    Score one uploaded resume against keywords (a JD's or a domain's skills).
+    Results are cached by file hash + keywords; the returned dict carries
+    per-stage timings, whether it was a cache hit and whether it met
+    LATENCY_BUDGET_MS.
+    """
+    t0 = time.perf_counter()
+    keywords = list(dict.fromkeys(keywords))
+    key = _cache_key(file_hash(data), keywords)
+    if use_cache:
+        hit = _cache_get(key)
+        if hit is not None:
+            total = (time.perf_counter() - t0) * 1000
+            return dict(hit, cached=True, total_ms=total, within_budget=total <= LATENCY_BUDGET_MS)
+    text = extract_resume(name, data)
+    t1 = time.perf_counter()
+    result = score_text(text, keywords)
+    result["timings"]["extract_ms"] = (t1 - t0) * 1000
+    if use_cache:
+        _cache_put(key, result)
+    total = (time.perf_counter() - t0) * 1000
+    return dict(result, cached=False, total_ms=total, within_budget=total <= LATENCY_BUDGET_MS)
+
+
+if __name__ == "__main__":
+    from web_scraper import get_domains, get_latest_skills
+
+    ap = argparse.ArgumentParser(description="Score a resume and report cold vs cached latency.")
+    ap.add_argument("resume", help=".pdf, .docx or .txt")
+    ap.add_argument("--domain", choices=get_domains(), default=None)
+    ap.add_argument("--jd", help="job description text file to score against instead of a domain")
+    args = ap.parse_args()
+
+    if args.jd:
+        with open(args.jd, encoding="utf-8") as f:
+            kw = jd_keywords(f.read())
+    else:
+        kw = get_latest_skills(args.domain or get_domains()[0])
+    with open(args.resume, "rb") as f:
+        raw = f.read()
+    cold = score_resume(args.resume, raw, kw, use_cache=False)
+    score_resume(args.resume, raw, kw)
+    warm = score_resume(args.resume, raw, kw)
+    print(f"ATS score {cold['score']} (keyword coverage {cold['keyword_coverage']}%, "
+          f"sections: {', '.join(cold['sections']) or 'none'})")
+    print("cold: " + ", ".join(f"{k} {v:.1f}" for k, v in cold["timings"].items())
+          + f", total {cold['total_ms']:.1f} ms (budget {LATENCY_BUDGET_MS:.0f} ms, "
+          + ("met" if cold["within_budget"] else "EXCEEDED") + ")")
+    print(f"cached: {warm['total_ms']:.2f} ms")
@@ -0,0 +1,186 @@
+# bm25.py  incremental BM25 inverted index with array-backed postings, keyed by the FAISS vector ids
+import math
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from skill_matcher import tokenize
+
+K1 = 1.2
+B = 0.75
+# Compact postings once this share of indexed chunks has been removed.
+COMPACT_RATIO = 0.25
+
+
+class BM25Index:
+    """
+    Sparse companion to the FAISS index over the same chunks. Each term owns
+    two growable typed arrays (vector ids and term frequencies), so adding a
+    document appends to a few arrays and a query scores whole postings lists
+    with NumPy. Removed ids are tombstoned and swept out by compact().
+    """
+
+    def __init__(self, k1=K1, b=B):
+        self.k1 = k1
+        self.b = b
+        self.terms = {}          # term -> (ids array('q'), tfs array('H'))
+        self.doc_len = {}        # vector id -> token count
+        self.total_len = 0
+        self.removed = set()
+        self.max_id = -1
+        self._shared = set()     # terms whose postings arrays still belong to the index forked from
+        self._version = 0        # bumped on every change; invalidates the cached length array
+        self._lengths = (None, None)
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    # ---- Updates ----
+    def _postings(self, t):
+        """Postings of t to append to: created if new, copied first if still shared with the parent."""
+        post = self.terms.get(t)
+        if post is None:
+            post = self.terms[t] = (array("q"), array("H"))
+        elif t in self._shared:
+            post = self.terms[t] = (array("q", post[0]), array("H", post[1]))
+            self._shared.discard(t)
+        return post
+
+    def add(self, vid, text):
+        tokens = tokenize(text)
+        for t, n in Counter(tokens).items():
+            post = self._postings(t)
+            post[0].append(vid)
+            post[1].append(min(n, 65535))
+        self.doc_len[vid] = len(tokens)
+        self.total_len += len(tokens)
+        self.max_id = max(self.max_id, vid)
+        self._version += 1
+
+    def add_many(self, vids, texts):
+        for vid, text in zip(vids, texts):
+            self.add(int(vid), text)
+
+    def extend(self, other, offset=0):
+        """Append every chunk of other, its vector ids shifted by offset."""
+        for t, (ids, tfs) in other.terms.items():
+            post = self._postings(t)
+            post[0].frombytes((np.frombuffer(ids, dtype="int64") + offset).tobytes())
+            post[1].extend(tfs)
+        for vid, n in other.doc_len.items():
+            self.doc_len[vid + offset] = n
+            self.max_id = max(self.max_id, vid + offset)
+        self.total_len += other.total_len
+        self._version += 1
+
+    def fork(self):
+        """A copy that shares this index's postings arrays until it appends to them."""
+        idx = BM25Index(self.k1, self.b)
+        idx.terms = dict(self.terms)
+        idx.doc_len = dict(self.doc_len)
+        idx.total_len = self.total_len
+        idx.removed = set(self.removed)
+        idx.max_id = self.max_id
+        idx._shared = set(self.terms)
+        return idx
+
+    def remove(self, vids):
+        for vid in vids:
+            n = self.doc_len.pop(int(vid), None)
+            if n is not None:
+                self.total_len -= n
+                self.removed.add(int(vid))
+                self._version += 1
+        if len(self.removed) > COMPACT_RATIO * max(len(self.doc_len), 1):
+            self.compact()
+
+    def compact(self):
+        if not self.removed:
+            return
+        dead = np.fromiter(self.removed, dtype="int64")
+        for t in list(self.terms):
+            ids, tfs = self.terms[t]
+            a = np.frombuffer(ids, dtype="int64")
+            keep = ~np.isin(a, dead)
+            if keep.all():
+                continue
+            if not keep.any():
+                del self.terms[t]
+                continue
+            tf = np.frombuffer(tfs, dtype="uint16")[keep]
+            self.terms[t] = (array("q", a[keep].tobytes()), array("H", tf.tobytes()))
+        self.removed.clear()
+
+    # ---- Search ----
+    def search(self, query, k=10):
+        """[(vector id, score)] best first."""
+        n_docs = len(self.doc_len)
+        if not n_docs:
+            return []
+        avgdl = self.total_len / n_docs
+        lengths = self._length_array()
+        scores = None
+        for t in set(tokenize(query)):
+            post = self.terms.get(t)
+            if post is None:
+                continue
+            ids = np.frombuffer(post[0], dtype="int64")
+            tf = np.frombuffer(post[1], dtype="uint16").astype("float32")
+            df = len(ids)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            denom = tf + self.k1 * (1 - self.b + self.b * lengths[ids] / avgdl)
+            if scores is None:
+                scores = np.zeros(self.max_id + 1, dtype="float32")
+            # A term lists each vector id once, so plain fancy-index += is safe.
+            scores[ids] += idf * tf * (self.k1 + 1) / denom
+        if scores is None:
+            return []
+        if self.removed:
+            scores[np.fromiter(self.removed, dtype="int64")] = 0
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def _length_array(self):
+        version, lengths = self._lengths
+        if version != self._version:
+            lengths = np.zeros(self.max_id + 1, dtype="float32")
+            if self.doc_len:
+                ids = np.fromiter(self.doc_len.keys(), dtype="int64", count=len(self.doc_len))
+                lengths[ids] = np.fromiter(self.doc_len.values(), dtype="float32", count=len(self.doc_len))
+            self._lengths = (self._version, lengths)
+        return lengths
+
+    # ---- Persistence ----
+    def save(self, path):
+        """One .npz: the vocabulary, all postings concatenated, and per-term offsets."""
+        self.compact()
+        terms = sorted(self.terms)
+        offsets = np.zeros(len(terms) + 1, dtype="int64")
+        offsets[1:] = np.cumsum([len(self.terms[t][0]) for t in terms])
+        ids = np.concatenate([np.frombuffer(self.terms[t][0], dtype="int64") for t in terms] or [np.zeros(0, "int64")])
+        tfs = np.concatenate([np.frombuffer(self.terms[t][1], dtype="uint16") for t in terms] or [np.zeros(0, "uint16")])
+        np.savez(path, terms=np.array(terms, dtype=str), offsets=offsets, ids=ids, tfs=tfs,
+                 doc_ids=np.fromiter(self.doc_len.keys(), dtype="int64", count=len(self.doc_len)),
+                 doc_lens=np.fromiter(self.doc_len.values(), dtype="int64", count=len(self.doc_len)),
+                 params=np.array([self.k1, self.b]))
+
+    @classmethod
+    def load(cls, path):
+        z = np.load(path)
+        idx = cls(*z["params"].tolist())
+        offsets, ids, tfs = z["offsets"], z["ids"], z["tfs"]
+        for i, t in enumerate(z["terms"].tolist()):
+            s, e = offsets[i], offsets[i + 1]
+            idx.terms[t] = (array("q", ids[s:e].tobytes()), array("H", tfs[s:e].tobytes()))
+        idx.doc_len = dict(zip(z["doc_ids"].tolist(), z["doc_lens"].tolist()))
+        idx.total_len = int(sum(idx.doc_len.values()))
+        idx.max_id = max(idx.doc_len, default=-1)
+        return idx
+
+    def nbytes(self):
+        return sum(ids.itemsize * len(ids) + tfs.itemsize * len(tfs) for ids, tfs in self.terms.values())
@@ -0,0 +1,196 @@
+# bulk_screen.py  score a folder or ZIP of resumes against a domain's skills across a process pool
+import argparse
+import csv
+import datetime
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from pdf_extract import iter_pages
+from skill_matcher import ats_score, get_matcher
+
+RESUME_EXTS = (".pdf", ".txt")
+FIELDS = ["Filename", "Domain", "ATS Score", "Matched Skills", "Missing Skills",
+          "Extract ms", "Match ms", "Error", "Timestamp"]
+PARQUET_BATCH = 500
+
+
+# ---- Input ----
+def iter_resumes(path):
+    """Yield (name, bytes) for every PDF/TXT in a directory tree or a ZIP archive, one at a time."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(RESUME_EXTS):
+                    yield info.filename, zf.read(info)
+        return
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if name.lower().endswith(RESUME_EXTS):
+                full = os.path.join(root, name)
+                with open(full, "rb") as f:
+                    yield os.path.relpath(full, path), f.read()
+
+
+# ---- Worker ----
+_worker = {}
+
+
+def _init_worker(domain, skills, threshold, aliases=None):
+    _worker.update(domain=domain, skills=skills, threshold=threshold, aliases=aliases or {})
+    get_matcher(skills, aliases)
+
+
+def score_resume(name, data, domain=None, skills=None, threshold=None, aliases=None):
+    """Extract and score one resume; returns a report row with per-stage timings."""
+    domain = domain or _worker["domain"]
+    skills = skills or _worker["skills"]
+    threshold = threshold or _worker["threshold"]
+    aliases = aliases or _worker.get("aliases")
+    row = {"Filename": name, "Domain": domain, "Error": ""}
+    try:
+        t0 = time.perf_counter()
+        if name.lower().endswith(".pdf"):
+            # Already inside a worker process, so pages are extracted serially.
+            text = "\n".join(iter_pages(data, parallel=False))
+        else:
+            text = data.decode("utf-8", errors="replace")
+        t1 = time.perf_counter()
+        matched, missing = get_matcher(skills, aliases).match(text, threshold)
+        t2 = time.perf_counter()
+        row.update({
+            "ATS Score": ats_score(matched, skills),
+            "Matched Skills": ", ".join(matched),
+            "Missing Skills": ", ".join(missing),
+            "Extract ms": round((t1 - t0) * 1000, 1),
+            "Match ms": round((t2 - t1) * 1000, 1),
+        })
+    except Exception as e:
+        row["Error"] = str(e)
+    row["Timestamp"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return row
+
+
+# ---- Output ----
+class CsvSink:
+    def __init__(self, path):
+        self.f = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.f, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetSink:
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([(f, pa.float64() if f in ("ATS Score", "Extract ms", "Match ms") else pa.string())
+                                 for f in FIELDS])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.batch = []
+
+    def write(self, row):
+        self.batch.append(row)
+        if len(self.batch) >= PARQUET_BATCH:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            cols = {f: [r.get(f) for r in self.batch] for f in FIELDS}
+            self.writer.write_table(self.pa.table(cols, schema=self.schema))
+            self.batch = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def open_sink(path):
+    return ParquetSink(path) if path.lower().endswith(".parquet") else CsvSink(path)
+
+
+# ---- Driver ----
+def screen(resumes, domain, skills, out_path, threshold=80, workers=None, on_row=None, aliases=None):
+    """
+    Score resumes ((name, bytes) pairs, consumed lazily) across a process pool
+    and append each row to out_path as soon as it is ready. At most a few
+    resumes per worker are in flight, so memory stays flat for any input size.
+    Returns throughput and per-stage timing totals.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    sink = open_sink(out_path)
+    stats = {"resumes": 0, "errors": 0, "extract_ms": 0.0, "match_ms": 0.0}
+    t0 = time.perf_counter()
+
+    def collect(done):
+        for fut in done:
+            row = fut.result()
+            sink.write(row)
+            stats["resumes"] += 1
+            stats["errors"] += bool(row["Error"])
+            stats["extract_ms"] += row.get("Extract ms") or 0.0
+            stats["match_ms"] += row.get("Match ms") or 0.0
+            if on_row:
+                on_row(row, stats)
+
+    try:
+        # spawn, not fork: app5 calls this from the threaded Streamlit server (see pdf_extract).
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker,
+                                 initargs=(domain, list(skills), threshold, aliases)) as pool:
+            pending = set()
+            for name, data in resumes:
+                pending.add(pool.submit(score_resume, name, data))
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+    finally:
+        sink.close()
+
+    wall = time.perf_counter() - t0
+    n = stats["resumes"]
+    stats.update(
+        wall_s=wall,
+        resumes_per_s=n / wall if wall > 0 else 0.0,
+        avg_extract_ms=stats["extract_ms"] / n if n else 0.0,
+        avg_match_ms=stats["match_ms"] / n if n else 0.0,
+        workers=workers,
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    from web_scraper import get_domains, get_latest_skills, get_skill_aliases
+
+    ap = argparse.ArgumentParser(description="Screen a folder or ZIP of resumes against a domain's skills.")
+    ap.add_argument("input", help="directory or .zip of PDF/TXT resumes")
+    ap.add_argument("--domain", required=True, choices=get_domains())
+    ap.add_argument("--out", default="ATS_Report.csv", help=".csv or .parquet (needs pyarrow)")
+    ap.add_argument("--threshold", type=int, default=80)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+
+    def progress(row, stats):
+        if stats["resumes"] % 100 == 0:
+            print(f"  {stats['resumes']} resumes...", file=sys.stderr)
+
+    skills = get_latest_skills(args.domain)
+    s = screen(iter_resumes(args.input), args.domain, skills, args.out,
+               args.threshold, args.workers, on_row=progress, aliases=get_skill_aliases(skills))
+    print(f"{s['resumes']} resumes ({s['errors']} errors) in {s['wall_s']:.1f}s "
+          f"on {s['workers']} workers: {s['resumes_per_s']:.1f} resumes/s")
+    print(f"avg per resume: extract {s['avg_extract_ms']:.1f} ms, match {s['avg_match_ms']:.1f} ms")
+    print(f"report written to {args.out}")
@@ -0,0 +1,243 @@
+# chunking.py  structure-aware, token-budgeted chunking over extracted pages
+import argparse
+import re
+import time
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces; stay safely below it.
+MAX_TOKENS = 192
+OVERLAP_TOKENS = 32
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9•\-])")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_BULLET = re.compile(r"^\s*(?:[-•*▪●]|\d+[.)])\s+")
+_HEADING_NUMBERED = re.compile(r"^\s*(?:\d{1,2}(?:\.\d+)*\.?|[IVX]+\.|Chapter\s+\d+|Section\s+\d+)\s+\S")
+# Page furniture: "42", "2023", "Page 3", "3 of 10", "- 3 -", "p. 3".
+_PAGE_NUMBER = re.compile(r"^[\W_]*(?:(?:page|p\.?)\s*)?\d+(?:\s*(?:of|/)\s*\d+)?[\W_]*$", re.IGNORECASE)
+# A short Title Case line only counts as a heading if it names a usual section;
+# otherwise lines like "Python Django Flask" (a wrapped skills list) would.
+HEADING_WORDS = {
+    "about", "abstract", "achievements", "activities", "appendix", "awards", "background", "certifications",
+    "conclusion", "conclusions", "contact", "courses", "discussion", "education", "experience", "hobbies",
+    "interests", "introduction", "languages", "methods", "objective", "overview", "profile", "projects",
+    "publications", "qualifications", "references", "requirements", "responsibilities", "results", "skills",
+    "summary", "volunteering",
+}
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+
+# ---- Token counting ----
+def regex_token_count(text):
+    return len(_WORD.findall(text))
+
+
+def get_token_counter(model_name=None):
+    """Count tokens with the embedding model's tokenizer, or a word/punct regex without one."""
+    if model_name is None:
+        return regex_token_count
+    import embeddings
+    tokenizer = getattr(embeddings.get_model(model_name), "tokenizer", None)
+    if tokenizer is None:
+        return regex_token_count
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+
+# ---- Structure ----
+def is_heading(line):
+    line = line.strip()
+    if not line or len(line) > 80 or _BULLET.match(line):
+        return False
+    if line.endswith((".", ",", ";")) or _PAGE_NUMBER.match(line):
+        return False
+    words = line.split()
+    if _HEADING_NUMBERED.match(line) and len(words) <= 10:
+        return True
+    if line.endswith(":") and len(words) <= 8:
+        return True
+    letters = [c for c in line if c.isalpha()]
+    if letters and all(c.isupper() for c in letters) and len(words) <= 8:
+        return True
+    return (len(words) <= 6 and all(w[0].isupper() for w in words if w[0].isalpha())
+            and any(re.sub(r"\W", "", w).lower() in HEADING_WORDS for w in words))
+
+
+def split_sentences(paragraph):
+    paragraph = " ".join(paragraph.split())
+    return [s for s in _SENTENCE_END.split(paragraph) if s.strip()]
+
+
+def iter_units(pages):
+    """
+    Yield (kind, text, page) units: "heading" lines, and "sentence"s with a
+    "break" marker between paragraphs. Bullet lines count as their own paragraph.
+    """
+    for page_no, page in enumerate(pages, start=1):
+        for para in _PARAGRAPH_BREAK.split(page):
+            buf = []
+            for line in para.splitlines():
+                if is_heading(line):
+                    if buf:
+                        for s in split_sentences(" ".join(buf)):
+                            yield "sentence", s, page_no
+                        yield "break", "", page_no
+                        buf = []
+                    yield "heading", line.strip(), page_no
+                elif _BULLET.match(line) and buf:
+                    for s in split_sentences(" ".join(buf)):
+                        yield "sentence", s, page_no
+                    buf = [line]
+                elif line.strip():
+                    buf.append(line.strip())
+            if buf:
+                for s in split_sentences(" ".join(buf)):
+                    yield "sentence", s, page_no
+            yield "break", "", page_no
+
+
+def _split_long(text, max_tokens, count):
+    words, piece = text.split(), []
+    for w in words:
+        piece.append(w)
+        if count(" ".join(piece)) > max_tokens and len(piece) > 1:
+            piece.pop()
+            yield " ".join(piece)
+            piece = [w]
+    if piece:
+        yield " ".join(piece)
+
+
+# ---- Chunking ----
+def iter_chunks(pages, max_tokens=MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS, count=regex_token_count):
+    """
+    Pack sentences into chunks of at most max_tokens, breaking preferably at
+    headings and paragraph ends. Each new chunk repeats the trailing sentences
+    of the previous one (up to overlap_tokens) and is prefixed by its section
+    heading. Yields dicts with text, page, section and tokens.
+    """
+    section, budget = "", max_tokens   # budget leaves room for the heading prefix
+    cur, cur_tokens, cur_page = [], 0, None
+    fresh = 0   # sentences in cur that are not overlap from the previous chunk
+
+    def emit():
+        body = " ".join(t for t, _ in cur)
+        text = f"{section}\n{body}" if section else body
+        return {"text": text, "page": cur_page, "section": section, "tokens": cur_tokens + max_tokens - budget}
+
+    def carry_over():
+        kept, total = [], 0
+        for t, n in reversed(cur):
+            if total + n > overlap_tokens:
+                break
+            kept.insert(0, (t, n))
+            total += n
+        return kept, total
+
+    for kind, text, page in iter_units(pages):
+        if kind == "sentence" and cur_page is not None and page != cur_page:
+            # Chunks never span a page break, so the page they cite is exact;
+            # overlap is not carried onto the next page for the same reason.
+            if fresh:
+                yield emit()
+            cur, cur_tokens, fresh, cur_page = [], 0, 0, None
+        if kind == "heading":
+            if fresh:
+                yield emit()
+            section, cur, cur_tokens, fresh, cur_page = text, [], 0, 0, None
+            budget = max(max_tokens - count(section), max_tokens // 2)
+            continue
+        if kind == "break":
+            # Close a chunk at a paragraph end once it is reasonably full.
+            if fresh and cur_tokens >= budget * 3 // 4:
+                yield emit()
+                cur, cur_tokens = carry_over()
+                fresh, cur_page = 0, cur_page if cur else None
+            continue
+
+        n = count(text)
+        pieces = [(text, n)] if n <= budget else [(p, count(p)) for p in _split_long(text, budget, count)]
+        for piece, pn in pieces:
+            if fresh and cur_tokens + pn > budget:
+                yield emit()
+                cur, cur_tokens = carry_over()
+                fresh, cur_page = 0, cur_page if cur else None
+            while not fresh and cur and cur_tokens + pn > budget:
+                cur_tokens -= cur.pop(0)[1]
+            if cur_page is None:
+                cur_page = page
+            cur.append((piece, pn))
+            cur_tokens += pn
+            fresh += 1
+    if fresh:
+        yield emit()
+
+
+def fixed_slices(pages, size=500):
+    """The original 500-character slicer, kept as the benchmark baseline."""
+    for page_no, text in enumerate(pages, start=1):
+        for i in range(0, len(text), size):
+            chunk = text[i:i+size]
+            if chunk.strip():
+                yield {"text": chunk, "page": page_no, "section": "", "tokens": regex_token_count(chunk)}
+
+
+# ---- Benchmark ----
+def benchmark(pages, k=3, n_queries=200, model_name=None, seed=0):
+    """
+    Retrieval quality per token of the structure-aware chunker vs. the fixed slicer.
+
+    Queries are sentences sampled from the document; a query counts as answered
+    when one of the top-k chunks contains that whole sentence, i.e. the LLM
+    would see the complete answer. tokens/query is what would be sent to Groq.
+    """
+    import random
+    import numpy as np
+    import faiss
+    import embeddings
+
+    model_name = model_name or embeddings.DEFAULT_MODEL
+    count = get_token_counter(model_name)
+    sentences = [s for kind, s, _ in iter_units(pages) if kind == "sentence" and 8 <= len(s.split()) <= 40]
+    if not sentences:
+        raise ValueError("document has no usable sentences to query with")
+    queries = random.Random(seed).sample(sentences, min(n_queries, len(sentences)))
+    q_embs = np.asarray(embeddings.encode(queries, model_name), dtype="float32")
+    norm = lambda s: " ".join(s.split())
+
+    results = {}
+    strategies = {
+        "fixed-500-chars": lambda: list(fixed_slices(pages)),
+        "structured": lambda: list(iter_chunks(pages, count=count)),
+    }
+    for name, make in strategies.items():
+        t0 = time.perf_counter()
+        chunks = make()
+        chunk_s = time.perf_counter() - t0
+        embs = np.asarray(embeddings.encode([c["text"] for c in chunks], model_name), dtype="float32")
+        index = faiss.IndexFlatL2(embs.shape[1])
+        index.add(embs)
+        _, I = index.search(q_embs, k)
+        texts = [norm(c["text"]) for c in chunks]
+        answered = sum(any(norm(q) in texts[i] for i in row if i >= 0) for q, row in zip(queries, I))
+        tokens = sum(count(chunks[i]["text"]) for row in I for i in row if i >= 0) / len(queries)
+        results[name] = {
+            "chunks": len(chunks),
+            "chunk_ms": chunk_s * 1000,
+            "answered": answered / len(queries),
+            "tokens_per_query": tokens,
+            "answered_per_1k_tokens": 1000 * answered / len(queries) / tokens if tokens else 0.0,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    from pdf_extract import extract_pages
+
+    ap = argparse.ArgumentParser(description="Compare retrieval quality per token of chunking strategies.")
+    ap.add_argument("pdf")
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--queries", type=int, default=200)
+    args = ap.parse_args()
+    res = benchmark(extract_pages(args.pdf), k=args.k, n_queries=args.queries)
+    print(f"{'strategy':<18}{'chunks':>8}{'chunk ms':>10}{'answered':>10}{'tok/query':>11}{'per 1k tok':>12}")
+    for name, r in res.items():
+        print(f"{name:<18}{r['chunks']:>8}{r['chunk_ms']:>10.1f}{r['answered']:>10.3f}"
+              f"{r['tokens_per_query']:>11.1f}{r['answered_per_1k_tokens']:>12.3f}")
@@ -0,0 +1,187 @@
+# compact_vectors.py  fp16 / int8 embedding codes, memory-mapped so every session shares one copy
+import argparse
+import os
+import time
+
+import numpy as np
+
+CODECS = ("fp32", "fp16", "sq8")
+# Rows decoded to float32 at a time while scanning.
+BLOCK = 16384
+
+
+def encode(embs, codec="fp16"):
+    """
+    Arrays that store embs in the codec. sq8 keeps one uint8 per dimension
+    with per-dimension min / step, like FAISS's QT_8bit scalar quantizer.
+    Squared norms of the decoded vectors are kept for L2 scoring.
+    """
+    embs = np.ascontiguousarray(embs, dtype="float32")
+    if codec == "fp32":
+        arrays = {"codes": embs}
+    elif codec == "fp16":
+        arrays = {"codes": embs.astype("float16")}
+    elif codec == "sq8":
+        lo = embs.min(axis=0)
+        step = np.maximum((embs.max(axis=0) - lo) / 255.0, 1e-12).astype("float32")
+        codes = np.clip(np.rint((embs - lo) / step), 0, 255).astype("uint8")
+        arrays = {"codes": codes, "lo": lo.astype("float32"), "step": step}
+    else:
+        raise ValueError(f"Unknown codec: {codec}")
+    arrays["sqnorms"] = np.einsum("ij,ij->i", *(2 * [_decode(arrays, 0, len(embs), codec)]))
+    return arrays
+
+
+def _decode(arrays, start, end, codec):
+    codes = arrays["codes"][start:end]
+    if codec == "sq8":
+        return codes.astype("float32") * arrays["step"] + arrays["lo"]
+    return np.asarray(codes, dtype="float32")
+
+
+def save(directory, prefix, arrays):
+    """One .npy per array, written via temp file + rename so readers never see partial files."""
+    os.makedirs(directory, exist_ok=True)
+    for name, arr in arrays.items():
+        path = os.path.join(directory, f"{prefix}.{name}.npy")
+        tmp = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, arr)
+        os.replace(tmp, path)
+
+
+class CompactMatrix:
+    """
+    A read-only matrix of embedding codes. Opened with mmap, the codes live in
+    the OS page cache, so any number of sessions (or processes) searching the
+    same document share one physical copy.
+    """
+
+    def __init__(self, arrays, codec):
+        self.arrays = arrays
+        self.codec = codec
+
+    @classmethod
+    def from_embeddings(cls, embs, codec="fp16"):
+        return cls(encode(embs, codec), codec)
+
+    @classmethod
+    def open(cls, directory, prefix, codec):
+        names = ("codes", "sqnorms", "lo", "step") if codec == "sq8" else ("codes", "sqnorms")
+        paths = {n: os.path.join(directory, f"{prefix}.{n}.npy") for n in names}
+        if not all(os.path.exists(p) for p in paths.values()):
+            return None
+        # The small per-dimension arrays are read; the codes are mapped.
+        arrays = {n: np.load(p, mmap_mode="r" if n == "codes" else None) for n, p in paths.items()}
+        return cls(arrays, codec)
+
+    def __len__(self):
+        return len(self.arrays["codes"])
+
+    @property
+    def dim(self):
+        return self.arrays["codes"].shape[1]
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays.values())
+
+    def reconstruct(self, rows):
+        rows = np.asarray(rows, dtype="int64")
+        codes = np.asarray(self.arrays["codes"][rows])
+        if self.codec == "sq8":
+            return codes.astype("float32") * self.arrays["step"] + self.arrays["lo"]
+        return codes.astype("float32")
+
+    def search(self, q, k):
+        """(D, I) like a FAISS L2 index: squared distances and row numbers, -1 where fewer than k rows."""
+        q = np.ascontiguousarray(q, dtype="float32")
+        n, nq = len(self), len(q)
+        k_eff = min(k, n)
+        best_d = np.full((nq, k), np.inf, dtype="float32")
+        best_i = np.full((nq, k), -1, dtype="int64")
+        if not k_eff:
+            return best_d, best_i
+        qn = np.einsum("ij,ij->i", q, q)[:, None]
+        for start in range(0, n, BLOCK):
+            end = min(start + BLOCK, n)
+            x = _decode(self.arrays, start, end, self.codec)
+            d = self.arrays["sqnorms"][start:end][None, :] - 2 * q @ x.T + qn
+            cand_d = np.concatenate([best_d[:, :k_eff], d], axis=1)
+            cand_i = np.concatenate([best_i[:, :k_eff], np.broadcast_to(np.arange(start, end), d.shape)], axis=1)
+            top = np.argpartition(cand_d, k_eff - 1, axis=1)[:, :k_eff]
+            best_d[:, :k_eff] = np.take_along_axis(cand_d, top, axis=1)
+            best_i[:, :k_eff] = np.take_along_axis(cand_i, top, axis=1)
+        order = np.argsort(best_d[:, :k_eff], axis=1)
+        best_d[:, :k_eff] = np.take_along_axis(best_d[:, :k_eff], order, axis=1)
+        best_i[:, :k_eff] = np.take_along_axis(best_i[:, :k_eff], order, axis=1)
+        return np.maximum(best_d, 0), best_i
+
+
+# ---- Benchmark ----
+def _private_bytes():
+    """Resident minus file-backed shared pages of this process (Linux)."""
+    with open("/proc/self/statm") as f:
+        fields = f.read().split()
+    page = os.sysconf("SC_PAGE_SIZE")
+    return (int(fields[1]) - int(fields[2])) * page
+
+
+def benchmark(n=100_000, dim=384, n_queries=100, k=10, sessions=4, workdir="/tmp/compact_vectors_bench"):
+    """
+    RAM per 100k chunks and recall@k against exact fp32 search for each
+    storage mode: a private FAISS index per session (fp32 / fp16 / sq8) and
+    shared memory-mapped codes (fp16 / sq8) opened by `sessions` sessions.
+    """
+    import faiss
+
+    import vector_index
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((256, dim)).astype("float32")
+    xb = centers[rng.integers(0, 256, n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    xb /= np.linalg.norm(xb, axis=1, keepdims=True)
+    xq = xb[rng.choice(n, n_queries)] + 0.05 * rng.standard_normal((n_queries, dim)).astype("float32")
+    truth = vector_index.build_index(xb, "flat").search(xq, k)[1]
+    per_100k = 100_000 / n
+    rows = []
+
+    for codec in CODECS:
+        index = vector_index.build_index(xb, "flat", codec=codec)
+        t0 = time.perf_counter()
+        found = index.search(xq, k)[1]
+        ms = (time.perf_counter() - t0) * 1000 / n_queries
+        size = faiss.serialize_index(index).nbytes
+        rows.append({"mode": f"private {codec}", "mb_per_session": size * per_100k / 1e6,
+                     "mb_total": size * sessions * per_100k / 1e6,
+                     "recall": vector_index.recall_at_k(truth, found), "ms_per_query": ms})
+
+    for codec in ("fp16", "sq8"):
+        save(workdir, codec, encode(xb, codec))
+        before = _private_bytes()
+        mats = [CompactMatrix.open(workdir, codec, codec) for _ in range(sessions)]
+        for m in mats:
+            m.search(xq[:1], k)   # touch every page
+        private = max(_private_bytes() - before, 0)
+        t0 = time.perf_counter()
+        found = mats[0].search(xq, k)[1]
+        ms = (time.perf_counter() - t0) * 1000 / n_queries
+        codes = mats[0].arrays["codes"].nbytes
+        rows.append({"mode": f"shared mmap {codec}", "mb_per_session": private / sessions * per_100k / 1e6,
+                     "mb_total": (codes + private) * per_100k / 1e6,
+                     "recall": vector_index.recall_at_k(truth, found), "ms_per_query": ms})
+        del mats
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="RAM and recall of compact embedding storage modes.")
+    ap.add_argument("--n", type=int, default=100_000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--sessions", type=int, default=4)
+    ap.add_argument("-k", type=int, default=10)
+    args = ap.parse_args()
+    print(f"{args.n} vectors x {args.dim} dims, {args.sessions} sessions; MB scaled to 100k chunks")
+    print(f"{'mode':>18}{'MB/session':>12}{'MB total':>10}{'recall@' + str(args.k):>11}{'ms/query':>10}")
+    for r in benchmark(args.n, args.dim, k=args.k, sessions=args.sessions):
+        print(f"{r['mode']:>18}{r['mb_per_session']:>12.1f}{r['mb_total']:>10.1f}{r['recall']:>11.3f}"
+              f"{r['ms_per_query']:>10.2f}")
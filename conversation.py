@@ -0,0 +1,138 @@
+# conversation.py  bounded chat memory: recent window + rolling summary, packed into a token budget
+import os
+
+from chunking import regex_token_count
+
+# Messages kept verbatim; older ones are folded into the rolling summary.
+WINDOW = int(os.getenv("CHAT_WINDOW_MESSAGES", "8"))
+# Tokens the whole prompt (instructions, summary, history, context, question) may use.
+PROMPT_BUDGET = int(os.getenv("CHAT_PROMPT_BUDGET", "2500"))
+SUMMARY_TOKENS = 200
+# Share of what is left after the question that retrieved context may take before history.
+CONTEXT_SHARE = 0.6
+
+
+def truncate_tokens(text, max_tokens, count=regex_token_count):
+    """Longest prefix of text within max_tokens, cut at a word boundary."""
+    if count(text) <= max_tokens:
+        return text
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count(" ".join(words[:mid])) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo]) + " …" if lo else ""
+
+
+def extractive_summary(summary, messages, max_tokens=SUMMARY_TOKENS):
+    """Fallback summarizer: keeps the gist of each evicted user question, newest last."""
+    lines = [summary] if summary else []
+    lines += [f"User asked: {truncate_tokens(m['text'], 30)}" for m in messages if m["role"] == "user"]
+    text = "\n".join(lines)
+    # Drop the oldest lines first so the summary stays within budget.
+    while regex_token_count(text) > max_tokens and "\n" in text:
+        text = text.split("\n", 1)[1]
+    return truncate_tokens(text, max_tokens)
+
+
+class ConversationMemory:
+    """
+    Chat history with constant-size state: the last `window` messages
+    verbatim plus a rolling summary of everything older. `summarize(summary,
+    evicted_messages)` produces the new summary; it is only called when
+    messages leave the window, half a window at a time.
+    """
+
+    def __init__(self, window=WINDOW, summarize=None, count=regex_token_count):
+        self.window = window
+        self.summarize = summarize or extractive_summary
+        self.count = count
+        self.messages = []       # {"role", "text", "sources", "n"}
+        self.summary = ""
+        self.total = 0           # messages ever added; message "n" is its position
+
+    def __len__(self):
+        return self.total
+
+    def to_dict(self):
+        return {"window": self.window, "messages": self.messages, "summary": self.summary, "total": self.total}
+
+    @classmethod
+    def from_dict(cls, state, summarize=None, count=regex_token_count):
+        memory = cls(state["window"], summarize, count)
+        memory.messages = [dict(m, sources=list(m["sources"])) for m in state["messages"]]
+        memory.summary = state["summary"]
+        memory.total = state["total"]
+        return memory
+
+    def add(self, role, text, sources=None):
+        self.messages.append({"role": role, "text": text, "sources": list(sources or []), "n": self.total})
+        self.total += 1
+        if len(self.messages) > self.window:
+            cut = max(len(self.messages) - self.window // 2, 1)
+            evicted, self.messages = self.messages[:cut], self.messages[cut:]
+            try:
+                self.summary = self.summarize(self.summary, evicted)
+            except Exception:
+                self.summary = extractive_summary(self.summary, evicted)
+
+    def last_user_text(self):
+        return next((m["text"] for m in reversed(self.messages) if m["role"] == "user"), None)
+
+    def retrieval_queries(self, question):
+        """The question, plus the question read in light of the previous one for follow-ups."""
+        prev = self.last_user_text()
+        return [question, f"{prev} {question}"] if prev else [question]
+
+    # ---- Prompt packing ----
+    def build_prompt(self, question, passages, budget=PROMPT_BUDGET, reserve=0):
+        """
+        Prompt for the next answer within `budget` tokens (minus `reserve` for the
+        reply). The question always fits; then context passages in rank order
+        up to CONTEXT_SHARE of what is left; then the summary and the newest
+        turns; leftover room goes back to context. Returns (prompt, stats).
+        """
+        head = ("You are CareerCraft AI assistant.\n"
+                "Use the context and the conversation so far to answer the user's question.\n"
+                "Each context passage starts with its [source file p.page].\n")
+        tail = f"\nQuestion: {question}\nAnswer clearly for a student/job seeker:"
+        left = budget - reserve - self.count(head) - self.count(tail)
+
+        cost = [self.count(p) + 1 for p in passages]
+        ctx_budget = int(max(left, 0) * CONTEXT_SHARE)
+        n_ctx, used = 0, 0
+        while n_ctx < len(passages) and used + cost[n_ctx] <= ctx_budget:
+            used += cost[n_ctx]
+            n_ctx += 1
+        left -= used
+
+        summary = truncate_tokens(self.summary, max(min(SUMMARY_TOKENS, left), 0), self.count) if self.summary else ""
+        left -= self.count(summary)
+        turns = []
+        for m in reversed(self.messages):
+            line = f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['text']}"
+            c = self.count(line) + 1
+            if c > left:
+                break
+            turns.append(line)
+            left -= c
+        turns.reverse()
+
+        while n_ctx < len(passages) and cost[n_ctx] <= left:
+            left -= cost[n_ctx]
+            n_ctx += 1
+
+        parts = [head]
+        if summary:
+            parts.append(f"\nConversation summary:\n{summary}\n")
+        if turns:
+            parts.append("\nRecent conversation:\n" + "\n".join(turns) + "\n")
+        parts.append("\nContext:\n" + "\n".join(passages[:n_ctx]) + "\n")
+        parts.append(tail)
+        prompt = "".join(parts)
+        stats = {"tokens": self.count(prompt), "budget": budget - reserve, "passages": n_ctx,
+                 "dropped_passages": len(passages) - n_ctx, "turns": len(turns), "summary": bool(summary)}
+        return prompt, stats
@@ -0,0 +1,157 @@
+# embeddings.py  shared SentenceTransformer registry
+import os
+import threading
+import time
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+# Seconds a model may sit unused before it is dropped; 0 keeps models forever.
+IDLE_TTL = float(os.getenv("EMBED_MODEL_IDLE_TTL", "0"))
+
+
+def _load_model(name):
+    # Imported here so pages that never embed don't pay the torch import.
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+
+class ModelRegistry:
+    """One loaded embedding model per name per process, shared by all sessions."""
+
+    def __init__(self, idle_ttl=IDLE_TTL, loader=_load_model):
+        self.idle_ttl = idle_ttl
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._models = {}         # name -> [model, last_used]
+        self._name_locks = {}     # name -> lock held while loading
+        self._janitor = None
+        self._metrics = {
+            "loads": 0,
+            "hits": 0,
+            "evictions": 0,
+            "load_seconds": {},
+            "encode_calls": 0,
+            "encode_texts": 0,
+            "encode_seconds": 0.0,
+            "last_encode_seconds": 0.0,
+        }
+
+    # ---- Lookup ----
+    def get(self, name=DEFAULT_MODEL):
+        with self._lock:
+            entry = self._models.get(name)
+            if entry:
+                entry[1] = time.monotonic()
+                self._metrics["hits"] += 1
+                return entry[0]
+            name_lock = self._name_locks.setdefault(name, threading.Lock())
+
+        # Only one thread loads a given model; the others wait and reuse it.
+        with name_lock:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry:
+                    entry[1] = time.monotonic()
+                    self._metrics["hits"] += 1
+                    return entry[0]
+            t0 = time.perf_counter()
+            model = self._loader(name)
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self._models[name] = [model, time.monotonic()]
+                self._metrics["loads"] += 1
+                self._metrics["load_seconds"][name] = round(elapsed, 3)
+        self._start_janitor()
+        return model
+
+    def is_loaded(self, name=DEFAULT_MODEL):
+        with self._lock:
+            return name in self._models
+
+    def warm_up(self, names=(DEFAULT_MODEL,), background=True):
+        """Load models ahead of the first request; no-op for models already loaded."""
+        pending = [n for n in names if not self.is_loaded(n)]
+        if not pending:
+            return None
+        if not background:
+            for n in pending:
+                self.get(n)
+            return None
+        t = threading.Thread(target=lambda: [self.get(n) for n in pending],
+                             name="embed-warmup", daemon=True)
+        t.start()
+        return t
+
+    # ---- Encoding ----
+    def encode(self, texts, name=DEFAULT_MODEL, **kwargs):
+        model = self.get(name)
+        kwargs.setdefault("convert_to_numpy", True)
+        kwargs.setdefault("show_progress_bar", False)
+        t0 = time.perf_counter()
+        embs = model.encode(texts, **kwargs)
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            self._metrics["encode_calls"] += 1
+            self._metrics["encode_texts"] += len(texts)
+            self._metrics["encode_seconds"] += elapsed
+            self._metrics["last_encode_seconds"] = elapsed
+        return embs
+
+    # ---- Eviction ----
+    def evict_idle(self, now=None):
+        if self.idle_ttl <= 0:
+            return []
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            stale = [n for n, (_, used) in self._models.items() if now - used > self.idle_ttl]
+            for n in stale:
+                del self._models[n]
+            self._metrics["evictions"] += len(stale)
+        return stale
+
+    def evict(self, name):
+        with self._lock:
+            if self._models.pop(name, None) is not None:
+                self._metrics["evictions"] += 1
+
+    def _start_janitor(self):
+        if self.idle_ttl <= 0:
+            return
+        with self._lock:
+            if self._janitor is not None:
+                return
+            self._janitor = threading.Thread(target=self._janitor_loop, name="embed-janitor", daemon=True)
+        self._janitor.start()
+
+    def _janitor_loop(self):
+        while True:
+            time.sleep(max(self.idle_ttl / 2, 1.0))
+            self.evict_idle()
+
+    # ---- Metrics ----
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+            m["load_seconds"] = dict(m["load_seconds"])
+            m["loaded"] = sorted(self._models)
+        calls = m["encode_calls"]
+        m["avg_encode_seconds"] = m["encode_seconds"] / calls if calls else 0.0
+        return m
+
+
+registry = ModelRegistry()
+
+
+def get_model(name=DEFAULT_MODEL):
+    return registry.get(name)
+
+
+def encode(texts, name=DEFAULT_MODEL, **kwargs):
+    return registry.encode(texts, name, **kwargs)
+
+
+def warm_up(names=(DEFAULT_MODEL,), background=True):
+    return registry.warm_up(names, background)
+
+
+def stats():
+    return registry.stats()
@@ -0,0 +1,365 @@
+# groq_client.py  shared Groq chat client: pooled keep-alive session, retries, deadlines, metrics
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GROQ_ENDPOINT = os.getenv("GROQ_ENDPOINT", "https://api.groq.com/openai/v1/chat/completions")
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+
+MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+MAX_RETRIES = 3
+TIMEOUT = 30          # seconds per attempt
+DEADLINE = 90         # seconds per call, across all attempts
+BACKOFF = 0.5
+MAX_BACKOFF = 20
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GroqError(Exception):
+    def __init__(self, message, status=None, body=None):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+def retry_after_seconds(value):
+    """Parse a Retry-After header given as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+class GroqClient:
+    def __init__(self, api_key=None, endpoint=GROQ_ENDPOINT, max_concurrency=MAX_CONCURRENCY,
+                 max_retries=MAX_RETRIES, timeout=TIMEOUT, deadline=DEADLINE, cache=None):
+        self.api_key = api_key or os.getenv("GROQ_API_KEY")
+        self.cache = cache    # llm_cache.LLMCache consulted by chat() and stream_chat()
+        self.endpoint = endpoint
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.deadline = deadline
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=500)
+        self._ttfts = deque(maxlen=500)
+        self._metrics = {"calls": 0, "errors": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                         "streams": 0, "stream_fallbacks": 0, "last_tokens_per_s": 0.0}
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    def _backoff(self, attempt, resp=None):
+        if resp is not None:
+            wait = retry_after_seconds(resp.headers.get("Retry-After"))
+            if wait is not None:
+                return wait
+        return min(MAX_BACKOFF, BACKOFF * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    def post(self, payload, deadline=None, stream=False):
+        """
+        POST payload with retries on connection errors, timeouts, 429 and 5xx.
+        Returns the successful requests.Response; raises GroqError otherwise.
+        With stream=True the concurrency slot stays taken until the caller
+        calls release() after reading the body.
+        """
+        if not self.api_key:
+            raise GroqError("GROQ_API_KEY is not set")
+        end = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise GroqError("Groq request exceeded its deadline")
+            if not self._slots.acquire(timeout=remaining):
+                raise GroqError("Timed out waiting for a free Groq connection slot")
+            resp, error = None, None
+            try:
+                resp = self.session.post(self.endpoint, headers=self._headers(), json=payload,
+                                         timeout=min(self.timeout, remaining), stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except BaseException:
+                self._slots.release()
+                raise
+
+            if resp is not None and resp.status_code == 200:
+                if not stream:
+                    self._slots.release()
+                return resp
+            self._slots.release()
+            retryable = error is not None or resp.status_code in RETRY_STATUSES
+            if not retryable or attempt >= self.max_retries:
+                if error is not None:
+                    raise GroqError(f"Groq request failed: {error}") from error
+                raise GroqError(f"Groq API error {resp.status_code}: {resp.text[:500]}",
+                                status=resp.status_code, body=resp.text)
+            wait = self._backoff(attempt, resp)
+            if resp is not None:
+                resp.close()
+            if time.monotonic() + wait >= end:
+                raise GroqError("Groq request would exceed its deadline while backing off",
+                                status=resp.status_code if resp is not None else None)
+            with self._lock:
+                self._metrics["retries"] += 1
+            time.sleep(wait)
+            attempt += 1
+
+    def complete(self, messages, model=DEFAULT_MODEL, temperature=0.7, max_tokens=None,
+                 deadline=None, **extra):
+        """Full chat completion response as a dict."""
+        payload = {"model": model, "messages": messages, "temperature": temperature, **extra}
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        t0 = time.perf_counter()
+        try:
+            resp = self.post(payload, deadline)
+            try:
+                data = resp.json()
+            except ValueError as e:
+                raise GroqError(f"Groq returned invalid JSON: {resp.text[:500]}", status=resp.status_code) from e
+        except GroqError:
+            with self._lock:
+                self._metrics["calls"] += 1
+                self._metrics["errors"] += 1
+            raise
+        elapsed = time.perf_counter() - t0
+        usage = data.get("usage") or {}
+        with self._lock:
+            self._metrics["calls"] += 1
+            self._metrics["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            self._metrics["completion_tokens"] += usage.get("completion_tokens", 0)
+            self._latencies.append(elapsed)
+        return data
+
+    def chat(self, prompt, model=DEFAULT_MODEL, temperature=0.7, max_tokens=None, deadline=None,
+             use_cache=True, **extra):
+        """Send a single user prompt (or a list of messages) and return the reply text."""
+        messages = prompt if isinstance(prompt, list) else [{"role": "user", "content": prompt}]
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            hit = cache.get(model, messages, temperature, max_tokens, **extra)
+            if hit is not None:
+                return hit
+        data = self.complete(messages, model, temperature, max_tokens, deadline, **extra)
+        try:
+            text = data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise GroqError(f"Unexpected Groq response: {str(data)[:500]}", body=data)
+        if cache is not None:
+            cache.put(model, messages, temperature, max_tokens, text, **extra)
+        return text
+
+    def release(self):
+        self._slots.release()
+
+    def stream_chat(self, prompt, model=DEFAULT_MODEL, temperature=0.7, max_tokens=None, deadline=None,
+                    fallback=True, stats=None, use_cache=True, **extra):
+        """
+        Yield reply text pieces as Groq streams them (SSE, stream=true). If the
+        stream cannot be opened (connection error or 5xx) and fallback is set,
+        yields the whole reply of a normal call instead. A cached reply is yielded in one piece. stats
+        (a dict) receives ttft_s, total_s, tokens, tokens_per_s, streamed and cached.
+        """
+        messages = prompt if isinstance(prompt, list) else [{"role": "user", "content": prompt}]
+        stats = {} if stats is None else stats
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            t0 = time.perf_counter()
+            hit = cache.get(model, messages, temperature, max_tokens, **extra)
+            if hit is not None:
+                elapsed = time.perf_counter() - t0
+                stats.update(ttft_s=elapsed, total_s=elapsed, tokens=None, tokens_per_s=None,
+                             streamed=False, cached=True)
+                yield hit
+                return
+        payload = {"model": model, "messages": messages, "temperature": temperature, "stream": True, **extra}
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        t0 = time.perf_counter()
+        end = time.monotonic() + (deadline or self.deadline)
+        try:
+            resp = self.post(payload, deadline, stream=True)
+        except GroqError as e:
+            remaining = end - time.monotonic()
+            # Only a failed transport or a server error may go better without
+            # streaming; a 4xx would be rejected again, and the retry gets
+            # whatever is left of this call's deadline, not a fresh one.
+            if not fallback or (e.status is not None and e.status < 500) or remaining <= 0:
+                raise
+            with self._lock:
+                self._metrics["stream_fallbacks"] += 1
+            text = self.chat(messages, model, temperature, max_tokens, remaining, use_cache, **extra)
+            stats.update(ttft_s=time.perf_counter() - t0, total_s=time.perf_counter() - t0,
+                         tokens=None, tokens_per_s=None, streamed=False, cached=False)
+            yield text
+            return
+
+        ttft, pieces, usage, done = None, [], {}, False
+        try:
+            # chunk_size=None hands over data as it arrives instead of buffering 512 bytes.
+            for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+                if time.monotonic() > end:
+                    raise GroqError("Groq stream exceeded its deadline")
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    done = True
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    continue
+                usage = (chunk.get("x_groq") or {}).get("usage") or chunk.get("usage") or usage
+                choices = chunk.get("choices") or [{}]
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    if ttft is None:
+                        ttft = time.perf_counter() - t0
+                    pieces.append(delta)
+                    yield delta
+        except requests.RequestException as e:
+            raise GroqError(f"Groq stream failed: {e}") from e
+        finally:
+            resp.close()
+            self.release()
+            total = time.perf_counter() - t0
+            tokens = usage.get("completion_tokens", len(pieces))
+            gen_s = total - (ttft or 0)
+            stats.update(ttft_s=ttft, total_s=total, tokens=tokens,
+                         tokens_per_s=tokens / gen_s if gen_s > 0 else None, streamed=True, cached=False)
+            # Only complete replies are cached, not streams the reader abandoned.
+            if cache is not None and done:
+                cache.put(model, messages, temperature, max_tokens, "".join(pieces), **extra)
+            with self._lock:
+                self._metrics["calls"] += 1
+                self._metrics["streams"] += 1
+                self._metrics["prompt_tokens"] += usage.get("prompt_tokens", 0)
+                self._metrics["completion_tokens"] += tokens
+                self._metrics["last_tokens_per_s"] = stats["tokens_per_s"] or 0.0
+                self._latencies.append(total)
+                if ttft is not None:
+                    self._ttfts.append(ttft)
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+            lat = sorted(self._latencies)
+            ttfts = sorted(self._ttfts)
+        if lat:
+            m["p50_s"] = lat[len(lat) // 2]
+            m["p95_s"] = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+        if ttfts:
+            m["ttft_p50_s"] = ttfts[len(ttfts) // 2]
+        return m
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key=None, endpoint=GROQ_ENDPOINT):
+    """
+    Process-wide client per (api key, endpoint), so every app reuses one
+    connection pool, backed by the shared response cache unless LLM_CACHE=0.
+    """
+    from llm_cache import default_cache
+    api_key = api_key or os.getenv("GROQ_API_KEY")
+    with _clients_lock:
+        client = _clients.get((api_key, endpoint))
+        if client is None:
+            client = _clients[(api_key, endpoint)] = GroqClient(api_key, endpoint, cache=default_cache())
+        return client
+
+
+def map_concurrent(fn, items, max_workers=MAX_CONCURRENCY):
+    """
+    Run fn(item) for every item on a bounded thread pool and yield
+    (index, result, error, seconds) as each call completes. The client's
+    own semaphore and Retry-After handling keep the burst within rate limits.
+    """
+    items = list(items)
+    if not items:
+        return
+
+    def timed(i, item):
+        t0 = time.perf_counter()
+        try:
+            return i, fn(item), None, time.perf_counter() - t0
+        except Exception as e:
+            return i, None, e, time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        futures = [pool.submit(timed, i, item) for i, item in enumerate(items)]
+        for fut in as_completed(futures):
+            yield fut.result()
+
+
+if __name__ == "__main__":
+    # Smoke test against a local stub server: one 429 with Retry-After, one 503,
+    # then success, then a streamed reply.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    script = [(429, {"Retry-After": "1"}), (503, {}), (200, {})]
+
+    class Stub(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if req.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                events = [{"choices": [{"delta": {"content": w}}]} for w in ["po", "ng", "!"]]
+                for event in [*map(json.dumps, events), "[DONE]"]:
+                    raw = f"data: {event}\n\n".encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(raw), raw))
+                    time.sleep(0.1)
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            status, headers = script.pop(0) if script else (200, {})
+            body = {"choices": [{"message": {"content": "pong"}}],
+                    "usage": {"prompt_tokens": 3, "completion_tokens": 1}} if status == 200 else {"error": status}
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = GroqClient("stub-key", f"http://127.0.0.1:{server.server_port}/v1/chat/completions")
+    t0 = time.perf_counter()
+    print("reply:", client.chat("ping"), f"in {time.perf_counter() - t0:.2f}s")
+    stream_stats = {}
+    print("streamed:", list(client.stream_chat("ping", stats=stream_stats)), stream_stats)
+    print("stats:", client.stats())
+    server.shutdown()
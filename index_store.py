@@ -0,0 +1,195 @@
+# index_store.py  content-addressed on-disk cache of chunks, embeddings (plus compact codes) and FAISS indexes
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import faiss
+
+import compact_vectors
+from compact_vectors import CompactMatrix
+from utils import CACHE_DIR
+
+INDEX_DIR = os.path.join(CACHE_DIR, "indexes")
+# Total bytes the store may occupy before least-recently-used entries are dropped.
+MAX_BYTES = int(os.getenv("INDEX_STORE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+CHUNKS_FILE = "chunks.json"
+EMBS_FILE = "embs.npy"
+INDEX_FILE = "index.faiss"
+META_FILE = "meta.json"
+
+
+def make_key(data, model_name, **params):
+    """SHA-256 over the document bytes, the chunking params and the embedding model."""
+    h = hashlib.sha256()
+    h.update(data)
+    h.update(b"\0")
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+class CachedIndex:
+    """A stored entry; chunks, embeddings and index are loaded on first access."""
+
+    def __init__(self, path):
+        self.path = path
+        self._chunks = None
+        self._embs = None
+        self._index = None
+        self._compact = {}
+
+    @property
+    def chunks(self):
+        if self._chunks is None:
+            with open(os.path.join(self.path, CHUNKS_FILE), encoding="utf-8") as f:
+                self._chunks = json.load(f)
+        return self._chunks
+
+    @property
+    def embs(self):
+        if self._embs is None:
+            self._embs = np.load(os.path.join(self.path, EMBS_FILE), mmap_mode="r")
+        return self._embs
+
+    @property
+    def index(self):
+        if self._index is None:
+            path = os.path.join(self.path, INDEX_FILE)
+            if not os.path.exists(path):
+                return None
+            try:
+                self._index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                # Not every index type can be memory-mapped.
+                self._index = faiss.read_index(path)
+        return self._index
+
+    def compact(self, codec):
+        """
+        The embeddings as a memory-mapped CompactMatrix in codec, encoded and
+        written next to embs.npy on first use. Every session opening the same
+        entry shares the mapped pages.
+        """
+        matrix = self._compact.get(codec)
+        if matrix is None:
+            prefix = f"embs.{codec}"
+            matrix = CompactMatrix.open(self.path, prefix, codec)
+            if matrix is None:
+                compact_vectors.save(self.path, prefix, compact_vectors.encode(self.embs, codec))
+                matrix = CompactMatrix.open(self.path, prefix, codec)
+            self._compact[codec] = matrix
+        return matrix
+
+
+class IndexStore:
+    def __init__(self, root=INDEX_DIR, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def _touch(self, path):
+        meta_path = os.path.join(path, META_FILE)
+        try:
+            now = time.time()
+            os.utime(meta_path, (now, now))
+        except OSError:
+            pass
+
+    def get(self, key):
+        path = self._path(key)
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(path)
+        return CachedIndex(path)
+
+    def put(self, key, chunks, embs, index=None, **meta):
+        path = self._path(key)
+        if os.path.exists(os.path.join(path, META_FILE)):
+            self._touch(path)
+            return CachedIndex(path)
+
+        # Write into a temp dir and rename so readers never see a partial entry.
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            with open(os.path.join(tmp, CHUNKS_FILE), "w", encoding="utf-8") as f:
+                json.dump(chunks, f)
+            np.save(os.path.join(tmp, EMBS_FILE), np.ascontiguousarray(embs, dtype="float32"))
+            if index is not None:
+                faiss.write_index(index, os.path.join(tmp, INDEX_FILE))
+            meta = dict(meta, n_chunks=len(chunks), dim=int(embs.shape[1]), created=time.time())
+            with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            try:
+                os.rename(tmp, path)
+            except OSError:
+                # Another worker stored the same key first.
+                shutil.rmtree(tmp, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.evict(keep=key)
+        return CachedIndex(path)
+
+    def entries(self):
+        """(key, last_used, size_bytes) for every complete entry, oldest first."""
+        out = []
+        for key in os.listdir(self.root):
+            path = self._path(key)
+            meta_path = os.path.join(path, META_FILE)
+            if key.startswith(".") or not os.path.exists(meta_path):
+                continue
+            out.append((key, os.path.getmtime(meta_path), _dir_size(path)))
+        out.sort(key=lambda e: e[1])
+        return out
+
+    def evict(self, keep=None):
+        """Drop least-recently-used entries until the store fits in max_bytes."""
+        removed = []
+        with self._lock:
+            entries = self.entries()
+            total = sum(e[2] for e in entries)
+            for key, _, size in entries:
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                shutil.rmtree(self._path(key), ignore_errors=True)
+                total -= size
+                removed.append(key)
+        return removed
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(e[2] for e in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
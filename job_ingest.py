@@ -0,0 +1,286 @@
+# job_ingest.py  offline job-posting ingestion: local HTML/JSON dump -> ranked trending skills per domain
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from skill_taxonomy import TaxonomyStore, get_taxonomy
+from utils import CACHE_DIR
+
+DB_PATH = os.path.join(CACHE_DIR, "job_postings.sqlite3")
+TRENDING_PATH = os.getenv("TRENDING_SKILLS_PATH", os.path.join(CACHE_DIR, "trending_skills.json"))
+POSTING_EXTS = (".html", ".htm", ".json", ".jsonl")
+# A mention this many days old counts half as much as one from today.
+HALF_LIFE_DAYS = float(os.getenv("TRENDING_HALF_LIFE_DAYS", "90"))
+TOP_K = 100
+MIN_MENTIONS = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    postings INTEGER NOT NULL,
+    ingested REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mentions (
+    path TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    skill TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (path, domain, skill, day)
+);
+CREATE INDEX IF NOT EXISTS mentions_domain ON mentions(domain);
+"""
+
+
+# ---- Parsing ----
+def _parse_day(value):
+    """Day ordinal of an ISO date / datetime string or a unix timestamp, or None."""
+    if value in (None, ""):
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.date.fromtimestamp(value).toordinal()
+        return datetime.date.fromisoformat(str(value).strip()[:10]).toordinal()
+    except (ValueError, OSError, OverflowError):
+        return None
+
+
+def _from_record(rec):
+    if not isinstance(rec, dict):
+        return None
+    text = " ".join(str(rec.get(k) or "") for k in ("title", "description", "requirements", "skills"))
+    date = next((rec[k] for k in ("date_posted", "posted_at", "date", "created_at") if rec.get(k)), None)
+    return {"title": rec.get("title") or "", "text": text, "domain": rec.get("domain"), "day": _parse_day(date)}
+
+
+def _from_html(raw):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(raw, "html.parser")
+    for tag in soup(["script", "style", "nav", "footer"]):
+        tag.decompose()
+    title = soup.find("h1") or soup.title
+    date = None
+    if soup.find("time", datetime=True):
+        date = soup.find("time", datetime=True)["datetime"]
+    else:
+        meta = soup.find("meta", attrs={"name": "date_posted"}) or soup.find("meta", property="article:published_time")
+        date = meta.get("content") if meta else None
+    return {"title": title.get_text(" ", strip=True) if title else "", "text": soup.get_text(" ", strip=True),
+            "domain": None, "day": _parse_day(date)}
+
+
+def iter_postings(path):
+    """Yield postings from one file; JSONL is read line by line, JSON may hold one posting or a list."""
+    lower = path.lower()
+    if lower.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        posting = _from_record(json.loads(line))
+                    except ValueError:
+                        continue
+                    if posting:
+                        yield posting
+    elif lower.endswith(".json"):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            data = json.load(f)
+        if not isinstance(data, (dict, list)):
+            raise ValueError(f"expected a JSON object or list, got {type(data).__name__}")
+        for rec in data if isinstance(data, list) else data.get("jobs", [data]):
+            posting = _from_record(rec)
+            if posting:
+                yield posting
+    else:
+        with open(path, "rb") as f:
+            yield _from_html(f.read())
+
+
+def iter_files(root):
+    for dirpath, _, files in os.walk(root):
+        for name in sorted(files):
+            if name.lower().endswith(POSTING_EXTS):
+                yield os.path.join(dirpath, name)
+
+
+# ---- Ingestion ----
+class Ingestor:
+    """
+    Extracts taxonomy skills from each posting and keeps per-file mention
+    counts in SQLite, so a rerun only reads files that are new or changed, a
+    changed file replaces its own earlier contribution and a deleted file
+    takes its contribution with it.
+    """
+
+    def __init__(self, db_path=DB_PATH, taxonomy=None, reset=False):
+        self.taxonomy = taxonomy or get_taxonomy()
+        if self.taxonomy is None:
+            raise RuntimeError("No skill taxonomy available; set SKILL_TAXONOMY_PATH.")
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.matcher = self.taxonomy.matcher()
+        self._check_version(reset)
+
+    def _check_version(self, reset):
+        # Mentions extracted with another taxonomy would mix vocabularies; start over.
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'taxonomy'").fetchone()
+        if reset or (row and row[0] != self.taxonomy.version):
+            self.conn.execute("DELETE FROM mentions")
+            self.conn.execute("DELETE FROM files")
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('taxonomy', ?)", (self.taxonomy.version,))
+        self.conn.commit()
+
+    def classify(self, posting, skills):
+        """The posting's own domain if the taxonomy knows it, else the domain its skills weigh most in."""
+        if posting.get("domain") in self.taxonomy.by_domain:
+            return posting["domain"]
+        scores = {}
+        for s in skills:
+            for domain, w in self.taxonomy.skills[s]["domains"].items():
+                scores[domain] = scores.get(domain, 0.0) + w
+        return max(scores, key=scores.get) if scores else None
+
+    def ingest_file(self, path, default_day):
+        counts, postings = {}, 0
+        for posting in iter_postings(path):
+            postings += 1
+            skills, _ = self.matcher.match(f"{posting['title']} {posting['text']}", threshold=100)
+            domain = self.classify(posting, skills)
+            if domain is None:
+                continue
+            day = posting["day"] or default_day
+            for s in skills:
+                key = (domain, s, day)
+                counts[key] = counts.get(key, 0) + 1
+        return postings, counts
+
+    def run(self, root, on_file=None):
+        stats = {"seen": 0, "ingested": 0, "skipped": 0, "failed": 0, "removed": 0, "postings": 0}
+        known = {p: (m, s) for p, m, s in self.conn.execute("SELECT path, mtime_ns, size FROM files")}
+        seen = set()
+        t0 = time.perf_counter()
+        for path in iter_files(root):
+            stats["seen"] += 1
+            st = os.stat(path)
+            rel = os.path.relpath(path, root)
+            seen.add(rel)
+            if known.get(rel) == (st.st_mtime_ns, st.st_size):
+                stats["skipped"] += 1
+                continue
+            try:
+                postings, counts = self.ingest_file(path, datetime.date.fromtimestamp(st.st_mtime).toordinal())
+            except (OSError, ValueError) as e:
+                stats["failed"] += 1
+                print(f"skipping {rel}: {e}", file=sys.stderr)
+                continue
+            with self.conn:
+                self.conn.execute("DELETE FROM mentions WHERE path = ?", (rel,))
+                self.conn.executemany("INSERT INTO mentions VALUES (?, ?, ?, ?, ?)",
+                                      ((rel, d, s, day, n) for (d, s, day), n in counts.items()))
+                self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                                  (rel, st.st_mtime_ns, st.st_size, postings, time.time()))
+            stats["ingested"] += 1
+            stats["postings"] += postings
+            if on_file:
+                on_file(rel, stats)
+        # Files gone from the dump since the last run.
+        gone = [(rel,) for rel in known if rel not in seen]
+        with self.conn:
+            self.conn.executemany("DELETE FROM mentions WHERE path = ?", gone)
+            self.conn.executemany("DELETE FROM files WHERE path = ?", gone)
+        stats["removed"] = len(gone)
+        stats["wall_s"] = time.perf_counter() - t0
+        return stats
+
+    def rank(self, today=None, half_life=HALF_LIFE_DAYS, top_k=TOP_K, min_mentions=MIN_MENTIONS):
+        """domain -> [{"skill", "mentions", "score", "last_seen"}] by recency-weighted frequency."""
+        today = today or datetime.date.today().toordinal()
+        agg = {}
+        for domain, skill, day, n in self.conn.execute(
+                "SELECT domain, skill, day, SUM(n) FROM mentions GROUP BY domain, skill, day"):
+            a = agg.setdefault(domain, {}).setdefault(skill, [0, 0.0, day])
+            a[0] += n
+            a[1] += n * 0.5 ** (max(today - day, 0) / half_life)
+            a[2] = max(a[2], day)
+        ranked = {}
+        for domain, skills in agg.items():
+            rows = sorted(((s, m, sc, last) for s, (m, sc, last) in skills.items() if m >= min_mentions),
+                          key=lambda r: (-r[2], r[0]))[:top_k]
+            ranked[domain] = [{"skill": s, "mentions": m, "score": round(sc, 3),
+                               "last_seen": datetime.date.fromordinal(last).isoformat()} for s, m, sc, last in rows]
+        return ranked
+
+    def publish(self, path=TRENDING_PATH, **rank_kw):
+        """Write the ranked lists atomically; get_latest_skills picks the new file up on its own."""
+        ranked = self.rank(**rank_kw)
+        (postings,) = self.conn.execute("SELECT COALESCE(SUM(postings), 0) FROM files").fetchone()
+        out = {"generated": datetime.datetime.now().isoformat(timespec="seconds"),
+               "taxonomy": self.taxonomy.version, "postings": postings, "domains": ranked}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=1)
+        os.replace(tmp, path)
+        return out
+
+
+# ---- Serving ----
+def load_trending(path):
+    """domain -> tuple of skill names, ready to hand out without copying."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    # A wrong-shaped file must fail as ValueError, which TaxonomyStore treats as "keep the old snapshot".
+    domains = data.get("domains", {}) if isinstance(data, dict) else None
+    if not isinstance(domains, dict):
+        raise ValueError(f"{path}: expected {{\"domains\": {{domain: [rows]}}}}")
+    ranked = {}
+    for domain, rows in domains.items():
+        if not isinstance(rows, list) or not all(isinstance(r, dict) and isinstance(r.get("skill"), str) for r in rows):
+            raise ValueError(f"{path}: domain {domain!r} is not a list of {{\"skill\": ...}} rows")
+        ranked[domain] = tuple(r["skill"] for r in rows)
+    return ranked
+
+
+_trending = TaxonomyStore(TRENDING_PATH, loader=load_trending)
+
+
+def get_trending(domain):
+    """Ranked trending skills for a domain from the last published run, or None."""
+    ranked = _trending.get()
+    return ranked.get(domain) if ranked else None
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Ingest a local dump of job postings and publish trending skills.")
+    ap.add_argument("input", help="directory of .html/.json/.jsonl job postings")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--out", default=TRENDING_PATH)
+    ap.add_argument("--half-life", type=float, default=HALF_LIFE_DAYS, help="recency half-life in days")
+    ap.add_argument("--full", action="store_true", help="forget earlier runs and re-read every file")
+    args = ap.parse_args()
+
+    ing = Ingestor(args.db, reset=args.full)
+
+    def progress(rel, stats):
+        if stats["ingested"] % 100 == 0:
+            print(f"  {stats['ingested']} files, {stats['postings']} postings...", file=sys.stderr)
+
+    s = ing.run(args.input, on_file=progress)
+    rate = s["postings"] / s["wall_s"] if s["wall_s"] > 0 else 0.0
+    print(f"{s['seen']} files: {s['ingested']} ingested, {s['skipped']} unchanged, {s['failed']} failed, "
+          f"{s['removed']} removed; {s['postings']} postings in {s['wall_s']:.1f}s ({rate:.0f} postings/s)")
+    out = ing.publish(args.out, half_life=args.half_life)
+    for domain, rows in sorted(out["domains"].items()):
+        print(f"  {domain}: {', '.join(r['skill'] for r in rows[:8])}")
+    print(f"trending skills written to {args.out}")
@@ -0,0 +1,188 @@
+# job_matcher.py  resume -> job matching over a FAISS index of job descriptions, reranked by skill overlap
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+import embeddings
+import vector_index
+from index_store import make_key
+from job_ingest import iter_files, iter_postings
+from skill_taxonomy import get_taxonomy
+
+JOBS_PATH = os.getenv("JOB_CORPUS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      "data", "jobs.jsonl"))
+# Final score = ALPHA * embedding similarity + (1 - ALPHA) * share of the job's skills on the resume.
+ALPHA = 0.7
+CANDIDATES = 50
+DESCRIPTION_CHARS = 600
+
+
+def iter_jobs(path=JOBS_PATH):
+    """Job records from a JSONL/JSON file or a directory of posting files."""
+    files = [path] if os.path.isfile(path) else iter_files(path)
+    for f in files:
+        if f.lower().endswith(".jsonl"):
+            with open(f, "r", encoding="utf-8", errors="replace") as fh:
+                for line in fh:
+                    if line.strip():
+                        yield json.loads(line)
+        elif f.lower().endswith(".json"):
+            with open(f, "r", encoding="utf-8", errors="replace") as fh:
+                data = json.load(fh)
+            yield from data if isinstance(data, list) else data.get("jobs", [data])
+        else:
+            for p in iter_postings(f):
+                yield {"title": p["title"], "description": p["text"]}
+
+
+def corpus_fingerprint(path):
+    """Cheap identity of the corpus files (path, size, mtime) for the index cache key."""
+    files = [path] if os.path.isfile(path) else sorted(iter_files(path))
+    h = hashlib.sha256()
+    for f in files:
+        st = os.stat(f)
+        h.update(f"{os.path.abspath(f)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.digest()
+
+
+def _job_text(job):
+    return f"{job.get('title', '')}. {job.get('description', '')}"
+
+
+class JobMatcher:
+    """
+    Jobs are embedded and indexed once; a query embeds the resume, pulls the
+    nearest CANDIDATES jobs from FAISS and reranks them by how many of each
+    job's skills the resume covers.
+    """
+
+    def __init__(self, jobs, index, model_name=embeddings.DEFAULT_MODEL,
+                 nprobe=vector_index.DEFAULT_NPROBE, ef_search=vector_index.DEFAULT_EF_SEARCH):
+        self.jobs = jobs
+        self.index = index
+        self.model_name = model_name
+        self.skill_sets = [frozenset(j.get("skills") or ()) for j in jobs]
+        vector_index.set_search_params(index, nprobe, ef_search)
+
+    def __len__(self):
+        return len(self.jobs)
+
+    @classmethod
+    def build(cls, path=JOBS_PATH, model_name=embeddings.DEFAULT_MODEL, store=None, kind="auto"):
+        """Load from the index store when this corpus was already embedded, else embed and store it."""
+        tax = get_taxonomy()
+        key = make_key(corpus_fingerprint(path), model_name, corpus="jobs", kind=kind,
+                       taxonomy=tax.version if tax else None)
+        cached = store.get(key) if store else None
+        if cached is not None and cached.index is not None:
+            return cls(cached.chunks, cached.index, model_name)
+
+        jobs = []
+        for i, job in enumerate(iter_jobs(path)):
+            text = _job_text(job)
+            skills = tax.matcher().match(text, threshold=100)[0] if tax else []
+            jobs.append({
+                "id": job.get("id") or f"job-{i}",
+                "title": job.get("title") or "Untitled role",
+                "company": job.get("company") or "",
+                "location": job.get("location") or "",
+                "domain": job.get("domain") or "",
+                "description": (job.get("description") or "")[:DESCRIPTION_CHARS],
+                "skills": skills,
+            })
+        if not jobs:
+            raise ValueError(f"No job descriptions found in {path}")
+        embs = embeddings.encode([_job_text(j) for j in jobs], model_name, normalize_embeddings=True,
+                                 batch_size=64)
+        embs = np.ascontiguousarray(embs, dtype="float32")
+        index = vector_index.build_index(embs, kind)
+        if store:
+            store.put(key, jobs, embs, index, corpus=os.path.basename(path))
+        return cls(jobs, index, model_name)
+
+    # ---- Matching ----
+    def resume_skills(self, text):
+        tax = get_taxonomy()
+        return set(tax.matcher().match(text, threshold=100)[0]) if tax else set()
+
+    def match(self, resume_text, k=5, candidates=CANDIDATES, alpha=ALPHA, timings=None):
+        t0 = time.perf_counter()
+        q = embeddings.encode([resume_text], self.model_name, normalize_embeddings=True)
+        t1 = time.perf_counter()
+        skills = self.resume_skills(resume_text)
+        t2 = time.perf_counter()
+        hits = self.match_vector(np.asarray(q, dtype="float32"), skills, k, candidates, alpha)
+        t3 = time.perf_counter()
+        if timings is not None:
+            timings.update(encode_ms=(t1 - t0) * 1000, skills_ms=(t2 - t1) * 1000,
+                           search_ms=(t3 - t2) * 1000, total_ms=(t3 - t0) * 1000)
+        return hits
+
+    def match_vector(self, q, resume_skills, k=5, candidates=CANDIDATES, alpha=ALPHA):
+        """Top-k jobs for an already-embedded resume (1 x dim, L2-normalized)."""
+        D, I = self.index.search(q, min(max(k, candidates), len(self.jobs)))
+        hits = []
+        for d, i in zip(D[0], I[0]):
+            if i < 0:
+                continue
+            # Unit vectors: squared L2 distance d = 2 - 2 * cosine.
+            sim = max(0.0, 1.0 - float(d) / 2)
+            job_skills = self.skill_sets[i]
+            shared = job_skills & resume_skills
+            overlap = len(shared) / len(job_skills) if job_skills else 0.0
+            hits.append((alpha * sim + (1 - alpha) * overlap, sim, overlap, int(i), shared))
+        hits.sort(key=lambda h: -h[0])
+        return [dict(self.jobs[i], score=score, similarity=sim, skill_overlap=overlap,
+                     matched_skills=sorted(shared), missing_skills=sorted(self.skill_sets[i] - shared))
+                for score, sim, overlap, i, shared in hits[:k]]
+
+
+# ---- Benchmark ----
+def _synthetic(n_jobs, dim, n_skills=2000, skills_per_job=8, n_clusters=200, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype("float32")
+    embs = centers[rng.integers(0, n_clusters, n_jobs)] + 0.5 * rng.standard_normal((n_jobs, dim)).astype("float32")
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    names = [f"skill-{i}" for i in range(n_skills)]
+    jobs = [{"id": f"job-{i}", "title": f"Job {i}", "skills": [names[s] for s in rng.choice(n_skills, skills_per_job)]}
+            for i in range(n_jobs)]
+    return jobs, embs, names, rng
+
+
+def benchmark(n_jobs=100_000, dim=384, n_queries=200, kinds=("flat", "auto"), k=5):
+    jobs, embs, names, rng = _synthetic(n_jobs, dim)
+    queries = embs[rng.choice(n_jobs, n_queries)] + 0.3 * rng.standard_normal((n_queries, dim)).astype("float32")
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    resume_skills = [set(rng.choice(names, 15)) for _ in range(n_queries)]
+    rows = []
+    for kind in kinds:
+        t0 = time.perf_counter()
+        index = vector_index.build_index(embs, kind)
+        build_s = time.perf_counter() - t0
+        matcher = JobMatcher(jobs, index)
+        lat = []
+        for q, skills in zip(queries, resume_skills):
+            t0 = time.perf_counter()
+            matcher.match_vector(q[None, :], skills, k)
+            lat.append((time.perf_counter() - t0) * 1000)
+        lat = np.array(lat)
+        rows.append({"kind": vector_index.index_kind(index), "jobs": n_jobs, "build_s": build_s,
+                     "p50_ms": float(np.percentile(lat, 50)), "p95_ms": float(np.percentile(lat, 95))})
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark job matching latency (search + skill rerank).")
+    ap.add_argument("--jobs", type=int, default=100_000)
+    ap.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeds to 384 dims")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--kinds", default="flat,auto")
+    args = ap.parse_args()
+    print(f"{'index':>8}{'jobs':>9}{'build s':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    for r in benchmark(args.jobs, args.dim, args.queries, tuple(args.kinds.split(","))):
+        print(f"{r['kind']:>8}{r['jobs']:>9}{r['build_s']:>9.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}")
+    print("latency covers search + rerank; embedding the resume adds one encoder pass")
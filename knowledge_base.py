@@ -0,0 +1,619 @@
+# knowledge_base.py  multi-document FAISS corpus with incremental add/remove, optionally on shared compact vectors
+import copy
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import faiss
+
+import chunking
+import compact_vectors
+import embeddings
+import vector_index
+from bm25 import BM25Index
+from compact_vectors import CompactMatrix
+from index_store import make_key
+from pdf_extract import stream_pages
+from utils import CACHE_DIR
+
+# Retrain an IVF index once the corpus is this many times larger than at training.
+RETRAIN_GROWTH = 8
+# sq8 ranges are cheap to refit and clip whatever falls outside them, so refit sooner.
+SQ8_RETRAIN_GROWTH = 1.5
+# Vector storage the chatbot uses by default: codec, and whether codes are
+# memory-mapped from the index store (one copy shared by every session)
+# instead of held in a private FAISS index per session.
+CODEC = os.getenv("KB_VECTOR_CODEC", "fp16")
+SHARED = os.getenv("KB_SHARED_VECTORS", "1") == "1"
+SEGMENTS_DIR = "kb.segments"    # codes of knowledge bases saved before per-document storage
+# Per-document storage: chunks, BM25 postings and codes under <doc dir>/<document key>.
+DOC_CHUNKS = "chunks.json"
+DOC_BM25 = "bm25.npz"
+# Committed knowledge bases, one directory per signature(), shared by every session holding it;
+# their documents live once in DOC_DIR, shared by every knowledge base that contains them.
+KB_DIR = os.path.join(CACHE_DIR, "kbs")
+DOC_DIR = os.path.join(CACHE_DIR, "kb_docs")
+# Knowledge bases the registry keeps loaded in this process.
+MAX_LOADED = int(os.getenv("KB_MAX_LOADED", "8"))
+# maybe_prune() runs at most this often; prune() spares directories younger than
+# PRUNE_GRACE, which a session may have committed but not yet put in its handles.
+PRUNE_INTERVAL = float(os.getenv("KB_PRUNE_INTERVAL", "600"))
+PRUNE_GRACE = float(os.getenv("KB_PRUNE_GRACE", "3600"))
+
+
+class KnowledgeBase:
+    """
+    A growing corpus of documents behind one ID-addressable FAISS index.
+
+    Every document owns a contiguous range of vector IDs, so removing it is a
+    single remove_ids call and never touches other documents. index_kind is
+    one of vector_index.KINDS or "auto", which moves to an approximate
+    backend only when the corpus crosses a size threshold.
+
+    codec (vector_index.CODECS) sets how vectors are stored. With shared=True
+    there is no FAISS index at all: each document's vectors stay as
+    memory-mapped codes in the index store and are scanned exactly, so
+    sessions with the same PDFs hold one copy between them.
+
+    nprobe and ef_search are query-time settings: they are not part of
+    signature() and with_search_params() gives a view that searches with others.
+    """
+
+    def __init__(self, model_name=embeddings.DEFAULT_MODEL, max_tokens=chunking.MAX_TOKENS,
+                 overlap_tokens=chunking.OVERLAP_TOKENS, store=None,
+                 index_kind="auto", nprobe=vector_index.DEFAULT_NPROBE,
+                 ef_search=vector_index.DEFAULT_EF_SEARCH, codec="fp32", shared=False):
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.store = store
+        self.index_kind = index_kind
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.codec = codec
+        self.shared = shared
+        self.index = None
+        self._index_shared = False   # index still belongs to the knowledge base this was forked from
+        self.segments = {}    # doc_id -> CompactMatrix of its vectors, when shared
+        self.bm25 = BM25Index()   # keyword index over the same vector ids
+        self.trained_on = 0   # corpus size the current IVF / sq8 index was trained at
+        self.docs = {}        # doc_id -> {"name", "start", "count", "pages", "added", "key"}
+        self.chunks = {}      # vector id -> {"doc_id", "text", "page"}
+        self.next_id = 0
+
+    # ---- Corpus ----
+    @property
+    def ntotal(self):
+        if self.shared:
+            return sum(len(m) for m in self.segments.values())
+        return self.index.ntotal if self.index is not None else 0
+
+    def __contains__(self, doc_id):
+        return doc_id in self.docs
+
+    @property
+    def kind(self):
+        if self.shared:
+            return "mmap" if self.segments else None
+        return vector_index.index_kind(self.index) if self.index is not None else None
+
+    @property
+    def storage(self):
+        return f"{'shared' if self.shared else 'private'} {self.codec}"
+
+    def vector_bytes(self):
+        """Bytes of vector storage: private to this session, and mapped from shared files."""
+        if self.shared:
+            return {"private": 0, "shared": sum(m.nbytes for m in self.segments.values())}
+        size = faiss.serialize_index(self.index).nbytes if self.index is not None else 0
+        return {"private": size, "shared": 0}
+
+    def signature(self):
+        """SHA-256 over the settings and the ordered documents: equal for knowledge bases that search alike."""
+        state = {
+            "model_name": self.model_name,
+            "max_tokens": self.max_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "index_kind": self.index_kind,
+            "codec": self.codec,
+            "shared": self.shared,
+            "next_id": self.next_id,
+            "docs": sorted((d["start"], d["count"], doc_id) for doc_id, d in self.docs.items()),
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def fork(self):
+        """
+        An editable copy that shares this knowledge base's chunks, codes and
+        postings: the tables are copied, the BM25 postings and the private
+        FAISS index only once the copy writes to them.
+        """
+        kb = copy.copy(self)
+        kb.docs = dict(self.docs)
+        kb.chunks = dict(self.chunks)
+        kb.segments = dict(self.segments)
+        kb.bm25 = self.bm25.fork()
+        kb._index_shared = self.index is not None
+        return kb
+
+    def with_search_params(self, nprobe=None, ef_search=None):
+        """A read-only view sharing everything with this knowledge base but nprobe / efSearch."""
+        view = copy.copy(self)
+        view.nprobe = nprobe or self.nprobe
+        view.ef_search = ef_search or self.ef_search
+        return view
+
+    def _own_index(self):
+        if self._index_shared:
+            self.index = faiss.clone_index(self.index)
+            self._index_shared = False
+
+    def _target_kind(self, n, index_kind=None):
+        index_kind = index_kind or self.index_kind
+        return vector_index.choose_kind(n) if index_kind == "auto" else index_kind
+
+    def _source_vectors(self):
+        """
+        (ids, float32 vectors) of the whole corpus in id order: each document's
+        original embeddings from the index store, or (entry evicted) what the
+        current storage holds, which is lossy for IVF-PQ and fp16 / sq8.
+        """
+        ids, vecs = [], []
+        for doc in sorted(self.docs.values(), key=lambda d: d["start"]):
+            doc_ids = np.arange(doc["start"], doc["start"] + doc["count"], dtype="int64")
+            entry = self.store.get(doc["key"]) if self.store and doc.get("key") else None
+            if entry is not None and len(entry.embs) == doc["count"]:
+                vecs.append(np.asarray(entry.embs, dtype="float32"))
+            else:
+                vecs.append(self.vectors(doc_ids))
+            ids.append(doc_ids)
+        if not ids:
+            return np.zeros(0, dtype="int64"), None
+        return np.concatenate(ids), np.ascontiguousarray(np.concatenate(vecs), dtype="float32")
+
+    def rebuild_index(self, kind=None, codec=None, shared=None):
+        """
+        Re-create the vector storage (retraining IVF/PQ/SQ) from the original
+        embeddings, optionally switching backend, codec or shared mode. If
+        the build fails the knowledge base is left as it was.
+        """
+        kind = kind or self.index_kind
+        codec = codec or self.codec
+        shared = self.shared if shared is None else shared
+        ids, vecs = self._source_vectors()
+        index, segments = None, {}
+        if vecs is not None and shared:
+            for doc_id, doc in self.docs.items():
+                lo = int(np.searchsorted(ids, doc["start"]))
+                segments[doc_id] = self._segment(doc, vecs[lo:lo + doc["count"]], codec)
+        elif vecs is not None:
+            index = vector_index.build_index(vecs, self._target_kind(len(ids), kind), ids, codec)
+        self.index_kind, self.codec, self.shared = kind, codec, shared
+        self.index, self.segments = index, segments
+        self._index_shared = False
+        if index is not None:
+            self.trained_on = len(ids)
+
+    def _needs_rebuild(self):
+        if self._target_kind(self.ntotal) != self.kind:
+            return True
+        # IVF centroids and sq8 ranges trained on a small corpus go stale as it grows.
+        if self.codec == "sq8" and self.kind != "ivfpq" and self.ntotal >= SQ8_RETRAIN_GROWTH * self.trained_on:
+            return True
+        return self.kind in ("ivf", "ivfpq") and self.ntotal > RETRAIN_GROWTH * self.trained_on
+
+    def _segment(self, doc, embs, codec=None):
+        """A document's vectors as compact codes: mapped from its store entry when there is one."""
+        codec = codec or self.codec
+        entry = self.store.get(doc["key"]) if self.store and doc.get("key") else None
+        if entry is not None:
+            return entry.compact(codec)
+        if embs is None:
+            # Saved codes and store entry are both gone: re-embed the kept chunk texts.
+            print(f"re-embedding {doc['name']}: its stored vectors are gone", file=sys.stderr)
+            texts = [self.chunks[vid]["text"] for vid in range(doc["start"], doc["start"] + doc["count"])]
+            embs = np.ascontiguousarray(embeddings.encode(texts, self.model_name), dtype="float32")
+        return CompactMatrix.from_embeddings(embs, codec)
+
+    def _embed_document(self, data, name, on_page=None):
+        # Reuse chunks + embeddings from the on-disk store when this exact
+        # PDF was already embedded by anyone with the same settings.
+        key = make_key(data, self.model_name, chunker="structured-v2",
+                       max_tokens=self.max_tokens, overlap_tokens=self.overlap_tokens)
+        cached = self.store.get(key) if self.store else None
+        if cached is not None:
+            return key, cached.chunks, np.asarray(cached.embs, dtype="float32")
+        count = chunking.get_token_counter(self.model_name)
+        # Chunked page by page as the PDF is extracted, not after its last page.
+        pages = stream_pages(data, on_page=on_page)
+        records = list(chunking.iter_chunks(pages, self.max_tokens, self.overlap_tokens, count))
+        if not records:
+            return key, [], None
+        embs = embeddings.encode([r["text"] for r in records], self.model_name)
+        embs = np.ascontiguousarray(embs, dtype="float32")
+        if self.store:
+            self.store.put(key, records, embs, filename=name)
+        return key, records, embs
+
+    def add_document(self, data, name, on_page=None):
+        """
+        Index one PDF; returns its doc_id, or None if it had no text. Re-adding
+        is a no-op. on_page(done, total) reports extraction progress.
+        """
+        doc_id = hashlib.sha256(data).hexdigest()
+        if doc_id in self.docs:
+            return doc_id
+        key, records, embs = self._embed_document(data, name, on_page)
+        if not records:
+            return None
+        if self.index is None and not self.shared:
+            self.index = vector_index.make_index(self._target_kind(len(records)), embs.shape[1], embs, self.codec)
+            self.trained_on = len(records)
+        start = self.next_id
+        ids = np.arange(start, start + len(records), dtype="int64")
+        if not self.shared:
+            self._own_index()
+            self.index.add_with_ids(embs, ids)
+        self.bm25.add_many(ids.tolist(), [rec["text"] for rec in records])
+        for vid, rec in zip(ids.tolist(), records):
+            self.chunks[vid] = {"doc_id": doc_id, "text": rec["text"], "page": rec["page"],
+                                "section": rec.get("section", "")}
+        self.docs[doc_id] = {
+            "name": name,
+            "start": start,
+            "count": len(records),
+            "pages": max(r["page"] for r in records),
+            "added": time.time(),
+            "key": key,
+        }
+        self.next_id = start + len(records)
+        if self.shared:
+            self.segments[doc_id] = self._segment(self.docs[doc_id], embs)
+        elif self._needs_rebuild():
+            self.rebuild_index()
+        return doc_id
+
+    def remove_document(self, doc_id):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return 0
+        start, end = doc["start"], doc["start"] + doc["count"]
+        for vid in range(start, end):
+            self.chunks.pop(vid, None)
+        self.bm25.remove(range(start, end))
+        if self.shared:
+            self.segments.pop(doc_id, None)
+            return doc["count"]
+        try:
+            self._own_index()
+            vector_index.remove_ids(self.index, np.arange(start, end))
+        except RuntimeError:
+            # HNSW can't delete in place; rebuild from the surviving vectors.
+            self.rebuild_index()
+        return doc["count"]
+
+    # ---- Search ----
+    def search(self, query, k=3, timings=None):
+        """Top-k chunks for query as dicts with text, source file, page and distance."""
+        return self.search_batch([query], k, timings)[0]
+
+    def search_batch(self, queries, k=3, timings=None):
+        """Top-k hits for each query, with one encode batch and one FAISS search for all of them."""
+        if not self.ntotal or not queries:
+            return [[] for _ in queries]
+        return self.search_vectors(self.encode(queries, timings), k, timings)
+
+    def encode(self, queries, timings=None):
+        t0 = time.perf_counter()
+        q_emb = np.asarray(embeddings.encode(list(queries), self.model_name), dtype="float32")
+        if timings is not None:
+            timings["encode_ms"] = (time.perf_counter() - t0) * 1000
+            timings["queries"] = len(queries)
+        return q_emb
+
+    def search_vectors(self, q_emb, k=3, timings=None):
+        if not self.ntotal:
+            return [[] for _ in q_emb]
+        t0 = time.perf_counter()
+        q_emb = np.ascontiguousarray(q_emb, dtype="float32")
+        if self.shared:
+            D, I = self._search_segments(q_emb, min(k, self.ntotal))
+        else:
+            params = vector_index.search_params(self.index, self.nprobe, self.ef_search)
+            D, I = self.index.search(q_emb, min(k, self.ntotal), params=params)
+        if timings is not None:
+            timings["search_ms"] = (time.perf_counter() - t0) * 1000
+        return [[self.hit(int(i), float(d)) for d, i in zip(drow, irow) if i >= 0] for drow, irow in zip(D, I)]
+
+    def search_sparse(self, queries, k=3, timings=None):
+        """BM25 top-k for each query; hits carry a bm25 score instead of a distance."""
+        t0 = time.perf_counter()
+        out = [[self.hit(vid, None, bm25=score) for vid, score in self.bm25.search(q, k)] for q in queries]
+        if timings is not None:
+            timings["sparse_ms"] = (time.perf_counter() - t0) * 1000
+        return out
+
+    def _search_segments(self, q_emb, k):
+        """Exact top-k over every document's codes, merged into one (D, I) like a FAISS search."""
+        ds, ids = [], []
+        for doc_id, matrix in self.segments.items():
+            D, I = matrix.search(q_emb, k)
+            ds.append(D)
+            ids.append(np.where(I >= 0, I + self.docs[doc_id]["start"], -1))
+        D, I = np.concatenate(ds, axis=1), np.concatenate(ids, axis=1)
+        order = np.argsort(D, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+    def vectors(self, ids):
+        """Stored embeddings for vector ids (approximate for IVF-PQ and fp16 / sq8 codes)."""
+        if not self.shared:
+            return vector_index.reconstruct(self.index, ids)
+        ids = np.asarray(ids, dtype="int64")
+        rows_by_doc = {}
+        for j, vid in enumerate(ids.tolist()):
+            rows_by_doc.setdefault(self.chunks[vid]["doc_id"], []).append(j)
+        out = None
+        for doc_id, rows in rows_by_doc.items():
+            matrix = self.segments[doc_id]
+            if out is None:
+                out = np.empty((len(ids), matrix.dim), dtype="float32")
+            out[rows] = matrix.reconstruct(ids[rows] - self.docs[doc_id]["start"])
+        return out if out is not None else np.zeros((0, 0), dtype="float32")
+
+    def hit(self, vid, distance, **extra):
+        c = self.chunks[vid]
+        return {
+            "id": vid,
+            "text": c["text"],
+            "source": self.docs[c["doc_id"]]["name"],
+            "doc_id": c["doc_id"],
+            "page": c["page"],
+            "section": c.get("section", ""),
+            "distance": distance,
+            **extra,
+        }
+
+    # ---- Persistence ----
+    def _save_document(self, doc_id, doc_dir):
+        """Write a document's chunks, BM25 postings and codes to doc_dir/<key> unless already there."""
+        doc = self.docs[doc_id]
+        path = os.path.join(doc_dir, doc["key"])
+        if not os.path.exists(os.path.join(path, DOC_CHUNKS)):
+            vids = range(doc["start"], doc["start"] + doc["count"])
+            chunks = [{k: v for k, v in self.chunks[vid].items() if k != "doc_id"} for vid in vids]
+            bm25 = BM25Index(self.bm25.k1, self.bm25.b)
+            bm25.add_many(range(len(chunks)), (c["text"] for c in chunks))
+            # Temp dir + rename so readers never see a partial document.
+            tmp = tempfile.mkdtemp(prefix=".tmp-", dir=doc_dir)
+            try:
+                bm25.save(os.path.join(tmp, DOC_BM25))
+                with open(os.path.join(tmp, DOC_CHUNKS), "w", encoding="utf-8") as f:
+                    json.dump(chunks, f)
+                os.rename(tmp, path)
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)
+                if not os.path.exists(os.path.join(path, DOC_CHUNKS)):
+                    raise
+        if self.shared and CompactMatrix.open(path, self.codec, self.codec) is None:
+            # Saved with the document too, so it loads even after the store has evicted the entry.
+            compact_vectors.save(path, self.codec, self.segments[doc_id].arrays)
+
+    def save(self, path, doc_dir=None):
+        """
+        A small manifest (settings and the document table) and, when private,
+        the FAISS index at path; each document's chunks, postings and codes
+        under doc_dir (default path/docs), written once per document, so
+        saving after one more upload writes that PDF and the manifest only.
+        """
+        doc_dir = doc_dir or os.path.join(path, "docs")
+        os.makedirs(path, exist_ok=True)
+        os.makedirs(doc_dir, exist_ok=True)
+        for doc_id in self.docs:
+            self._save_document(doc_id, doc_dir)
+        if self.index is not None:
+            faiss.write_index(self.index, os.path.join(path, "kb.faiss"))
+        state = {
+            "model_name": self.model_name,
+            "max_tokens": self.max_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "index_kind": self.index_kind,
+            "nprobe": self.nprobe,
+            "ef_search": self.ef_search,
+            "codec": self.codec,
+            "shared": self.shared,
+            "next_id": self.next_id,
+            "trained_on": self.trained_on,
+            "docs": self.docs,
+        }
+        tmp = os.path.join(path, "kb.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, os.path.join(path, "kb.json"))
+
+    @classmethod
+    def load(cls, path, store=None, doc_dir=None):
+        with open(os.path.join(path, "kb.json"), encoding="utf-8") as f:
+            state = json.load(f)
+        kb = cls(state["model_name"], state["max_tokens"], state["overlap_tokens"], store=store,
+                 index_kind=state.get("index_kind", "auto"),
+                 nprobe=state.get("nprobe", vector_index.DEFAULT_NPROBE),
+                 ef_search=state.get("ef_search", vector_index.DEFAULT_EF_SEARCH),
+                 codec=state.get("codec", "fp32"), shared=state.get("shared", False))
+        kb.next_id = state["next_id"]
+        kb.trained_on = state.get("trained_on", 0)
+        kb.docs = state["docs"]
+        index_path = os.path.join(path, "kb.faiss")
+        if os.path.exists(index_path):
+            kb.index = faiss.read_index(index_path)
+        if "chunks" in state:
+            kb._load_whole(path, state)
+            return kb
+        doc_dir = doc_dir or os.path.join(path, "docs")
+        for doc_id, doc in sorted(kb.docs.items(), key=lambda kv: kv[1]["start"]):
+            doc_path = os.path.join(doc_dir, doc["key"])
+            with open(os.path.join(doc_path, DOC_CHUNKS), encoding="utf-8") as f:
+                for i, c in enumerate(json.load(f)):
+                    kb.chunks[doc["start"] + i] = dict(c, doc_id=doc_id)
+            kb.bm25.extend(BM25Index.load(os.path.join(doc_path, DOC_BM25)), doc["start"])
+            if kb.shared:
+                matrix = CompactMatrix.open(doc_path, kb.codec, kb.codec)
+                kb.segments[doc_id] = matrix if matrix is not None else kb._segment(doc, None)
+        return kb
+
+    def _load_whole(self, path, state):
+        # Saved before per-document storage: chunks in kb.json, one BM25 file, codes in SEGMENTS_DIR.
+        self.chunks = {int(k): v for k, v in state["chunks"].items()}
+        for doc_id, doc in self.docs.items() if self.shared else ():
+            matrix = CompactMatrix.open(os.path.join(path, SEGMENTS_DIR), f"{doc_id}.{self.codec}", self.codec)
+            self.segments[doc_id] = matrix if matrix is not None else self._segment(doc, None)
+        bm25_path = os.path.join(path, "kb.bm25.npz")
+        if os.path.exists(bm25_path):
+            self.bm25 = BM25Index.load(bm25_path)
+        else:
+            self.bm25.add_many(self.chunks.keys(), (c["text"] for c in self.chunks.values()))
+
+
+class KnowledgeBaseRegistry:
+    """
+    Knowledge bases addressed by signature(), so a session keeps only that
+    string and sessions with the same PDFs and settings share one loaded
+    copy. A committed knowledge base is never changed in place: fork() it,
+    edit the copy and commit() that under its new signature. Documents are
+    stored once under doc_dir, so a commit writes only the new ones.
+    """
+
+    def __init__(self, root=KB_DIR, store=None, max_loaded=MAX_LOADED, doc_dir=DOC_DIR):
+        self.root = root
+        self.doc_dir = doc_dir
+        self.store = store
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()   # signature -> KnowledgeBase
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        os.makedirs(root, exist_ok=True)
+        os.makedirs(doc_dir, exist_ok=True)
+
+    def _path(self, sig):
+        return os.path.join(self.root, sig)
+
+    def __contains__(self, sig):
+        return bool(sig) and os.path.exists(os.path.join(self._path(sig), "kb.json"))
+
+    def _remember(self, sig, kb):
+        with self._lock:
+            self._loaded[sig] = kb
+            self._loaded.move_to_end(sig)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return kb
+
+    def checkout(self, sig):
+        """The shared, read-only knowledge base for sig, or None if it was never committed or cannot be loaded."""
+        with self._lock:
+            kb = self._loaded.get(sig)
+            if kb is not None:
+                self._loaded.move_to_end(sig)
+                return kb
+        if sig not in self:
+            return None
+        try:
+            kb = KnowledgeBase.load(self._path(sig), store=self.store, doc_dir=self.doc_dir)
+        except (OSError, ValueError, KeyError) as e:
+            # Files of a committed knowledge base went missing; the caller starts a new one.
+            print(f"cannot load knowledge base {sig}: {e!r}", file=sys.stderr)
+            return None
+        return self._remember(sig, kb)
+
+    def fork(self, sig, **params):
+        """
+        An editable copy of sig (forked from the loaded copy, read from disk
+        only if it is not loaded), or a new empty knowledge base (params) if
+        sig is unknown.
+        """
+        kb = self.checkout(sig)
+        return kb.fork() if kb is not None else KnowledgeBase(store=self.store, **params)
+
+    def commit(self, kb):
+        """Publish kb under its signature and return that; kb must not be edited afterwards."""
+        sig = kb.signature()
+        if sig not in self:
+            # Save into a temp dir and rename so readers never see a partial knowledge base.
+            tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+            try:
+                kb.save(tmp, self.doc_dir)
+                try:
+                    os.rename(tmp, self._path(sig))
+                except OSError:
+                    # Another session committed the same knowledge base first.
+                    shutil.rmtree(tmp, ignore_errors=True)
+            except Exception:
+                shutil.rmtree(tmp, ignore_errors=True)
+                raise
+        self._remember(sig, kb)
+        return sig
+
+    def prune(self, keep, grace=PRUNE_GRACE):
+        """
+        Delete committed knowledge bases whose signature is not in keep, then
+        documents no remaining one contains; both only when older than grace
+        seconds. Returns how many knowledge bases were deleted.
+        """
+        removed = 0
+        cutoff = time.time() - grace
+        for sig in os.listdir(self.root):
+            if sig.startswith(".") or sig in keep or not _older(self._path(sig), cutoff):
+                continue
+            with self._lock:
+                self._loaded.pop(sig, None)
+            shutil.rmtree(self._path(sig), ignore_errors=True)
+            removed += 1
+        used = self._used_documents()
+        for key in os.listdir(self.doc_dir):
+            if key not in used and _older(os.path.join(self.doc_dir, key), cutoff):
+                shutil.rmtree(os.path.join(self.doc_dir, key), ignore_errors=True)
+        return removed
+
+    def _used_documents(self):
+        keys = set()
+        for sig in os.listdir(self.root):
+            try:
+                with open(os.path.join(self._path(sig), "kb.json"), encoding="utf-8") as f:
+                    keys.update(doc.get("key") for doc in json.load(f)["docs"].values())
+            except (OSError, ValueError, KeyError):
+                continue
+        return keys
+
+    def maybe_prune(self, keep_fn, interval=PRUNE_INTERVAL):
+        """prune(keep_fn()) at most once per interval seconds; None when skipped."""
+        with self._lock:
+            if time.time() - self._last_prune < interval:
+                return None
+            self._last_prune = time.time()
+        return self.prune(keep_fn())
+
+    def stats(self):
+        with self._lock:
+            loaded = list(self._loaded.values())
+        return {
+            "committed": sum(1 for name in os.listdir(self.root) if not name.startswith(".")),
+            "loaded": len(loaded),
+            "private_bytes": sum(kb.vector_bytes()["private"] for kb in loaded),
+        }
+
+
+def _older(path, cutoff):
+    try:
+        return os.path.getmtime(path) <= cutoff
+    except OSError:
+        return False
+
+
+def format_citation(hit):
+    return f"{hit['source']} p.{hit['page']}"
@@ -0,0 +1,201 @@
+# llm_cache.py  SQLite response cache for LLM calls, shared by all worker processes
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from utils import CACHE_DIR
+
+DB_PATH = os.path.join(CACHE_DIR, "llm_cache.sqlite3")
+TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+# Near-duplicate lookups embed every missed prompt, so they are opt-in.
+SEMANTIC = os.getenv("LLM_CACHE_SEMANTIC", "0") == "1"
+THRESHOLD = float(os.getenv("LLM_CACHE_THRESHOLD", "0.95"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    response TEXT NOT NULL,
+    embedding BLOB,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used);
+CREATE INDEX IF NOT EXISTS entries_params ON entries(params);
+"""
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace only (case can matter: code, acronyms, answers); a plain prompt or a list of chat messages."""
+    if isinstance(prompt, list):
+        return "\n".join(f"{m.get('role', 'user')}: {normalize_prompt(m.get('content', ''))}" for m in prompt)
+    return " ".join(str(prompt).split())
+
+
+def params_key(model, temperature, max_tokens, **extra):
+    return json.dumps({"model": model, "temperature": temperature, "max_tokens": max_tokens, **extra},
+                      sort_keys=True)
+
+
+class LLMCache:
+    def __init__(self, path=DB_PATH, ttl=TTL, max_entries=MAX_ENTRIES, semantic=SEMANTIC,
+                 threshold=THRESHOLD, embed_model=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.threshold = threshold
+        self.embed_model = embed_model
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._vectors = {}    # params -> (last rowid, keys, matrix) for semantic lookups
+        self._puts = 0
+        self._metrics = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self._metrics[name] += 1
+
+    # ---- Embeddings ----
+    def _embed(self, text):
+        import embeddings
+        model = self.embed_model or embeddings.DEFAULT_MODEL
+        vec = embeddings.encode([text], model, normalize_embeddings=True)[0]
+        return np.asarray(vec, dtype="float32")
+
+    def _semantic_lookup(self, params, vec):
+        conn = self._conn()
+        empty = (0, [], np.zeros((0, len(vec)), dtype="float32"))
+        with self._lock:
+            last, keys, mat = self._vectors.get(params, empty)
+        query = "SELECT rowid, key, embedding FROM entries WHERE params = ? AND rowid > ? AND embedding IS NOT NULL"
+        rows = conn.execute(query, (params, last)).fetchall()
+        (live,) = conn.execute("SELECT COUNT(*) FROM entries WHERE params = ? AND embedding IS NOT NULL",
+                               (params,)).fetchone()
+        if len(keys) + len(rows) != live:
+            # Rows were evicted, expired or replaced since the matrix was built,
+            # maybe by another process: rebuild it from the live rows.
+            last, keys, mat = empty
+            rows = conn.execute(query, (params, 0)).fetchall()
+        if rows:
+            keys = keys + [r[1] for r in rows]
+            mat = np.vstack([mat, *[np.frombuffer(r[2], dtype="float32")[None, :] for r in rows]])
+            last = rows[-1][0]
+        with self._lock:
+            self._vectors[params] = (last, keys, mat)
+        if not keys:
+            return None
+        sims = mat @ vec
+        best = int(np.argmax(sims))
+        return keys[best] if sims[best] >= self.threshold else None
+
+    # ---- Lookup / store ----
+    def get(self, model, prompt, temperature, max_tokens, **extra):
+        params = params_key(model, temperature, max_tokens, **extra)
+        norm = normalize_prompt(prompt)
+        key = hashlib.sha256(f"{params}\0{norm}".encode("utf-8")).hexdigest()
+        hit = self._fetch(key)
+        if hit is not None:
+            self._count("exact_hits")
+            return hit
+        if self.semantic:
+            near = self._semantic_lookup(params, self._embed(norm))
+            hit = self._fetch(near) if near else None
+            if hit is not None:
+                self._count("semantic_hits")
+                return hit
+        self._count("misses")
+        return None
+
+    def _fetch(self, key):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT response, created FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if self.ttl and now - row[1] > self.ttl:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, model, prompt, temperature, max_tokens, response, **extra):
+        if not response:
+            return
+        params = params_key(model, temperature, max_tokens, **extra)
+        norm = normalize_prompt(prompt)
+        key = hashlib.sha256(f"{params}\0{norm}".encode("utf-8")).hexdigest()
+        emb = self._embed(norm).tobytes() if self.semantic else None
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO entries (key, params, prompt, response, embedding, created, last_used, hits)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+            (key, params, norm, response, emb, now, now),
+        )
+        with self._lock:
+            self._puts += 1
+            check = self._puts % 100 == 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones beyond max_entries."""
+        conn = self._conn()
+        if self.ttl:
+            conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl,))
+        (n,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if n > self.max_entries:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)",
+                (n - self.max_entries,),
+            )
+        # Semantic matrices may point at deleted rows; they reload on next lookup.
+        with self._lock:
+            self._vectors.clear()
+
+    def clear(self):
+        self._conn().execute("DELETE FROM entries")
+        with self._lock:
+            self._vectors.clear()
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+        lookups = m["exact_hits"] + m["semantic_hits"] + m["misses"]
+        m["hit_rate"] = (m["exact_hits"] + m["semantic_hits"]) / lookups if lookups else 0.0
+        m["entries"] = self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return m
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """The process-wide cache, or None when disabled with LLM_CACHE=0."""
+    global _default
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = LLMCache()
+        return _default
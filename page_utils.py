@@ -0,0 +1,25 @@
+# page_utils.py  small helpers shared by the Streamlit pages (kept light: imported on every page render)
+import os
+from io import StringIO
+
+import streamlit as st
+
+
+def groq_api_key():
+    return st.secrets.get("GROQ_API_KEY", os.getenv("GROQ_API_KEY"))
+
+
+def read_resume(uploaded):
+    """Text of an uploaded PDF or TXT resume."""
+    if uploaded.type == "application/pdf":
+        from pdf_extract import extract_text
+        return extract_text(uploaded)
+    return StringIO(uploaded.getvalue().decode("utf-8")).read()
+
+
+def render_parse_stats():
+    """How often LLM replies parsed as JSON on the first try, per schema."""
+    import structured_output
+    for name, m in structured_output.stats().items():
+        st.caption(f"{name}: {m['first_try_rate']:.0%} parsed first try, "
+                   f"{m['round_trips_per_call']:.2f} LLM calls per request, {m['failed']} failed")
@@ -0,0 +1,183 @@
+# pdf_extract.py  shared PDF text extraction: streaming, parallel for long PDFs, cached by hash
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+
+from utils import CACHE_DIR
+
+TEXT_CACHE_DIR = os.path.join(CACHE_DIR, "pdf_text")
+# PDFs with at least this many pages are split across a process pool.
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+PAGES_PER_TASK = 16
+MAX_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+MEMORY_CACHE_SIZE = 64
+
+_pool = None
+_pool_lock = threading.Lock()
+_memory_cache = OrderedDict()    # sha256 -> tuple of page texts
+_cache_lock = threading.Lock()
+
+
+def read_bytes(source):
+    """Bytes of a PDF given as bytes, a path, or a file-like object (e.g. a Streamlit upload)."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    source.seek(0)
+    return source.read()
+
+
+def file_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: forking the threaded Streamlit server can copy a
+            # lock some other thread holds into the child and deadlock it.
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _extract_range(data, start, end):
+    # Runs in a worker process; each worker parses the PDF once per task.
+    reader = PdfReader(BytesIO(data))
+    out = []
+    for i in range(start, end):
+        t0 = time.perf_counter()
+        text = reader.pages[i].extract_text() or ""
+        out.append((text, time.perf_counter() - t0))
+    return out
+
+
+# ---- Cache ----
+def _cache_path(digest):
+    return os.path.join(TEXT_CACHE_DIR, digest + ".json")
+
+
+def _cache_get(digest):
+    with _cache_lock:
+        pages = _memory_cache.get(digest)
+        if pages is not None:
+            _memory_cache.move_to_end(digest)
+            return pages
+    try:
+        with open(_cache_path(digest), encoding="utf-8") as f:
+            pages = json.load(f)
+    except (OSError, ValueError):
+        return None
+    _memory_put(digest, pages)
+    return pages
+
+
+def _memory_put(digest, pages):
+    with _cache_lock:
+        _memory_cache[digest] = tuple(pages)
+        _memory_cache.move_to_end(digest)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _cache_put(digest, pages):
+    _memory_put(digest, pages)
+    try:
+        os.makedirs(TEXT_CACHE_DIR, exist_ok=True)
+        tmp = _cache_path(digest) + f".{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(pages, f)
+        os.replace(tmp, _cache_path(digest))
+    except OSError:
+        pass
+
+
+# ---- Extraction ----
+def iter_pages(source, timings=None, parallel=None, on_page=None):
+    """
+    Yield page texts in order. Long PDFs are extracted by a process pool while
+    earlier pages are already being yielded. Per-page seconds are appended to
+    timings (a list) when given; on_page(done, total) is called per page.
+    """
+    data = read_bytes(source)
+    reader = PdfReader(BytesIO(data))
+    n = len(reader.pages)
+    if parallel is None:
+        parallel = n >= PARALLEL_MIN_PAGES and MAX_WORKERS > 1
+    if not parallel:
+        for i, page in enumerate(reader.pages, start=1):
+            t0 = time.perf_counter()
+            text = page.extract_text() or ""
+            if timings is not None:
+                timings.append(time.perf_counter() - t0)
+            if on_page:
+                on_page(i, n)
+            yield text
+        return
+
+    pool = _get_pool()
+    futures = [pool.submit(_extract_range, data, s, min(s + PAGES_PER_TASK, n))
+               for s in range(0, n, PAGES_PER_TASK)]
+    done = 0
+    for fut in futures:
+        for text, secs in fut.result():
+            done += 1
+            if timings is not None:
+                timings.append(secs)
+            if on_page:
+                on_page(done, n)
+            yield text
+
+
+def stream_pages(source, timings=None, use_cache=True, on_page=None):
+    """
+    iter_pages through the hash-keyed cache: a PDF seen before is served from
+    it, a new one is cached once its last page has been consumed. Lets the
+    caller work on (and report) early pages while later ones are extracted.
+    """
+    data = read_bytes(source)
+    digest = file_hash(data)
+    pages = _cache_get(digest) if use_cache else None
+    if pages is not None:
+        for i, text in enumerate(pages, start=1):
+            if on_page:
+                on_page(i, len(pages))
+            yield text
+        return
+    pages = []
+    for text in iter_pages(data, timings, on_page=on_page):
+        pages.append(text)
+        yield text
+    if use_cache:
+        _cache_put(digest, pages)
+
+
+def extract_pages(source, timings=None, use_cache=True):
+    """
+    List of page texts, served from the hash-keyed cache when this PDF was seen
+    before. Each call gets its own list, so callers may edit it.
+    """
+    return list(stream_pages(source, timings, use_cache))
+
+
+def extract_text(source, sep="\n", timings=None, use_cache=True):
+    return sep.join(extract_pages(source, timings, use_cache)).strip()
+
+
+def timing_summary(timings):
+    if not timings:
+        return {"pages": 0, "total_s": 0.0, "max_page_s": 0.0}
+    return {"pages": len(timings), "total_s": sum(timings), "max_page_s": max(timings)}
@@ -0,0 +1,333 @@
+# question_bank.py  pre-generated interview questions per role in SQLite FTS5, served by role + resume skills
+import argparse
+import math
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from groq_client import map_concurrent
+from skill_taxonomy import get_taxonomy
+from structured_output import CATEGORIES, structured_chat, validate_questions
+from utils import CACHE_DIR
+
+BANK_PATH = os.getenv("QUESTION_BANK_PATH", os.path.join(CACHE_DIR, "question_bank.sqlite3"))
+# Questions generated per role and category by the batch job (and by an on-demand fill).
+PER_CATEGORY = int(os.getenv("QUESTION_BANK_PER_CATEGORY", "12"))
+# A role counts as covered once every category has at least this many questions.
+MIN_COVERAGE = 5
+BANK_MODEL = "llama-3.3-70b-versatile"
+# Words that change the level, not the role: "Senior Data Scientist" is served from "data scientist".
+_LEVEL_WORDS = frozenset("senior sr junior jr lead principal staff head intern internship trainee graduate "
+                         "entry level associate i ii iii iv".split())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roles (
+    role_key TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    model TEXT,
+    generated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    role_key TEXT NOT NULL,
+    category TEXT NOT NULL,
+    text TEXT NOT NULL,
+    skills TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    UNIQUE (role_key, category, text)
+);
+CREATE INDEX IF NOT EXISTS questions_role ON questions(role_key, category);
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(text, skills, tokenize='porter');
+CREATE VIRTUAL TABLE IF NOT EXISTS roles_fts USING fts5(role_key);
+"""
+
+
+def role_key(title):
+    """Lower-case role words without level words or punctuation: "Sr. Data Scientist (NLP)" -> "data scientist nlp"."""
+    words = re.findall(r"[a-z0-9+#]+", (title or "").lower())
+    return " ".join(w for w in words if w not in _LEVEL_WORDS)
+
+
+def _fts_terms(terms):
+    """OR of quoted FTS5 phrases, safe for any input."""
+    quoted = ['"' + t.replace('"', '""') + '"' for t in terms if t.strip()]
+    return " OR ".join(quoted)
+
+
+def question_skills(text):
+    """Taxonomy skills a question mentions, used to match it to resumes."""
+    tax = get_taxonomy()
+    return tax.matcher().match(text, threshold=100)[0] if tax else []
+
+
+def resume_skills(text):
+    tax = get_taxonomy()
+    return tax.matcher().match(text, threshold=90)[0] if tax and text else []
+
+
+class QuestionBank:
+    def __init__(self, path=BANK_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._metrics = {"served": 0, "misses": 0, "filled": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self._metrics[name] += 1
+
+    # ---- Writing ----
+    def add(self, title, questions, model=None):
+        """Store {category: [question]} for a role; returns how many questions were new."""
+        key = role_key(title)
+        if not key:
+            raise ValueError(f"No role in job title {title!r}")
+        conn = self._conn()
+        added = 0
+        with conn:
+            if conn.execute("SELECT 1 FROM roles WHERE role_key = ?", (key,)).fetchone() is None:
+                conn.execute("INSERT INTO roles_fts (role_key) VALUES (?)", (key,))
+            conn.execute("INSERT OR REPLACE INTO roles VALUES (?, ?, ?, ?)", (key, title, model, time.time()))
+            for category, texts in questions.items():
+                for text in texts:
+                    skills = " ".join(question_skills(text))
+                    cur = conn.execute("INSERT OR IGNORE INTO questions (role_key, category, text, skills, created)"
+                                       " VALUES (?, ?, ?, ?, ?)", (key, category, text, skills, time.time()))
+                    if cur.rowcount:
+                        conn.execute("INSERT INTO questions_fts (rowid, text, skills) VALUES (?, ?, ?)",
+                                     (cur.lastrowid, text, skills))
+                        added += 1
+        return added
+
+    # ---- Lookup ----
+    def coverage(self, key):
+        rows = self._conn().execute("SELECT category, COUNT(*) FROM questions WHERE role_key = ? GROUP BY category",
+                                    (key,)).fetchall()
+        counts = dict(rows)
+        return {c: counts.get(c, 0) for c in CATEGORIES}
+
+    def covered(self, key, categories=CATEGORIES):
+        cov = self.coverage(key)
+        return all(cov[c] >= MIN_COVERAGE for c in categories)
+
+    def resolve(self, title, categories=CATEGORIES):
+        """
+        The covered role to serve a title from: its own key, else the closest
+        stored role whose words all appear in the title ("nlp data scientist"
+        -> "data scientist"). None when nothing covers it.
+        """
+        key = role_key(title)
+        if not key:
+            return None
+        if self.covered(key, categories):
+            return key
+        words = set(key.split())
+        rows = self._conn().execute("SELECT role_key FROM roles_fts WHERE roles_fts MATCH ? ORDER BY rank LIMIT 20",
+                                    (_fts_terms(words),)).fetchall()
+        for (cand,) in sorted(rows, key=lambda r: -len(r[0].split())):
+            if set(cand.split()) <= words and self.covered(cand, categories):
+                return cand
+        return None
+
+    def pick(self, key, skills=(), counts=3, exclude=(), seed=None):
+        """
+        {category: [question]} for a covered role. counts is a number per
+        category or {category: n}. Questions touching the resume's skills come
+        first (FTS5 bm25), at least one slot per category stays a random
+        role question for variety, and ids in exclude (already shown) are only
+        reused once the role has no unseen ones left. Returns (questions, ids).
+        """
+        counts = counts if isinstance(counts, dict) else {c: counts for c in CATEGORIES}
+        rng = random.Random(seed)
+        conn = self._conn()
+        exclude = set(exclude)
+        out, ids = {}, []
+        match = _fts_terms(skills)
+        for category, n in counts.items():
+            if n <= 0:
+                continue
+            chosen = []
+            if match:
+                rows = conn.execute(
+                    "SELECT q.id, q.text FROM questions_fts f JOIN questions q ON q.id = f.rowid "
+                    "WHERE questions_fts MATCH ? AND q.role_key = ? AND q.category = ? ORDER BY f.rank LIMIT ?",
+                    (match, key, category, n + len(exclude))).fetchall()
+                chosen = [r for r in rows if r[0] not in exclude][:max(n - 1, 1)]
+            picked = {r[0] for r in chosen}
+            rows = [r for r in conn.execute("SELECT id, text FROM questions WHERE role_key = ? AND category = ?",
+                                            (key, category)) if r[0] not in picked]
+            # Unseen questions first; repeat shown ones only once the role runs out.
+            for pool in ([r for r in rows if r[0] not in exclude], [r for r in rows if r[0] in exclude]):
+                chosen += rng.sample(pool, min(n - len(chosen), len(pool)))
+            out[category] = [text for _, text in chosen]
+            ids += [qid for qid, _ in chosen]
+        return out, ids
+
+    def roles(self):
+        return [r[0] for r in self._conn().execute("SELECT role_key FROM roles ORDER BY role_key")]
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+        conn = self._conn()
+        m["roles"] = conn.execute("SELECT COUNT(*) FROM roles").fetchone()[0]
+        m["questions"] = conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+        return m
+
+
+# ---- Generation ----
+def generate_for_role(client, title, per_category=PER_CATEGORY, model=BANK_MODEL):
+    """One structured LLM call: per_category distinct questions for each category."""
+    prompt = f"""
+You write interview question banks. Write {per_category} distinct interview questions for each category
+for the role: {title}.
+- Technical: concrete questions about the tools, concepts and skills the role uses.
+- Scenario: "what would you do if..." situations from the role's daily work.
+- Behavioral: past-experience questions (teamwork, conflict, ownership, failure).
+- HR: motivation, career goals, expectations.
+Vary difficulty from entry level to senior. Each question is one self-contained sentence.
+Return only a JSON object: {{"Technical": ["..."], "Scenario": ["..."], "Behavioral": ["..."], "HR": ["..."]}}
+"""
+    return structured_chat(client, prompt, lambda obj: validate_questions(obj, per_category), "question_bank",
+                           model=model, temperature=0.8, max_tokens=200 + 60 * per_category * len(CATEGORIES),
+                           deadline=90)
+
+
+def build(roles, client, bank=None, per_category=PER_CATEGORY, refresh=False, on_role=None):
+    """
+    Batch job: generate and store questions for every role not yet covered
+    (all of them with refresh), several roles concurrently. Returns
+    {"generated", "skipped", "failed", "questions", "wall_s"}.
+    """
+    bank = bank or get_bank()
+    todo, seen = [], set()
+    for title in roles:
+        key = role_key(title)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        if refresh or not bank.covered(key):
+            todo.append(title)
+    stats = {"generated": 0, "skipped": len(seen) - len(todo), "failed": 0, "questions": 0}
+    t0 = time.perf_counter()
+    for i, questions, err, secs in map_concurrent(lambda t: generate_for_role(client, t, per_category), todo):
+        if err is not None:
+            stats["failed"] += 1
+            print(f"{todo[i]}: {err}", file=sys.stderr)
+            continue
+        stats["generated"] += 1
+        stats["questions"] += bank.add(todo[i], questions, BANK_MODEL)
+        if on_role:
+            on_role(todo[i], secs, stats)
+    stats["wall_s"] = time.perf_counter() - t0
+    return stats
+
+
+def default_roles():
+    """Taxonomy domains plus every job title in the local job corpus."""
+    from job_matcher import JOBS_PATH, iter_jobs
+
+    tax = get_taxonomy()
+    roles = list(tax.domains()) if tax else []
+    if os.path.exists(JOBS_PATH):
+        roles += [j["title"] for j in iter_jobs(JOBS_PATH)]
+    return roles
+
+
+# ---- Serving ----
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_bank():
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = QuestionBank()
+        return _bank
+
+
+def get_questions(title, resume_text="", counts=3, client=None, exclude=(), seed=None, bank=None):
+    """
+    (questions, info) for a job title, personalised by the skills in
+    resume_text. Served from the bank when the role is covered; otherwise,
+    given a client, one LLM call fills the bank for the role first. info has
+    source ("bank" / "llm"), role, ids (pass back as exclude for fresh
+    questions), skills and ms. Without coverage or client, questions is None.
+    Raises ValueError for a title with no role words ("", "Senior").
+    """
+    if not role_key(title):
+        # Would otherwise ask the LLM about a blank role and file it under "" for everyone.
+        raise ValueError(f"No role in job title {title!r}")
+    bank = bank or get_bank()
+    t0 = time.perf_counter()
+    cats = [c for c, n in counts.items() if n > 0] if isinstance(counts, dict) else CATEGORIES
+    key = bank.resolve(title, cats)
+    source = "bank"
+    if key is None:
+        bank._count("misses")
+        if client is None:
+            return None, {"source": None, "role": role_key(title), "ms": (time.perf_counter() - t0) * 1000}
+        bank.add(title, generate_for_role(client, title), BANK_MODEL)
+        bank._count("filled")
+        key, source = role_key(title), "llm"
+    skills = resume_skills(resume_text)
+    questions, ids = bank.pick(key, skills, counts, exclude, seed)
+    bank._count("served")
+    return questions, {"source": source, "role": key, "ids": ids, "skills": skills,
+                       "ms": (time.perf_counter() - t0) * 1000}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build the interview question bank, or serve from it.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="generate questions for roles not yet covered")
+    b.add_argument("--roles", help="comma-separated job titles (default: taxonomy domains + job corpus titles)")
+    b.add_argument("--per-category", type=int, default=PER_CATEGORY)
+    b.add_argument("--refresh", action="store_true", help="regenerate covered roles too")
+    q = sub.add_parser("query", help="serve questions for a role and time it")
+    q.add_argument("role")
+    q.add_argument("--resume", help="resume .txt/.pdf to personalise with")
+    q.add_argument("-n", type=int, default=3, help="questions per category")
+    q.add_argument("--repeat", type=int, default=200, help="timed repetitions")
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        from groq_client import get_client
+
+        roles = args.roles.split(",") if args.roles else default_roles()
+        s = build(roles, get_client(), per_category=args.per_category, refresh=args.refresh,
+                  on_role=lambda t, secs, st: print(f"  {t}: {secs:.1f}s", file=sys.stderr))
+        print(f"{s['generated']} roles generated ({s['questions']} questions), {s['skipped']} already covered, "
+              f"{s['failed']} failed in {s['wall_s']:.1f}s; bank: {get_bank().stats()}")
+    else:
+        text = ""
+        if args.resume:
+            with open(args.resume, "rb") as f:
+                raw = f.read()
+            from ats_scorer import extract_resume
+            text = extract_resume(args.resume, raw)
+        qs, info = get_questions(args.role, text, args.n)
+        if qs is None:
+            sys.exit(f"'{args.role}' is not covered by the bank; run `build --roles \"{args.role}\"` first.")
+        for cat, items in qs.items():
+            print(f"{cat}:")
+            for item in items:
+                print(f"  - {item}")
+        times = sorted(get_questions(args.role, text, args.n, seed=i)[1]["ms"] for i in range(args.repeat))
+        print(f"served from role '{info['role']}' with skills {info['skills'][:8]}; "
+              f"p50 {times[len(times) // 2]:.2f} ms, p95 {times[min(len(times) - 1, math.ceil(len(times) * 0.95) - 1)]:.2f} ms")
@@ -0,0 +1,295 @@
+# retrieval.py  batched dense / BM25 / hybrid retrieval over a KnowledgeBase with fusion and MMR / cross-encoder rerank
+import argparse
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+import embeddings
+
+RERANKERS = ("none", "mmr", "cross-encoder")
+MODES = ("dense", "sparse", "hybrid")
+FETCH_K = 20
+# Reciprocal-rank fusion constant; larger values flatten the advantage of top ranks.
+RRF_K = 60
+MMR_LAMBDA = 0.7
+CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def _load_cross_encoder(name):
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(name)
+
+
+# Cross-encoders are cached like embedding models: one per name per process.
+cross_encoders = embeddings.ModelRegistry(loader=_load_cross_encoder)
+
+
+# ---- Candidate handling ----
+def fuse(hit_lists):
+    """Union of several hit lists: each chunk once at its best distance, identical texts collapsed."""
+    best = {}
+    for hits in hit_lists:
+        for h in hits:
+            cur = best.get(h["id"])
+            if cur is None or h["distance"] < cur["distance"]:
+                best[h["id"]] = h
+    out, seen = [], set()
+    for h in sorted(best.values(), key=lambda h: h["distance"]):
+        key = " ".join(h["text"].split()).lower()
+        if key not in seen:
+            seen.add(key)
+            out.append(h)
+    return out
+
+
+def rrf(hit_lists, k=RRF_K):
+    """Reciprocal-rank fusion of ranked hit lists from any retrievers, identical texts collapsed."""
+    scores, merged = {}, {}
+    for hits in hit_lists:
+        for rank, h in enumerate(hits):
+            scores[h["id"]] = scores.get(h["id"], 0.0) + 1.0 / (k + rank + 1)
+            prev = merged.get(h["id"])
+            # Keep the dense distance and the bm25 score when both retrievers found the chunk.
+            merged[h["id"]] = dict(prev, **{key: v for key, v in h.items() if v is not None}) if prev else h
+    out, seen = [], set()
+    for vid in sorted(scores, key=lambda v: -scores[v]):
+        key = " ".join(merged[vid]["text"].split()).lower()
+        if key not in seen:
+            seen.add(key)
+            out.append(dict(merged[vid], rrf=scores[vid]))
+    return out
+
+
+def _candidates(kb, queries, fetch_k, mode, timings):
+    """Query embeddings (None for sparse) and, per retriever, one ranked hit list per query."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+    q_emb, lists = None, []
+    if mode in ("dense", "hybrid"):
+        q_emb = kb.encode(queries, timings)
+        lists.append(kb.search_vectors(q_emb, fetch_k, timings))
+    if mode in ("sparse", "hybrid"):
+        lists.append(kb.search_sparse(queries, fetch_k, timings))
+    return q_emb, lists
+
+
+def _merge(hit_lists, mode):
+    return fuse(hit_lists) if mode == "dense" else rrf(hit_lists)
+
+
+def _unit(x):
+    x = np.asarray(x, dtype="float32")
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+
+def mmr(query_vec, cand_vecs, k, lambda_mult=MMR_LAMBDA):
+    """Indices of k candidates by maximal marginal relevance (cosine), most relevant first."""
+    if not len(cand_vecs):
+        return []
+    c = _unit(cand_vecs)
+    rel = c @ _unit(query_vec)
+    pair = c @ c.T
+    selected = [int(np.argmax(rel))]
+    max_sim = pair[selected[0]].copy()
+    while len(selected) < min(k, len(c)):
+        score = lambda_mult * rel - (1 - lambda_mult) * max_sim
+        score[selected] = -np.inf
+        nxt = int(np.argmax(score))
+        selected.append(nxt)
+        max_sim = np.maximum(max_sim, pair[nxt])
+    return selected
+
+
+def rerank(kb, query, query_vec, cands, k, method="mmr", lambda_mult=MMR_LAMBDA, cross_encoder=CROSS_ENCODER):
+    if not cands or method in (None, "none"):
+        return cands[:k]
+    if method == "mmr":
+        vecs = kb.vectors(np.array([h["id"] for h in cands], dtype="int64"))
+        return [cands[i] for i in mmr(query_vec, vecs, k, lambda_mult)]
+    if method == "cross-encoder":
+        scores = cross_encoders.get(cross_encoder).predict([(query, h["text"]) for h in cands], batch_size=32)
+        order = np.argsort(-np.asarray(scores))[:k]
+        return [dict(cands[i], rerank_score=float(scores[i])) for i in order]
+    raise ValueError(f"Unknown reranker: {method}")
+
+
+# ---- Retrieval ----
+def retrieve(kb, queries, k=3, fetch_k=FETCH_K, method="mmr", mode="hybrid", timings=None, **rerank_kw):
+    """
+    Context for queries[0] (the user's question) drawn from every query in the
+    list, e.g. the question plus rewordings of it: one encode batch, one FAISS
+    search (and BM25 lookups in sparse / hybrid mode), fused and de-duplicated,
+    then reranked against the question.
+    """
+    timings = {} if timings is None else timings
+    if not queries:
+        return []
+    q_emb, lists = _candidates(kb, queries, max(k, fetch_k), mode, timings)
+    t0 = time.perf_counter()
+    cands = _merge([hits for per_query in lists for hits in per_query], mode)
+    if method == "mmr" and q_emb is None:
+        q_emb = kb.encode(queries[:1])
+    hits = rerank(kb, queries[0], q_emb[0] if q_emb is not None else None, cands, k, method, **rerank_kw)
+    timings["rerank_ms"] = (time.perf_counter() - t0) * 1000
+    timings["candidates"] = len(cands)
+    return hits
+
+
+def retrieve_many(kb, queries, k=3, fetch_k=FETCH_K, method="mmr", mode="hybrid", timings=None, **rerank_kw):
+    """Independent top-k for each query, still with one encode batch and one FAISS search."""
+    timings = {} if timings is None else timings
+    if not queries:
+        return []
+    fetch = max(k, fetch_k) if method not in (None, "none") or mode != "dense" else k
+    q_emb, lists = _candidates(kb, queries, fetch, mode, timings)
+    if method == "mmr" and q_emb is None:
+        q_emb = kb.encode(queries)
+    t0 = time.perf_counter()
+    out = []
+    for i, q in enumerate(queries):
+        cands = _merge([per_query[i] for per_query in lists], mode)
+        out.append(rerank(kb, q, q_emb[i] if q_emb is not None else None, cands, k, method, **rerank_kw))
+    timings["rerank_ms"] = (time.perf_counter() - t0) * 1000
+    return out
+
+
+class QueryBatcher:
+    """
+    Coalesces queries from concurrent callers (e.g. many sessions sharing one
+    knowledge base) that arrive within window_ms into one retrieve_many call.
+    """
+
+    def __init__(self, kb, window_ms=5.0, max_batch=64, k=3, method="mmr", mode="hybrid"):
+        self.kb = kb
+        self.mode = mode
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.k = k
+        self.method = method
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+        self._thread = threading.Thread(target=self._loop, name="query-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, query):
+        fut = Future()
+        self._queue.put((query, fut))
+        return fut
+
+    def search(self, query, timeout=None):
+        return self.submit(query).result(timeout)
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                results = retrieve_many(self.kb, [q for q, _ in batch], self.k, method=self.method, mode=self.mode)
+                for (_, fut), hits in zip(batch, results):
+                    fut.set_result(hits)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+            with self._lock:
+                self.batches += 1
+                self.queries += len(batch)
+
+    def stats(self):
+        with self._lock:
+            return {"batches": self.batches, "queries": self.queries,
+                    "avg_batch": self.queries / self.batches if self.batches else 0.0}
+
+
+# ---- Benchmark ----
+def throughput(kb, queries, batch_sizes=(1, 8, 32, 128), k=3, method="none", mode="dense"):
+    """Queries/second when the same queries are retrieved in batches of each size."""
+    rows = []
+    for bs in batch_sizes:
+        t0 = time.perf_counter()
+        for i in range(0, len(queries), bs):
+            retrieve_many(kb, queries[i:i + bs], k, method=method, mode=mode)
+        wall = time.perf_counter() - t0
+        rows.append({"batch": bs, "queries": len(queries), "wall_s": wall, "qps": len(queries) / wall})
+    return rows
+
+
+def compare_modes(kb, queries, targets, k=5, modes=MODES):
+    """Recall@k (share of queries whose target chunk id is retrieved) and ms/query per mode."""
+    rows = []
+    for mode in modes:
+        t0 = time.perf_counter()
+        found = [retrieve(kb, [q], k, method="none", mode=mode) for q in queries]
+        ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        recall = sum(t in {h["id"] for h in hits} for t, hits in zip(targets, found)) / len(queries)
+        rows.append({"mode": mode, "recall": recall, "ms_per_query": ms})
+    return rows
+
+
+def sample_queries(kb, n, seed=0):
+    """
+    (kind, query, target id) triples from random chunks: "keyword" queries are
+    the chunk's three rarest terms (tool names, acronyms), "natural" queries
+    its opening words.
+    """
+    import random
+
+    from skill_matcher import tokenize
+
+    rng = random.Random(seed)
+    ids = rng.sample(sorted(kb.chunks), min(n, len(kb.chunks)))
+    out = []
+    for i, vid in enumerate(ids):
+        text = kb.chunks[vid]["text"]
+        if i % 2:
+            out.append(("natural", " ".join(text.split()[:12]), vid))
+        else:
+            terms = sorted(set(tokenize(text)), key=lambda t: len(kb.bm25.terms.get(t, ((),))[0]))
+            out.append(("keyword", " ".join(terms[:3]), vid))
+    return out
+
+
+if __name__ == "__main__":
+    from knowledge_base import KnowledgeBase
+
+    ap = argparse.ArgumentParser(description="Retrieval benchmarks over PDFs: dense / sparse / hybrid recall "
+                                             "and batched vs single-query throughput.")
+    ap.add_argument("pdfs", nargs="+")
+    ap.add_argument("--queries", type=int, default=256)
+    ap.add_argument("--batches", default="1,8,32,128")
+    ap.add_argument("--rerank", choices=RERANKERS, default="none")
+    ap.add_argument("-k", type=int, default=5)
+    args = ap.parse_args()
+
+    kb = KnowledgeBase()
+    for path in args.pdfs:
+        with open(path, "rb") as f:
+            kb.add_document(f.read(), path)
+    samples = sample_queries(kb, args.queries)
+    queries = [q for _, q, _ in samples]
+    retrieve_many(kb, queries[:4])   # warm up the model
+    print(f"{kb.ntotal} chunks from {len(kb.docs)} PDFs, {len(queries)} queries")
+
+    print(f"\nrecall@{args.k}")
+    print(f"{'mode':>8}{'keyword':>9}{'natural':>9}{'ms/query':>10}")
+    kw, nat = [compare_modes(kb, [q for kd, q, _ in samples if kd == kind],
+                             [t for kd, _, t in samples if kd == kind], args.k) for kind in ("keyword", "natural")]
+    for a, b in zip(kw, nat):
+        print(f"{a['mode']:>8}{a['recall']:>9.2f}{b['recall']:>9.2f}{(a['ms_per_query'] + b['ms_per_query']) / 2:>10.2f}")
+
+    print(f"\nthroughput, dense, rerank={args.rerank}")
+    print(f"{'batch':>6}{'wall s':>9}{'queries/s':>11}")
+    for r in throughput(kb, queries, [int(b) for b in args.batches.split(",")], method=args.rerank):
+        print(f"{r['batch']:>6}{r['wall_s']:>9.2f}{r['qps']:>11.1f}")
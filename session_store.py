@@ -0,0 +1,421 @@
+# session_store.py  small per-session handles over a shared content-addressed artifact store (SQLite or disk)
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from utils import CACHE_DIR
+
+DB_PATH = os.getenv("SESSION_STORE_PATH", os.path.join(CACHE_DIR, "sessions.sqlite3"))
+BLOB_DIR = os.path.join(CACHE_DIR, "artifacts")
+# "sqlite" keeps artifacts as blobs in DB_PATH, "disk" as files under BLOB_DIR.
+BACKEND = os.getenv("SESSION_STORE_BACKEND", "sqlite")
+# Decoded artifacts kept in memory, shared by every session in the process.
+CACHE_BYTES = int(os.getenv("SESSION_CACHE_BYTES", str(256 * 1024 ** 2)))
+# Sessions untouched this long are dropped by gc(), with artifacts nobody else references.
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(7 * 24 * 3600)))
+# How often a long-running server repeats gc().
+GC_INTERVAL = float(os.getenv("SESSION_GC_INTERVAL", "3600"))
+# gc() spares artifacts stored or re-put this recently: their handle may not be written yet.
+GC_GRACE = float(os.getenv("SESSION_GC_GRACE", "3600"))
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS handles (
+    session_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (session_id, name)
+);
+CREATE INDEX IF NOT EXISTS handles_digest ON handles(digest);
+CREATE INDEX IF NOT EXISTS handles_updated ON handles(updated);
+"""
+
+
+def deep_sizeof(obj, _seen=None):
+    """Approximate bytes held by obj: containers walked recursively, NumPy arrays by nbytes (mmaps count 0)."""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (Session, SessionStore)):
+        # Handles only; what they point to is reported per artifact.
+        return sys.getsizeof(obj)
+    if isinstance(obj, np.memmap):
+        return sys.getsizeof(obj) - obj.nbytes if obj.base is None else 0
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes if obj.base is None else 0
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, OrderedDict)):
+        size += sum(deep_sizeof(x, seen) for x in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def footprint(mapping):
+    """{key: approximate bytes} of a mapping such as st.session_state, largest first."""
+    sizes = {str(k): deep_sizeof(v) for k, v in mapping.items()}
+    return dict(sorted(sizes.items(), key=lambda kv: -kv[1]))
+
+
+# ---- Backends ----
+class _Conn:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.get().executescript(SCHEMA)
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class SQLiteBackend:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def put(self, digest, data):
+        self.conn.get().execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?)",
+                                (digest, data, len(data), time.time()))
+
+    def touch(self, digest):
+        """Whether digest is stored; if so its created time is reset to now."""
+        cur = self.conn.get().execute("UPDATE blobs SET created = ? WHERE digest = ?", (time.time(), digest))
+        return cur.rowcount > 0
+
+    def get(self, digest):
+        row = self.conn.get().execute("SELECT data FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def delete(self, digests):
+        self.conn.get().executemany("DELETE FROM blobs WHERE digest = ?", ((d,) for d in digests))
+
+    def digests(self, before=None):
+        """Stored digests, or only those created before the given time."""
+        if before is None:
+            return {r[0] for r in self.conn.get().execute("SELECT digest FROM blobs")}
+        return {r[0] for r in self.conn.get().execute("SELECT digest FROM blobs WHERE created < ?", (before,))}
+
+    def nbytes(self):
+        return self.conn.get().execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+
+class DiskBackend:
+    def __init__(self, root=BLOB_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, digest, data):
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def touch(self, digest):
+        try:
+            os.utime(self._path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def get(self, digest):
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, digests):
+        for d in digests:
+            try:
+                os.remove(self._path(d))
+            except FileNotFoundError:
+                pass
+
+    def digests(self, before=None):
+        out = set()
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.startswith("."):
+                    continue
+                try:
+                    if before is None or os.path.getmtime(os.path.join(dirpath, name)) < before:
+                        out.add(name)
+                except FileNotFoundError:
+                    pass
+        return out
+
+    def nbytes(self):
+        return sum(os.path.getsize(os.path.join(dirpath, f))
+                   for dirpath, _, files in os.walk(self.root) for f in files)
+
+
+# ---- Store ----
+class SessionStore:
+    """
+    Artifacts are pickled, addressed by SHA-256 of their bytes (so identical
+    question sets, results or chat states from different users are stored
+    once) and kept decoded in a process-wide LRU. Sessions only own handles
+    (name -> digest rows in SQLite), which also survive restarts. Objects
+    returned by get() are shared: treat them as read-only and put() a new
+    version to change one.
+    """
+
+    def __init__(self, path=DB_PATH, backend=BACKEND, cache_bytes=CACHE_BYTES):
+        self.conn = _Conn(path)
+        self.backend = SQLiteBackend(self.conn) if backend == "sqlite" else DiskBackend()
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()    # digest -> (obj, size)
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._metrics = {"puts": 0, "dedup_puts": 0, "hits": 0, "loads": 0}
+        self._last_gc = 0.0
+
+    # ---- Artifacts ----
+    def put_artifact(self, obj):
+        """(digest, size in bytes) of obj, stored unless an identical artifact already is."""
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        digest = hashlib.sha256(data).hexdigest()
+        # Ask the backend, not the LRU: another process's gc() may have deleted
+        # the blob. touch() also restarts its gc grace period.
+        known = self.backend.touch(digest)
+        if not known:
+            self.backend.put(digest, data)
+        with self._lock:
+            self._metrics["puts"] += 1
+            self._metrics["dedup_puts"] += known
+        self._remember(digest, obj, len(data))
+        return digest, len(data)
+
+    def get_artifact(self, digest):
+        with self._lock:
+            hit = self._cache.get(digest)
+            if hit is not None:
+                self._cache.move_to_end(digest)
+                self._metrics["hits"] += 1
+                return hit[0]
+        data = self.backend.get(digest)
+        if data is None:
+            return None
+        obj = pickle.loads(data)
+        with self._lock:
+            self._metrics["loads"] += 1
+        self._remember(digest, obj, len(data))
+        return obj
+
+    def _remember(self, digest, obj, size):
+        with self._lock:
+            if digest in self._cache:
+                return
+            self._cache[digest] = (obj, size)
+            self._cached_bytes += size
+            while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+                _, (_, old) = self._cache.popitem(last=False)
+                self._cached_bytes -= old
+
+    # ---- Handles ----
+    def session(self, session_id=None, scope=""):
+        return Session(self, session_id or uuid.uuid4().hex, scope)
+
+    def exists(self, session_id):
+        row = self.conn.get().execute("SELECT 1 FROM handles WHERE session_id = ? LIMIT 1", (session_id,))
+        return row.fetchone() is not None
+
+    def maybe_gc(self, interval=GC_INTERVAL):
+        """gc() at most once per interval seconds, so a server that never restarts still sweeps."""
+        with self._lock:
+            due = time.time() - self._last_gc >= interval
+            if due:
+                self._last_gc = time.time()
+        return self.gc() if due else None
+
+    def gc(self, ttl=SESSION_TTL, grace=GC_GRACE):
+        """
+        Drop sessions idle for ttl seconds, then artifacts no handle points to
+        that were stored more than grace seconds ago. Returns (sessions, artifacts).
+        """
+        conn = self.conn.get()
+        now = time.time()
+        cutoff = now - ttl
+        stale = [r[0] for r in conn.execute(
+            "SELECT session_id FROM handles GROUP BY session_id HAVING MAX(updated) < ?", (cutoff,))]
+        conn.executemany("DELETE FROM handles WHERE session_id = ?", ((s,) for s in stale))
+        live = {r[0] for r in conn.execute("SELECT DISTINCT digest FROM handles")}
+        # A blob put within grace may still be waiting for its handle row.
+        dead = self.backend.digests(before=now - grace) - live
+        self.backend.delete(dead)
+        with self._lock:
+            for d in dead:
+                entry = self._cache.pop(d, None)
+                if entry:
+                    self._cached_bytes -= entry[1]
+        return len(stale), len(dead)
+
+    def handle_values(self, name):
+        """Every session's value for handle name, e.g. to find which external artifacts are still referenced."""
+        rows = self.conn.get().execute("SELECT DISTINCT digest FROM handles WHERE name = ?", (name,))
+        return [obj for obj in (self.get_artifact(r[0]) for r in rows.fetchall()) if obj is not None]
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics, cached=len(self._cache), cached_bytes=self._cached_bytes)
+        conn = self.conn.get()
+        m["sessions"] = conn.execute("SELECT COUNT(DISTINCT session_id) FROM handles").fetchone()[0]
+        m["handle_bytes"] = conn.execute("SELECT COALESCE(SUM(size), 0) FROM handles").fetchone()[0]
+        m["stored_bytes"] = self.backend.nbytes()
+        return m
+
+
+class Session:
+    """One browser session's handles; scope namespaces them so pages of one app don't collide."""
+
+    def __init__(self, store, session_id, scope=""):
+        self.store = store
+        self.id = session_id
+        self.prefix = f"{scope}/" if scope else ""
+        self._handles = None   # name -> (digest, size), loaded on first use
+
+    def _load(self):
+        if self._handles is None:
+            rows = self.store.conn.get().execute(
+                "SELECT name, digest, size FROM handles WHERE session_id = ? AND substr(name, 1, ?) = ?",
+                (self.id, len(self.prefix), self.prefix))
+            self._handles = {name[len(self.prefix):]: (digest, size) for name, digest, size in rows
+                             if self.prefix or "/" not in name}
+        return self._handles
+
+    def __contains__(self, name):
+        return name in self._load()
+
+    def put(self, name, obj):
+        digest, size = self.store.put_artifact(obj)
+        handles = self._load()
+        if handles.get(name) != (digest, size):
+            handles[name] = (digest, size)
+            self.store.conn.get().execute("INSERT OR REPLACE INTO handles VALUES (?, ?, ?, ?, ?)",
+                                          (self.id, self.prefix + name, digest, size, time.time()))
+        return digest
+
+    def get(self, name, default=None):
+        entry = self._load().get(name)
+        if entry is None:
+            return default
+        obj = self.store.get_artifact(entry[0])
+        return default if obj is None else obj
+
+    def delete(self, name):
+        if self._load().pop(name, None) is not None:
+            self.store.conn.get().execute("DELETE FROM handles WHERE session_id = ? AND name = ?",
+                                          (self.id, self.prefix + name))
+
+    def report(self, state=None):
+        """
+        Memory report: bytes of st.session_state itself (state) per key, and
+        per handle the artifact's size and how many sessions share it.
+        """
+        handles = self._load()
+        conn = self.store.conn.get()
+        shared = {}
+        for name, (digest, _) in handles.items():
+            shared[name] = conn.execute("SELECT COUNT(DISTINCT session_id) FROM handles WHERE digest = ?",
+                                        (digest,)).fetchone()[0]
+        in_state = footprint(state) if state is not None else {}
+        return {
+            "session_state_bytes": sum(in_state.values()),
+            "session_state": in_state,
+            "artifacts": {name: {"bytes": size, "sessions": shared[name]} for name, (_, size) in handles.items()},
+            "artifact_bytes": sum(size for _, size in handles.values()),
+            # Shared artifacts are charged to each session by its share.
+            "attributed_bytes": sum(size / max(shared[name], 1) for name, (_, size) in handles.items()),
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+        store = _store
+    # Forget sessions idle past SESSION_TTL, now and then.
+    store.maybe_gc()
+    return store
+
+
+def streamlit_session(st, scope=""):
+    """
+    This browser session's Session. Its id is kept in st.session_state only,
+    never in the URL, since it is the sole credential for the session's data;
+    render_resume() lets a user carry it to a new tab or past a restart.
+    """
+    sid = st.session_state.get("_sid")
+    if sid is None:
+        sid = st.session_state["_sid"] = uuid.uuid4().hex
+    key = f"_session/{scope}"
+    session = st.session_state.get(key)
+    if session is None or session.id != sid:
+        session = st.session_state[key] = get_store().session(sid, scope)
+    return session
+
+
+def render_report(st, session):
+    """The session's memory report, for a sidebar expander."""
+    r = session.report(st.session_state)
+    st.write(f"Session state: {r['session_state_bytes'] / 1e3:.1f} kB "
+             f"({', '.join(f'{k} {v / 1e3:.1f} kB' for k, v in list(r['session_state'].items())[:3]) or 'empty'})")
+    st.write(f"Stored artifacts: {r['artifact_bytes'] / 1e3:.1f} kB, "
+             f"{r['attributed_bytes'] / 1e3:.1f} kB after sharing with other sessions")
+    for name, a in r["artifacts"].items():
+        st.caption(f"{name}: {a['bytes'] / 1e3:.1f} kB" + (f", shared by {a['sessions']} sessions"
+                                                             if a["sessions"] > 1 else ""))
+
+
+def render_resume(st):
+    """Opt-in resume token: shows this session's, or switches to a previous one pasted in."""
+    st.caption("Resume token — paste it in a new tab to continue this session. "
+               "Anyone who has it can see this session's data, so keep it private.")
+    if st.checkbox("Show my token", key="_show_sid"):
+        st.code(st.session_state.get("_sid", ""), language=None)
+    token = st.text_input("Resume a previous session", key="_resume_sid", type="password").strip().lower()
+    if token and st.button("Resume", key="_resume_go"):
+        if not _SESSION_ID.match(token) or not get_store().exists(token):
+            st.error("No saved session with that token.")
+        else:
+            st.session_state["_sid"] = token
+            st.rerun()
@@ -0,0 +1,229 @@
+# skill_matcher.py  precompiled resume-vs-skill matching: token Aho-Corasick + vectorized fuzzy pass
+import argparse
+import random
+import re
+import time
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+_TOKEN = re.compile(r"[a-z0-9]+[+#]*")
+
+# alias -> canonical skill name; extended by the taxonomy when one is loaded.
+# No bare short forms like "np", "tf", "js" or "node": they fire on "NP-hard",
+# "tf-idf" or "a node in a graph". "node.js" itself tokenizes to the skill name.
+DEFAULT_ALIASES = {
+    "k8s": "Kubernetes",
+    "sklearn": "Scikit-learn",
+    "scikit learn": "Scikit-learn",
+    "torch": "PyTorch",
+    "nodejs": "Node.js",
+    "reactjs": "React",
+    "react.js": "React",
+    "golang": "Go",
+    "postgres": "PostgreSQL",
+    "amazon web services": "AWS",
+    "ci cd": "CI/CD",
+    "continuous integration": "CI/CD",
+    "object oriented programming": "OOP",
+    "dsa": "Data Structures",
+    "machine learning algorithms": "ML Algorithms",
+}
+
+
+def _is_short(norm):
+    # One or two characters ("r", "c", "go", "c#"): lowercased tokens are too ambiguous to match on.
+    return bool(norm) and " " not in norm and len(norm) <= 2
+
+
+def _short_pattern(terms):
+    """Case-sensitive standalone match: "R" but not "R&D", "C" but not "C++", "Go" but not "go-to"."""
+    alts = "|".join(re.escape(t) for t in sorted(set(terms), key=len, reverse=True))
+    return re.compile(rf"(?<![\w&+#-])(?:{alts})(?![\w&+#-])")
+
+
+def tokenize(text):
+    """Lowercase word tokens; keeps c++ / c# intact and splits node.js, ci/cd, scikit-learn."""
+    return _TOKEN.findall(text.lower())
+
+
+class _TokenAutomaton:
+    """Aho-Corasick automaton over token sequences, so "java" never matches inside "javascript"."""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+    def add(self, tokens, value):
+        node = 0
+        for tok in tokens:
+            nxt = self.goto[node].get(tok)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][tok] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append(value)
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for tok, child in self.goto[node].items():
+                queue.append(child)
+                if node:
+                    f = self.fail[node]
+                    while f and tok not in self.goto[f]:
+                        f = self.fail[f]
+                    self.fail[child] = self.goto[f].get(tok, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, tokens):
+        found, node = set(), 0
+        for tok in tokens:
+            while node and tok not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(tok, 0)
+            if self.out[node]:
+                found.update(self.out[node])
+        return found
+
+
+class SkillMatcher:
+    """
+    Built once per skill list: an exact pass over the tokenized resume finds
+    every skill and alias in one scan; only skills left unmatched are scored
+    fuzzily, all at once with process.cdist against the resume's n-grams.
+    One- and two-character names are matched case-sensitively as standalone
+    words in the original text instead, and never fuzzily.
+    """
+
+    def __init__(self, skills, aliases=None):
+        self.skills = list(dict.fromkeys(skills))
+        self.norm = {s: " ".join(tokenize(s)) for s in self.skills}
+        self.automaton = _TokenAutomaton()
+        canon = {n: s for s, n in self.norm.items()}
+        short_terms = {}   # skill -> spellings matched by regex
+        for s, n in self.norm.items():
+            if _is_short(n):
+                short_terms.setdefault(s, []).append(s.strip())
+            elif n:
+                self.automaton.add(n.split(), s)
+        for alias, target in {**DEFAULT_ALIASES, **(aliases or {})}.items():
+            skill = canon.get(" ".join(tokenize(target)))
+            toks = tokenize(alias)
+            if skill is None or not toks:
+                continue
+            if _is_short(" ".join(toks)):
+                short_terms.setdefault(skill, []).append(alias.strip())
+            else:
+                self.automaton.add(toks, skill)
+        self.automaton.build()
+        self.short = {s: _short_pattern(terms) for s, terms in short_terms.items()}
+        # Group skills by token length so each is only compared to n-grams of that length.
+        self.by_len = {}
+        for s, n in self.norm.items():
+            if n and not _is_short(n):
+                self.by_len.setdefault(len(n.split()), []).append(s)
+
+    def match(self, text, threshold=80):
+        """(matched, missing) in the original skill order."""
+        tokens = tokenize(text)
+        found = self.automaton.find(tokens)
+        found.update(s for s, pattern in self.short.items() if pattern.search(text))
+        if threshold < 100:
+            found |= self._fuzzy(tokens, found, threshold)
+        matched = [s for s in self.skills if s in found]
+        missing = [s for s in self.skills if s not in found]
+        return matched, missing
+
+    def _fuzzy(self, tokens, found, threshold):
+        hits = set()
+        for n, group in self.by_len.items():
+            pending = [s for s in group if s not in found]
+            if not pending or len(tokens) < n:
+                continue
+            grams = list({" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)})
+            scores = process.cdist([self.norm[s] for s in pending], grams, scorer=fuzz.ratio,
+                                   score_cutoff=threshold, dtype=np.uint8, workers=-1)
+            for row in np.flatnonzero(scores.max(axis=1) >= threshold):
+                hits.add(pending[row])
+        return hits
+
+
+def ats_score(matched, total_skills):
+    total = len(total_skills)
+    return round((len(matched) / total) * 100, 2) if total > 0 else 0
+
+
+@lru_cache(maxsize=64)
+def _cached_matcher(skills, aliases):
+    return SkillMatcher(skills, dict(aliases))
+
+
+def get_matcher(skills, aliases=None):
+    """Matcher for this skill list, compiled once and reused across reruns."""
+    return _cached_matcher(tuple(skills), tuple(sorted((aliases or {}).items())))
+
+
+# ---- Benchmark ----
+def legacy_match(text, skill_list, threshold=80):
+    """The previous per-skill fuzz.partial_ratio scan, for comparison."""
+    matched = [s for s in skill_list if fuzz.partial_ratio(s.lower(), text.lower()) >= threshold]
+    missing = [s for s in skill_list if s not in matched]
+    return matched, missing
+
+
+def _synthetic(n_skills, n_resumes, words_per_resume=600, seed=0):
+    rng = random.Random(seed)
+    syll = ["py", "tor", "ka", "flow", "net", "sql", "ops", "lin", "dat", "ra", "go", "ja", "ver", "mon", "qu"]
+    vocab = ["".join(rng.choice(syll) for _ in range(rng.randint(2, 4))) for _ in range(5000)]
+    skills = list(dict.fromkeys(
+        " ".join(rng.choice(vocab) for _ in range(rng.choice((1, 1, 1, 2, 2, 3)))).title()
+        for _ in range(n_skills * 2)
+    ))[:n_skills]
+    resumes = []
+    for _ in range(n_resumes):
+        words = [rng.choice(vocab) for _ in range(words_per_resume)]
+        for s in rng.sample(skills, min(20, len(skills))):
+            words.insert(rng.randrange(len(words)), s)
+        resumes.append(" ".join(words))
+    return skills, resumes
+
+
+def benchmark(skill_sizes=(100, 1000, 10000), n_resumes=20, legacy_max=1000):
+    rows = []
+    for n in skill_sizes:
+        skills, resumes = _synthetic(n, n_resumes)
+        t0 = time.perf_counter()
+        matcher = SkillMatcher(skills)
+        build_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        for r in resumes:
+            matcher.match(r)
+        new_ms = (time.perf_counter() - t0) * 1000 / n_resumes
+        legacy_ms = None
+        if n <= legacy_max:
+            t0 = time.perf_counter()
+            for r in resumes:
+                legacy_match(r, skills)
+            legacy_ms = (time.perf_counter() - t0) * 1000 / n_resumes
+        rows.append({"skills": n, "build_ms": build_ms, "ms_per_resume": new_ms, "legacy_ms_per_resume": legacy_ms})
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark skill matching over resume x taxonomy sizes.")
+    ap.add_argument("--skills", default="100,1000,10000")
+    ap.add_argument("--resumes", type=int, default=20)
+    ap.add_argument("--legacy-max", type=int, default=1000, help="largest taxonomy to time the old matcher on")
+    args = ap.parse_args()
+    print(f"{'skills':>8}{'build ms':>10}{'ms/resume':>11}{'legacy ms/resume':>18}")
+    for r in benchmark([int(x) for x in args.skills.split(",")], args.resumes, args.legacy_max):
+        legacy = f"{r['legacy_ms_per_resume']:.1f}" if r["legacy_ms_per_resume"] is not None else "-"
+        print(f"{r['skills']:>8}{r['build_ms']:>10.1f}{r['ms_per_resume']:>11.1f}{legacy:>18}")
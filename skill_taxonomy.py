@@ -0,0 +1,239 @@
+# skill_taxonomy.py  versioned skill taxonomy (JSON or SQLite) with prebuilt lookups and hot reload
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+TAXONOMY_PATH = os.getenv("SKILL_TAXONOMY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                               "data", "skill_taxonomy.json"))
+# How often (seconds) accessors stat the file to pick up a new version.
+RELOAD_INTERVAL = float(os.getenv("SKILL_TAXONOMY_RELOAD_S", "5"))
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS skills (name TEXT PRIMARY KEY, category TEXT NOT NULL DEFAULT '');
+CREATE TABLE IF NOT EXISTS aliases (alias TEXT PRIMARY KEY, skill TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS domain_weights (
+    domain TEXT NOT NULL,
+    skill TEXT NOT NULL,
+    weight REAL NOT NULL,
+    PRIMARY KEY (domain, skill)
+);
+"""
+
+
+def _norm(name):
+    return " ".join(name.lower().split())
+
+
+class Taxonomy:
+    """
+    An immutable snapshot of the taxonomy. Every lookup table is built once
+    here, so accessors are dict reads; a new version is a new Taxonomy.
+    """
+
+    def __init__(self, version, skills, source=None):
+        self.version = str(version)
+        self.source = source
+        self.skills = {}        # canonical name -> {"category", "aliases", "domains"}
+        self.by_name = {}       # normalized name or alias -> canonical name
+        self.by_category = {}   # category -> [names]
+        self.by_domain = {}     # domain -> ((name, weight), ...) heaviest first
+        for s in skills:
+            name = s["name"]
+            entry = {"category": s.get("category") or "", "aliases": list(s.get("aliases") or []),
+                     "domains": dict(s.get("domains") or {})}
+            self.skills[name] = entry
+            self.by_name[_norm(name)] = name
+            self.by_category.setdefault(entry["category"], []).append(name)
+            for domain, weight in entry["domains"].items():
+                self.by_domain.setdefault(domain, []).append((name, float(weight)))
+        # Aliases never shadow a canonical name.
+        for name, entry in self.skills.items():
+            for alias in entry["aliases"]:
+                self.by_name.setdefault(_norm(alias), name)
+        for domain, pairs in self.by_domain.items():
+            pairs.sort(key=lambda p: (-p[1], p[0]))
+            self.by_domain[domain] = tuple(pairs)
+        self._domain_cache = {}
+        self._matcher = None
+
+    def __len__(self):
+        return len(self.skills)
+
+    def domains(self):
+        return sorted(self.by_domain)
+
+    def canonical(self, name):
+        """Canonical skill for a name or alias, or None."""
+        return self.by_name.get(_norm(name))
+
+    def domain_skills(self, domain, limit=None):
+        """The domain's skills by descending weight, as a cached tuple."""
+        key = (domain, limit)
+        hit = self._domain_cache.get(key)
+        if hit is None:
+            pairs = self.by_domain.get(domain, ())
+            hit = self._domain_cache[key] = tuple(name for name, _ in pairs[:limit])
+        return hit
+
+    def weights(self, domain):
+        return dict(self.by_domain.get(domain, ()))
+
+    def aliases_for(self, names):
+        """alias -> canonical for the given skills, ready for skill_matcher.get_matcher."""
+        out = {}
+        for name in names:
+            entry = self.skills.get(name)
+            if entry:
+                for alias in entry["aliases"]:
+                    out[alias] = name
+        return out
+
+    def matcher(self):
+        """A SkillMatcher over every skill and alias, compiled on first use."""
+        if self._matcher is None:
+            from skill_matcher import SkillMatcher
+            self._matcher = SkillMatcher(list(self.skills), self.aliases_for(self.skills))
+        return self._matcher
+
+
+# ---- Loading ----
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return Taxonomy(data.get("version", "0"), data.get("skills", []), source=path)
+
+
+def load_sqlite(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        skills = {name: {"name": name, "category": cat, "aliases": [], "domains": {}}
+                  for name, cat in conn.execute("SELECT name, category FROM skills")}
+        for alias, skill in conn.execute("SELECT alias, skill FROM aliases"):
+            if skill in skills:
+                skills[skill]["aliases"].append(alias)
+        for domain, skill, weight in conn.execute("SELECT domain, skill, weight FROM domain_weights"):
+            if skill in skills:
+                skills[skill]["domains"][domain] = weight
+    finally:
+        conn.close()
+    return Taxonomy(row[0] if row else "0", skills.values(), source=path)
+
+
+def load(path):
+    if path.lower().endswith((".sqlite", ".sqlite3", ".db")):
+        return load_sqlite(path)
+    return load_json(path)
+
+
+def save_sqlite(taxonomy, path):
+    """Write a taxonomy to SQLite, e.g. to maintain a large one with SQL tooling."""
+    tmp = f"{path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(SQLITE_SCHEMA)
+        conn.execute("INSERT INTO meta VALUES ('version', ?)", (taxonomy.version,))
+        conn.executemany("INSERT INTO skills VALUES (?, ?)",
+                         ((n, e["category"]) for n, e in taxonomy.skills.items()))
+        conn.executemany("INSERT OR IGNORE INTO aliases VALUES (?, ?)",
+                         ((a, n) for n, e in taxonomy.skills.items() for a in e["aliases"]))
+        conn.executemany("INSERT INTO domain_weights VALUES (?, ?, ?)",
+                         ((d, n, w) for n, e in taxonomy.skills.items() for d, w in e["domains"].items()))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+
+
+class TaxonomyStore:
+    """
+    Holds the current Taxonomy (or whatever `loader` returns) for a file. Readers get the snapshot without
+    locking; at most every `interval` seconds one reader stats the file and,
+    if it changed, the new version is parsed and swapped in. A file that
+    fails to parse keeps the previous version live.
+    """
+
+    def __init__(self, path=TAXONOMY_PATH, interval=RELOAD_INTERVAL, loader=None):
+        self.path = path
+        self.interval = interval
+        self.loader = loader or load
+        self._lock = threading.Lock()
+        self._current = None
+        self._mtime = None
+        self._checked = 0.0
+        self.last_error = None
+        self.reloads = 0
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def get(self):
+        now = time.monotonic()
+        if self._current is not None and now - self._checked < self.interval:
+            return self._current
+        with self._lock:
+            if self._current is not None and now - self._checked < self.interval:
+                return self._current
+            self._checked = now
+            mtime = self._stat()
+            if mtime is not None and mtime != self._mtime:
+                try:
+                    self._current = self.loader(self.path)
+                    self._mtime = mtime
+                    self.reloads += 1
+                    self.last_error = None
+                except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+                    self.last_error = str(e)
+            return self._current
+
+    def reload(self):
+        """Force a re-read on the next access."""
+        with self._lock:
+            self._mtime = None
+            self._checked = 0.0
+        return self.get()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=TAXONOMY_PATH):
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = TaxonomyStore(path)
+        return store
+
+
+def get_taxonomy(path=TAXONOMY_PATH):
+    """The current taxonomy for path, or None if the file is missing or unreadable."""
+    return get_store(path).get()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Inspect a skill taxonomy or convert it to SQLite.")
+    ap.add_argument("path", nargs="?", default=TAXONOMY_PATH)
+    ap.add_argument("--to-sqlite", metavar="OUT", help="write the taxonomy to a SQLite file")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    tax = load(args.path)
+    load_ms = (time.perf_counter() - t0) * 1000
+    print(f"version {tax.version}: {len(tax)} skills, {len(tax.by_name) - len(tax)} aliases, "
+          f"{len(tax.by_category)} categories, {len(tax.by_domain)} domains (loaded in {load_ms:.1f} ms)")
+    for d in tax.domains():
+        print(f"  {d}: {len(tax.by_domain[d])} skills, top: {', '.join(tax.domain_skills(d, 5))}")
+    if args.to_sqlite:
+        save_sqlite(tax, args.to_sqlite)
+        print(f"written to {args.to_sqlite}")
@@ -0,0 +1,364 @@
+# speech.py  bounded audio capture (ring buffer, 16 kHz resampling), energy VAD and local speech-to-text
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+import embeddings
+
+SAMPLE_RATE = 16000
+# Longest answer kept per question; older audio is overwritten beyond this.
+MAX_ANSWER_SECONDS = float(os.getenv("ANSWER_MAX_SECONDS", "180"))
+STT_MODEL = os.getenv("STT_MODEL", "base.en")
+STT_COMPUTE_TYPE = os.getenv("STT_COMPUTE_TYPE", "int8")
+STT_THREADS = int(os.getenv("STT_THREADS", "0"))   # 0 = faster-whisper's default
+
+# VAD
+FRAME_MS = 30
+MIN_SPEECH_MS = 250
+MIN_SILENCE_MS = 600
+PAD_MS = 200
+# A frame is speech when louder than the noise floor by this much (and than SPEECH_MIN_DB absolute).
+SPEECH_MARGIN_DB = 10.0
+SPEECH_MIN_DB = -50.0
+# Whisper decodes 30 s windows; longer segments are cut to fit.
+MAX_SEGMENT_S = 30.0
+
+
+# ---- Capture ----
+def to_mono(samples, channels=1, planar=False):
+    """float32 mono in [-1, 1] from an audio frame's ndarray (integer PCM or float, packed or planar)."""
+    a = np.asarray(samples)
+    if a.dtype.kind in "iu":
+        a = a.astype("float32") / float(2 ** (8 * a.dtype.itemsize - 1))
+    else:
+        a = a.astype("float32", copy=False)
+    if channels <= 1:
+        return a.reshape(-1)
+    if planar:
+        return a.reshape(channels, -1).mean(axis=0)
+    return a.reshape(-1, channels).mean(axis=1)
+
+
+def _lowpass(taps, cutoff):
+    """Hamming-windowed sinc FIR; cutoff as a fraction of the input sample rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (h / h.sum()).astype("float32")
+
+
+class Resampler:
+    """
+    Streaming resampler to dst_rate: low-pass FIR when downsampling, then
+    linear interpolation. Filter history and the fractional read position
+    carry over between chunks, so frame boundaries leave no clicks.
+    """
+
+    def __init__(self, src_rate, dst_rate=SAMPLE_RATE, taps=31):
+        self.src_rate = src_rate
+        self.step = src_rate / dst_rate
+        self.kernel = _lowpass(taps, 0.45 / self.step) if self.step > 1 else None
+        self._hist = np.zeros(taps - 1 if self.kernel is not None else 0, dtype="float32")
+        self._pos = 0.0     # next output position, in samples from the start of the next chunk
+        self._last = 0.0    # last (filtered) sample of the previous chunk
+
+    def process(self, x):
+        x = np.asarray(x, dtype="float32")
+        if self.step == 1:
+            return x
+        if self.kernel is not None:
+            padded = np.concatenate([self._hist, x])
+            y = np.convolve(padded, self.kernel, mode="valid")
+            self._hist = padded[len(padded) - len(self._hist):]
+        else:
+            y = x
+        if not len(y) or self._pos > len(y) - 1:
+            self._pos -= len(y)
+            return np.zeros(0, dtype="float32")
+        n_out = int((len(y) - 1 - self._pos) // self.step) + 1
+        positions = self._pos + self.step * np.arange(n_out)
+        # Index 0 of ext is the previous chunk's last sample, at position -1.
+        ext = np.concatenate([[self._last], y])
+        out = np.interp(positions + 1, np.arange(len(ext)), ext).astype("float32")
+        self._pos += self.step * n_out - len(y)
+        self._last = float(y[-1])
+        return out
+
+
+class RingBuffer:
+    """Preallocated float32 ring: writes never allocate, and only the newest `capacity` samples are kept."""
+
+    def __init__(self, capacity):
+        self.buf = np.zeros(int(capacity), dtype="float32")
+        self.capacity = int(capacity)
+        self.pos = 0        # next write index
+        self.size = 0
+        self.dropped = 0    # samples overwritten since the last clear()
+
+    def __len__(self):
+        return self.size
+
+    def write(self, x):
+        n = len(x)
+        if n >= self.capacity:
+            self.dropped += self.size + n - self.capacity
+            self.buf[:] = x[n - self.capacity:]
+            self.pos, self.size = 0, self.capacity
+            return
+        self.dropped += max(self.size + n - self.capacity, 0)
+        first = min(n, self.capacity - self.pos)
+        self.buf[self.pos:self.pos + first] = x[:first]
+        self.buf[:n - first] = x[first:]
+        self.pos = (self.pos + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def read(self):
+        """The buffered samples, oldest first (a copy)."""
+        start = (self.pos - self.size) % self.capacity
+        if start + self.size <= self.capacity:
+            return self.buf[start:start + self.size].copy()
+        return np.concatenate([self.buf[start:], self.buf[:self.pos]])
+
+    def clear(self):
+        self.pos = self.size = self.dropped = 0
+
+
+class AnswerRecorder:
+    """
+    Audio of one spoken answer. push() runs on the WebRTC callback thread, so
+    it only converts, resamples and copies into a preallocated ring buffer;
+    take() hands the audio to the caller and starts a new answer.
+    """
+
+    def __init__(self, max_seconds=MAX_ANSWER_SECONDS, rate=SAMPLE_RATE):
+        self.rate = rate
+        self.ring = RingBuffer(max_seconds * rate)
+        self._resampler = None
+        self._lock = threading.Lock()
+
+    @property
+    def seconds(self):
+        return len(self.ring) / self.rate
+
+    def push(self, samples, src_rate, channels=1, planar=False):
+        mono = to_mono(samples, channels, planar)
+        with self._lock:
+            if self._resampler is None or self._resampler.src_rate != src_rate:
+                self._resampler = Resampler(src_rate, self.rate)
+            self.ring.write(self._resampler.process(mono))
+
+    def take(self):
+        """(audio at self.rate, seconds dropped because the answer ran past max_seconds)."""
+        with self._lock:
+            audio, dropped = self.ring.read(), self.ring.dropped / self.rate
+            self.ring.clear()
+            self._resampler = None
+        return audio, dropped
+
+
+# ---- Voice activity ----
+def speech_segments(audio, rate=SAMPLE_RATE, frame_ms=FRAME_MS, min_speech_ms=MIN_SPEECH_MS,
+                    min_silence_ms=MIN_SILENCE_MS, pad_ms=PAD_MS):
+    """
+    [(start, end)] sample ranges holding speech. Frames louder than the
+    recording's own noise floor (10th percentile of frame energy) by
+    SPEECH_MARGIN_DB count as speech; pauses shorter than min_silence_ms are
+    bridged, blips shorter than min_speech_ms dropped, and each range padded.
+    """
+    frame = int(rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    if not n_frames:
+        return []
+    frames = np.asarray(audio[:n_frames * frame], dtype="float32").reshape(n_frames, frame)
+    db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    threshold = max(np.percentile(db, 10) + SPEECH_MARGIN_DB, SPEECH_MIN_DB)
+    active = np.flatnonzero(db > threshold)
+    if not len(active):
+        return []
+
+    gap = max(int(min_silence_ms / frame_ms), 1)
+    breaks = np.flatnonzero(np.diff(active) > gap)
+    starts = np.concatenate([[active[0]], active[breaks + 1]])
+    ends = np.concatenate([active[breaks], [active[-1]]]) + 1
+    pad = int(rate * pad_ms / 1000)
+    out = []
+    for s, e in zip(starts, ends):
+        if (e - s) * frame_ms < min_speech_ms:
+            continue
+        s, e = max(int(s) * frame - pad, 0), min(int(e) * frame + pad, len(audio))
+        if out and s <= out[-1][1]:
+            out[-1] = (out[-1][0], e)
+        else:
+            out.append((s, e))
+    return out
+
+
+def _split_long(segments, rate=SAMPLE_RATE, max_s=MAX_SEGMENT_S):
+    step = int(max_s * rate)
+    return [(s, min(s + step, e)) for seg_s, e in segments for s in range(seg_s, e, step)]
+
+
+# ---- Speech-to-text ----
+def _load_stt(name):
+    # Imported here so the app starts (and text answers work) without the STT model installed.
+    from faster_whisper import WhisperModel
+    return WhisperModel(name, device="cpu", compute_type=STT_COMPUTE_TYPE, cpu_threads=STT_THREADS)
+
+
+# Speech models are cached like embedding models: one per name per process.
+stt_models = embeddings.ModelRegistry(loader=_load_stt)
+
+
+def transcribe(audio, model_name=STT_MODEL, rate=SAMPLE_RATE, language="en"):
+    """
+    Transcript of 16 kHz mono audio: only VAD speech ranges are decoded.
+    Returns text plus audio / speech seconds, compute seconds and the
+    real-time factor (compute / audio duration; < 1 is faster than real time).
+    """
+    t0 = time.perf_counter()
+    audio = np.asarray(audio, dtype="float32")
+    segments = speech_segments(audio, rate)
+    texts = []
+    if segments:
+        model = stt_models.get(model_name)
+        for s, e in _split_long(segments, rate):
+            parts, _ = model.transcribe(audio[s:e], language=language, beam_size=1,
+                                        condition_on_previous_text=False, vad_filter=False)
+            texts.extend(p.text.strip() for p in parts)
+    compute = time.perf_counter() - t0
+    audio_s = len(audio) / rate
+    return {
+        "text": " ".join(t for t in texts if t),
+        "audio_s": audio_s,
+        "speech_s": sum(e - s for s, e in segments) / rate,
+        "segments": len(segments),
+        "compute_s": compute,
+        "rtf": compute / audio_s if audio_s else 0.0,
+    }
+
+
+class TranscriptionWorker:
+    """
+    Runs transcribe() jobs one at a time on a background thread. Decoding is
+    CPU-bound, so a single worker per process avoids sessions fighting over
+    cores, and neither the audio callback nor the caller runs the model.
+    """
+
+    def __init__(self, model_name=STT_MODEL):
+        self.model_name = model_name
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="stt-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio):
+        fut = Future()
+        self._queue.put((audio, fut))
+        return fut
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _loop(self):
+        while True:
+            audio, fut = self._queue.get()
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(transcribe(audio, self.model_name))
+            except Exception as e:
+                fut.set_exception(e)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = TranscriptionWorker()
+        return _worker
+
+
+# ---- Benchmark ----
+def read_wav(path):
+    """(float32 mono, sample rate) of a PCM .wav file."""
+    import wave
+
+    with wave.open(path, "rb") as w:
+        rate, channels, width = w.getframerate(), w.getnchannels(), w.getsampwidth()
+        raw = w.readframes(w.getnframes())
+    dtype = {1: "uint8", 2: "int16", 4: "int32"}[width]
+    samples = np.frombuffer(raw, dtype=dtype)
+    if width == 1:
+        samples = (samples.astype("int16") - 128).astype("int8")
+    return to_mono(samples, channels), rate
+
+
+def synthetic_speech(seconds, rate=48000, seed=0):
+    """Voiced bursts (harmonics of a drifting pitch) separated by quiet pauses, over faint noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    f0 = 120 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / rate
+    voiced = sum(np.sin(h * phase) / h for h in range(1, 8))
+    envelope = (np.sin(2 * np.pi * 0.4 * t) > -0.2).astype("float32")
+    return (0.2 * voiced * envelope + 0.003 * rng.standard_normal(len(t))).astype("float32"), rate
+
+
+def benchmark_capture(audio, rate, frame_ms=20):
+    """Per-frame cost and memory of the ring-buffer path vs appending samples to a Python list."""
+    frame = int(rate * frame_ms / 1000)
+    pcm = (np.clip(audio, -1, 1) * 32767).astype("int16")
+    frames = [pcm[i:i + frame] for i in range(0, len(pcm) - frame + 1, frame)]
+
+    rec = AnswerRecorder(max_seconds=len(audio) / rate + 1)
+    t0 = time.perf_counter()
+    for f in frames:
+        rec.push(f, rate)
+    ring_us = (time.perf_counter() - t0) * 1e6 / len(frames)
+
+    recorded = []
+    t0 = time.perf_counter()
+    for f in frames:
+        recorded.extend(f.astype("float32").tolist())
+    list_us = (time.perf_counter() - t0) * 1e6 / len(frames)
+    import sys
+    list_bytes = sys.getsizeof(recorded) + len(recorded) * sys.getsizeof(0.5)
+    return {"frames": len(frames), "ring_us_per_frame": ring_us, "list_us_per_frame": list_us,
+            "ring_mb": rec.ring.buf.nbytes / 1e6, "list_mb": list_bytes / 1e6,
+            "ring_seconds": rec.seconds, "audio": rec.take()[0]}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Capture cost, VAD and speech-to-text real-time factor on CPU.")
+    ap.add_argument("wav", nargs="?", help="PCM .wav of speech (synthetic voiced audio if omitted)")
+    ap.add_argument("--seconds", type=float, default=60.0, help="length of the synthetic audio")
+    ap.add_argument("--model", default=STT_MODEL)
+    ap.add_argument("--skip-stt", action="store_true", help="only measure capture and VAD")
+    args = ap.parse_args()
+
+    audio, rate = read_wav(args.wav) if args.wav else synthetic_speech(args.seconds)
+    cap = benchmark_capture(audio, rate)
+    print(f"{len(audio) / rate:.1f} s at {rate} Hz in {cap['frames']} frames of 20 ms")
+    print(f"capture: ring {cap['ring_us_per_frame']:.1f} us/frame, {cap['ring_mb']:.1f} MB preallocated "
+          f"({cap['ring_seconds']:.1f} s at {SAMPLE_RATE} Hz)")
+    print(f"         list {cap['list_us_per_frame']:.1f} us/frame, {cap['list_mb']:.1f} MB of boxed floats")
+    pcm16k = cap["audio"]
+    t0 = time.perf_counter()
+    segs = speech_segments(pcm16k)
+    print(f"vad: {len(segs)} segments, {sum(e - s for s, e in segs) / SAMPLE_RATE:.1f} s of speech "
+          f"({(time.perf_counter() - t0) * 1000:.1f} ms)")
+    if not args.skip_stt:
+        t0 = time.perf_counter()
+        stt_models.get(args.model)
+        print(f"stt: {args.model} ({STT_COMPUTE_TYPE}) loaded in {time.perf_counter() - t0:.1f} s")
+        r = get_worker().submit(pcm16k).result()
+        print(f"stt: {r['compute_s']:.2f} s for {r['audio_s']:.1f} s of audio, RTF {r['rtf']:.3f} "
+              f"({r['speech_s']:.1f} s speech decoded)")
+        print(f"text: {r['text'][:300]}")
@@ -0,0 +1,146 @@
+# startup_bench.py  cold-start benchmark: import cost per page (-X importtime) and first-render latency
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+
+ENTRY = "streamlit_app.py"
+PAGES = ["app.py", "app1.py", "app2.py", "app3.py", "app4.py", "app5.py", "Rag1.py"]
+# Modules worth knowing whether a page pulled in.
+HEAVY = ["pandas", "faiss", "torch", "sentence_transformers", "av", "aiortc", "streamlit_webrtc",
+         "faster_whisper", "sklearn", "pyarrow"]
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def module_imports(path):
+    """
+    Import statements a script always runs at module level: inside with/try
+    blocks too, but not under if/for/while or in function and class bodies.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    out = []
+
+    def walk(body):
+        for node in body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                out.append(ast.unparse(node))
+            elif isinstance(node, (ast.With, ast.Try)):
+                for field in ("body", "orelse", "finalbody", "handlers"):
+                    walk(getattr(node, field, None) or [])
+            elif isinstance(node, ast.ExceptHandler):
+                walk(node.body)
+    walk(tree.body)
+    return out
+
+
+MARK = "-- startup_bench --"
+
+
+def parse_importtime(stderr, top=6):
+    """
+    (total seconds, [(package, seconds)] largest first) from -X importtime
+    output: top-level imports after MARK, so interpreter startup is left out.
+    """
+    by_pkg = {}
+    lines = stderr.splitlines()
+    if MARK in lines:
+        lines = lines[lines.index(MARK) + 1:]
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line.split("|", 2)
+        if name.startswith("  ") or not cum.strip().isdigit():
+            continue   # nested import, or the header
+        pkg = name.strip().split(".")[0]
+        by_pkg[pkg] = by_pkg.get(pkg, 0.0) + int(cum) / 1e6
+    ranked = sorted(by_pkg.items(), key=lambda kv: -kv[1])
+    return sum(by_pkg.values()), ranked[:top]
+
+
+def _python(code, *args, importtime=False):
+    cmd = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", code, *args]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    return proc, time.perf_counter() - t0
+
+
+def import_cost(script, skip=("streamlit",)):
+    """Module-level imports of script, replayed in a fresh interpreter; streamlit itself is left out."""
+    stmts = [s for s in module_imports(os.path.join(ROOT, script))
+             if not any(s.split()[1].split(".")[0] == m for m in skip)]
+    code = f"import json, sys\nsys.stderr.write({MARK!r} + '\\n')\nmissing = []\n" + "".join(f"try:\n    {s}\nexcept ImportError as e:\n    missing.append(e.name)\n"
+                                      for s in stmts)
+    code += f"print(json.dumps([missing, [m for m in {HEAVY!r} if m in sys.modules]]))"
+    proc, wall = _python(code, importtime=True)
+    total, top = parse_importtime(proc.stderr)
+    missing, loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    missing = [m for m in missing if m.split(".")[0] not in skip]
+    return {"script": script, "import_s": total, "top": top, "wall_s": wall, "missing": missing, "loaded": loaded}
+
+
+_RENDER = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[3]))
+at.run()
+t2 = time.perf_counter()
+if sys.argv[2]:
+    at.switch_page(sys.argv[2])
+    at.run()
+t3 = time.perf_counter()
+heavy = json.loads(sys.argv[4])
+print(json.dumps({"streamlit_s": t1 - t0, "entry_s": t2 - t1, "page_s": t3 - t2,
+                  "errors": [str(e.value)[:120] for e in at.exception],
+                  "loaded": [m for m in heavy if m in sys.modules]}))
+"""
+
+
+def render_time(page=None, entry=ENTRY, timeout=120):
+    """
+    Cold start in a fresh interpreter: import streamlit, render the entry
+    point's default page, then (page given) switch to page and render it.
+    """
+    proc, wall = _python(_RENDER, entry, page or "", str(timeout), json.dumps(HEAVY))
+    try:
+        out = json.loads(proc.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {"page": page, "error": (proc.stderr.strip().splitlines() or ["no output"])[-1]}
+    return dict(out, page=page, process_s=wall)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Cold-start cost of the app: imports per page and first-render latency.")
+    ap.add_argument("--pages", nargs="*", default=PAGES)
+    ap.add_argument("--skip-render", action="store_true", help="only the import costs (no streamlit needed)")
+    args = ap.parse_args()
+
+    print("Module-level imports per page (fresh interpreter, streamlit excluded):")
+    for script in [ENTRY, *args.pages]:
+        r = import_cost(script)
+        top = ", ".join(f"{pkg} {s * 1000:.0f}" for pkg, s in r["top"])
+        missing = f"  [not installed: {', '.join(r['missing'])}]" if r["missing"] else ""
+        print(f"  {script:18s} {r['import_s'] * 1000:7.0f} ms  ({top or 'nothing'}), "
+              f"heavy: {', '.join(r['loaded']) or 'none'}{missing}")
+
+    if not args.skip_render:
+        print("First render (fresh interpreter per row):")
+        base = render_time()
+        if "error" in base:
+            sys.exit(f"  cannot render {ENTRY}: {base['error']}")
+        print(f"  cold start: import streamlit {base['streamlit_s'] * 1000:.0f} ms + "
+              f"{ENTRY} {base['entry_s'] * 1000:.0f} ms, process {base['process_s']:.2f} s, "
+              f"heavy modules loaded: {', '.join(base['loaded']) or 'none'}")
+        for page in args.pages:
+            r = render_time(page)
+            if "error" in r:
+                print(f"  {page:18s} failed: {r['error']}")
+                continue
+            errors = f"  [{r['errors'][0]}]" if r["errors"] else ""
+            print(f"  {page:18s} first render {r['page_s'] * 1000:7.0f} ms, "
+                  f"loaded: {', '.join(r['loaded']) or 'none'}{errors}")
@@ -0,0 +1,24 @@
+# streamlit_app.py  one entry point for every CareerCraft tool: `streamlit run streamlit_app.py`
+# Only streamlit is imported here. Each page imports its own heavy dependencies
+# (pandas, FAISS, sentence-transformers, WebRTC) on first use, so a process only
+# pays for the pages it actually serves, and all pages share the same process-wide
+# caches (LLM client and cache, embedding models, index and session stores).
+import streamlit as st
+
+PAGES = {
+    "Resume": [
+        st.Page("app.py", title="Resume Skill Analyzer", icon="🧠", default=True),
+        st.Page("app1.py", title="ATS, Jobs & Interview Prep", icon="💼", url_path="prototype"),
+        st.Page("app5.py", title="Bulk Resume Screening", icon="📂", url_path="bulk"),
+    ],
+    "Interview practice": [
+        st.Page("app2.py", title="AI Interview Prep", icon="🤖", url_path="prep"),
+        st.Page("app3.py", title="Interview Coach", icon="🎯", url_path="coach"),
+        st.Page("app4.py", title="Voice Interview Coach", icon="🎙", url_path="voice"),
+    ],
+    "Chat": [
+        st.Page("Rag1.py", title="RAG Chatbot", icon="💬", url_path="chat"),
+    ],
+}
+
+st.navigation(PAGES).run()
@@ -0,0 +1,215 @@
+# structured_output.py  JSON-mode LLM calls: tolerant extraction, schema validation, one repair retry, parse metrics
+import json
+import re
+import threading
+import time
+
+from groq_client import DEFAULT_MODEL
+
+JSON_MODE = {"response_format": {"type": "json_object"}}
+CATEGORIES = ("Technical", "Scenario", "Behavioral", "HR")
+REPAIR_PROMPT = ("Your previous reply could not be used: {error}. Reply again with only the corrected JSON "
+                 "object, no prose and no code fences.")
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class SchemaError(ValueError):
+    pass
+
+
+class StructuredOutputError(Exception):
+    """The reply (and its repair) could not be parsed and validated; raw holds the last reply."""
+
+    def __init__(self, message, name=None, raw=None):
+        super().__init__(message)
+        self.name = name
+        self.raw = raw
+
+
+# ---- Extraction ----
+def _completions(s):
+    """
+    Candidate JSON texts from s, which starts at '{' or '[': the first
+    complete value, or for a truncated reply the text with open strings and
+    brackets closed, then cut back to each of the last few commas.
+    """
+    stack, in_str, esc, commas = [], False, False, []
+    for i, ch in enumerate(s):
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return [s[:i + 1]]
+        elif ch == ",":
+            commas.append((i, tuple(stack)))
+    tries = [s.rstrip().rstrip(",") + ('"' if in_str else "") + "".join(reversed(stack))]
+    tries += [s[:i] + "".join(reversed(open_)) for i, open_ in reversed(commas[-5:])]
+    return tries
+
+
+def extract_json(text):
+    """
+    (value, strict): the JSON value in a model reply. strict is False when it
+    had to be dug out of code fences or prose, or completed after truncation.
+    Raises ValueError if nothing parses.
+    """
+    text = (text or "").strip()
+    try:
+        return json.loads(text), True
+    except ValueError:
+        pass
+    sources = [m.group(1) for m in _FENCE.finditer(text)] + [text]
+    for src in sources:
+        start = min((i for i in (src.find("{"), src.find("[")) if i >= 0), default=-1)
+        if start < 0:
+            continue
+        for cand in _completions(src[start:]):
+            try:
+                return json.loads(_TRAILING_COMMA.sub(r"\1", cand)), False
+            except ValueError:
+                continue
+    raise ValueError("no JSON object found in the reply")
+
+
+# ---- Schemas ----
+def _category(key):
+    norm = re.sub(r"[^a-z]", "", str(key).lower())
+    return next((c for c in CATEGORIES if norm.startswith(c.lower()[:5])), None)
+
+
+def validate_questions(obj, n_each=None):
+    """{category: [question, ...]} for every one of CATEGORIES; keys and item shapes are normalized."""
+    if isinstance(obj, dict) and isinstance(obj.get("questions"), dict):
+        obj = obj["questions"]
+    if not isinstance(obj, dict):
+        raise SchemaError("expected a JSON object keyed by category")
+    out = {}
+    for key, val in obj.items():
+        cat = _category(key)
+        if cat is None:
+            continue
+        items = [val] if isinstance(val, str) else val
+        if not isinstance(items, list):
+            raise SchemaError(f'"{key}" must be a list of questions')
+        for item in items:
+            if isinstance(item, dict):
+                item = item.get("question") or item.get("text")
+            if isinstance(item, str) and item.strip():
+                out.setdefault(cat, []).append(item.strip())
+    missing = [c for c in CATEGORIES if not out.get(c)]
+    if missing:
+        raise SchemaError(f"no questions for {', '.join(missing)}")
+    return {c: out[c][:n_each] if n_each else out[c] for c in CATEGORIES}
+
+
+def validate_evaluation(obj):
+    """{"score": int 1-5, "feedback": str}; accepts scores like "4", 4.0 or "4/5"."""
+    if not isinstance(obj, dict):
+        raise SchemaError("expected a JSON object with score and feedback")
+    score = obj.get("score", obj.get("rating"))
+    if isinstance(score, str):
+        m = re.match(r"\s*(\d+(?:\.\d+)?)", score)
+        score = float(m.group(1)) if m else None
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not 1 <= score <= 5:
+        raise SchemaError('"score" must be a number from 1 to 5')
+    feedback = obj.get("feedback")
+    if not isinstance(feedback, str) or not feedback.strip():
+        raise SchemaError('"feedback" must be a non-empty string')
+    return {"score": int(round(score)), "feedback": feedback.strip()}
+
+
+# ---- Metrics ----
+_lock = threading.Lock()
+_metrics = {}   # schema name -> counters
+
+
+def _count(name, **incs):
+    with _lock:
+        m = _metrics.setdefault(name, {"calls": 0, "cache_hits": 0, "strict": 0, "extracted": 0,
+                                       "repaired": 0, "failed": 0, "round_trips": 0, "seconds": 0.0})
+        for k, v in incs.items():
+            m[k] += v
+
+
+def stats():
+    """Per schema: counters plus the share of model replies usable without a repair round-trip."""
+    with _lock:
+        out = {name: dict(m) for name, m in _metrics.items()}
+    for m in out.values():
+        answered = m["calls"] - m["cache_hits"]
+        m["first_try_rate"] = (m["strict"] + m["extracted"]) / answered if answered else 0.0
+        m["round_trips_per_call"] = m["round_trips"] / answered if answered else 0.0
+    return out
+
+
+# ---- Calls ----
+def _parse(text, validate):
+    """(value, strict, error)."""
+    try:
+        obj, strict = extract_json(text)
+        return validate(obj), strict, None
+    except ValueError as e:   # SchemaError included
+        return None, False, e
+
+
+def structured_chat(client, prompt, validate, name="json", model=DEFAULT_MODEL, temperature=0.7,
+                    max_tokens=None, deadline=None, on_text=None):
+    """
+    validate(parsed JSON) for the reply to prompt, which should describe the
+    JSON wanted. The request uses JSON mode, except when on_text is given: then
+    the reply streams (text so far passed to on_text) and the tolerant
+    extractor does the work. A reply that still fails gets one repair
+    round-trip at temperature 0 with the error; after that
+    StructuredOutputError is raised. Only validated values are cached.
+    """
+    t0 = time.perf_counter()
+    messages = [{"role": "user", "content": prompt}]
+    cache = client.cache
+    _count(name, calls=1)
+    if cache is not None:
+        hit = cache.get(model, messages, temperature, max_tokens, schema=name)
+        if hit is not None:
+            value, _, err = _parse(hit, validate)
+            if err is None:
+                _count(name, cache_hits=1, seconds=time.perf_counter() - t0)
+                return value
+
+    if on_text is None:
+        raw = client.chat(messages, model, temperature, max_tokens, deadline, use_cache=False, **JSON_MODE)
+    else:
+        parts = []
+        for piece in client.stream_chat(messages, model, temperature, max_tokens, deadline, use_cache=False):
+            parts.append(piece)
+            on_text("".join(parts))
+        raw = "".join(parts)
+    value, strict, err = _parse(raw, validate)
+    rounds = 1
+    if err is None:
+        _count(name, **{"strict" if strict else "extracted": 1})
+    else:
+        repair = messages + [{"role": "assistant", "content": raw},
+                             {"role": "user", "content": REPAIR_PROMPT.format(error=err)}]
+        raw = client.chat(repair, model, 0, max_tokens, deadline, use_cache=False, **JSON_MODE)
+        rounds = 2
+        value, _, err = _parse(raw, validate)
+        _count(name, **{"repaired" if err is None else "failed": 1})
+    _count(name, round_trips=rounds, seconds=time.perf_counter() - t0)
+    if err is not None:
+        raise StructuredOutputError(f"unusable {name} reply after a repair attempt: {err}", name, raw)
+    if cache is not None:
+        cache.put(model, messages, temperature, max_tokens, json.dumps(value), schema=name)
+    return value
@@ -1,14 +1,12 @@
-from PyPDF2 import PdfReader
+import os
+
+# Local directory for persisted indexes, caches and stores shared by the apps.
+CACHE_DIR = os.getenv("CAREERCRAFT_CACHE_DIR", ".careercraft_cache")
 
 def extract_text_from_pdf(file):
     """Extracts all text from a PDF file"""
+    from pdf_extract import extract_text
     try:
-        reader = PdfReader(file)
-        text = ""
-        for page in reader.pages:
-            content = page.extract_text()
-            if content:
-                text += content + "\n"
-        return text.strip()
+        return extract_text(file)
     except Exception as e:
         return f"Error reading PDF: {str(e)}"
@@ -0,0 +1,228 @@
+# vector_index.py  FAISS index backends (flat / IVF-Flat / HNSW / IVF-PQ) and recall benchmark
+import argparse
+import math
+import time
+
+import numpy as np
+import faiss
+
+KINDS = ("flat", "ivf", "hnsw", "ivfpq")
+# How vectors are stored: full floats, or FAISS scalar quantization to 2 / 1 bytes per dimension.
+CODECS = ("fp32", "fp16", "sq8")
+_SQ_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+
+# Corpus sizes where "auto" switches backend.
+FLAT_MAX = 20_000
+IVF_MAX = 1_000_000
+
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+HNSW_M = 32
+TRAIN_POINTS_PER_LIST = 64
+# FAISS k-means wants ~39 points per centroid; IVF-PQ below this many uses a flat index instead.
+PQ_MIN_TRAIN = 39 * 2 ** 4
+
+
+def choose_kind(n):
+    if n <= FLAT_MAX:
+        return "flat"
+    if n <= IVF_MAX:
+        return "ivf"
+    return "ivfpq"
+
+
+def default_nlist(n):
+    # ~4*sqrt(n) lists, but never fewer than 39 training points per list.
+    return max(1, min(int(4 * math.sqrt(max(n, 1))), n // 39 or 1))
+
+
+def pq_subquantizers(dim):
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if dim % m == 0 and m <= dim // 4:
+            return m
+    return 1
+
+
+def train_sample(xs, nlist, seed=0):
+    n = min(len(xs), max(nlist * TRAIN_POINTS_PER_LIST, 10_000))
+    if n >= len(xs):
+        return np.ascontiguousarray(xs, dtype="float32")
+    rows = np.random.default_rng(seed).choice(len(xs), n, replace=False)
+    rows.sort()
+    return np.ascontiguousarray(xs[rows], dtype="float32")
+
+
+def make_index(kind, dim, train_vectors=None, codec="fp32"):
+    """
+    Empty index that accepts add_with_ids; IVF kinds and sq8 storage are trained
+    on a sample of train_vectors. Flat and HNSW sit behind IndexIDMap2, IVF
+    indexes hold IDs natively. codec fp16 / sq8 swaps the stored vectors for
+    scalar-quantized codes (IVF-PQ is already compressed and ignores it).
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec: {codec}")
+    qtype = _SQ_TYPES.get(codec)
+    if kind in ("flat", "hnsw"):
+        if kind == "flat":
+            base = faiss.IndexFlatL2(dim) if qtype is None else faiss.IndexScalarQuantizer(dim, qtype)
+        else:
+            base = faiss.IndexHNSWFlat(dim, HNSW_M) if qtype is None else faiss.IndexHNSWSQ(dim, qtype, HNSW_M)
+            base.hnsw.efConstruction = 80
+        if not base.is_trained:
+            if train_vectors is None or not len(train_vectors):
+                raise ValueError(f"{codec} storage needs training vectors")
+            base.train(train_sample(train_vectors, 1))
+        return faiss.IndexIDMap2(base)
+    if kind not in ("ivf", "ivfpq"):
+        raise ValueError(f"Unknown index kind: {kind}")
+    if train_vectors is None or not len(train_vectors):
+        raise ValueError(f"{kind} index needs training vectors")
+    if kind == "ivfpq" and len(train_vectors) < PQ_MIN_TRAIN:
+        # Too few points for even 4-bit PQ codebooks (training would fail);
+        # exact search is the better index at this size anyway.
+        return make_index("flat", dim, train_vectors, codec)
+
+    nlist = default_nlist(len(train_vectors))
+    quantizer = faiss.IndexFlatL2(dim)
+    if kind == "ivf":
+        index = (faiss.IndexIVFFlat(quantizer, dim, nlist) if qtype is None
+                 else faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype))
+    else:
+        nbits = 8 if len(train_vectors) >= 256 * 39 else 4
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_subquantizers(dim), nbits)
+    index.train(train_sample(train_vectors, nlist))
+    # Lets reconstruct() find vectors by ID so the index can be rebuilt later.
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def build_index(embs, kind="auto", ids=None, codec="fp32"):
+    embs = np.ascontiguousarray(embs, dtype="float32")
+    if kind == "auto":
+        kind = choose_kind(len(embs))
+    index = make_index(kind, embs.shape[1], embs, codec)
+    if ids is None:
+        ids = np.arange(len(embs), dtype="int64")
+    index.add_with_ids(embs, np.asarray(ids, dtype="int64"))
+    return index
+
+
+def index_kind(index):
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def set_search_params(index, nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH):
+    """Apply nprobe (IVF) or efSearch (HNSW); ignored by backends without them."""
+    kind = index_kind(index)
+    if kind in ("ivf", "ivfpq") and nprobe:
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = min(int(nprobe), ivf.nlist)
+    elif kind == "hnsw" and ef_search:
+        base = faiss.downcast_index(faiss.downcast_index(index).index)
+        base.hnsw.efSearch = int(ef_search)
+
+
+def search_params(index, nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH):
+    """
+    nprobe (IVF) or efSearch (HNSW) as per-call SearchParameters, or None.
+    Unlike set_search_params the index is left untouched, so sessions sharing
+    one index can each search it with their own settings.
+    """
+    kind = index_kind(index)
+    if kind in ("ivf", "ivfpq") and nprobe:
+        return faiss.SearchParametersIVF(nprobe=min(int(nprobe), faiss.extract_index_ivf(index).nlist))
+    if kind == "hnsw" and ef_search:
+        return faiss.SearchParametersHNSW(efSearch=int(ef_search))
+    return None
+
+
+def remove_ids(index, ids):
+    """Remove vectors by ID; raises RuntimeError for backends that can't delete (HNSW)."""
+    ids = np.ascontiguousarray(ids, dtype="int64")
+    return index.remove_ids(faiss.IDSelectorArray(len(ids), faiss.swig_ptr(ids)))
+
+
+def reconstruct(index, ids):
+    ids = np.ascontiguousarray(ids, dtype="int64")
+    return np.ascontiguousarray(index.reconstruct_batch(ids), dtype="float32")
+
+
+# ---- Benchmark ----
+def search_timed(index, xq, k):
+    t0 = time.perf_counter()
+    _, I = index.search(xq, k)
+    return I, (time.perf_counter() - t0) * 1000 / len(xq)
+
+
+def recall_at_k(truth, found):
+    k = truth.shape[1]
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / (len(truth) * k)
+
+
+def benchmark(xb, xq, k=10, kinds=KINDS, nprobes=(1, 4, 16, 64), ef_searches=(16, 64, 256)):
+    """Recall@k and ms/query of each backend and setting against the exact flat index."""
+    xb = np.ascontiguousarray(xb, dtype="float32")
+    xq = np.ascontiguousarray(xq, dtype="float32")
+    rows = []
+    t0 = time.perf_counter()
+    flat = build_index(xb, "flat")
+    flat_build = time.perf_counter() - t0
+    truth, flat_ms = search_timed(flat, xq, k)
+    rows.append({"kind": "flat", "param": "-", "build_s": flat_build, "ms_per_query": flat_ms,
+                 "recall": 1.0, "bytes": faiss.serialize_index(flat).nbytes})
+    for kind in kinds:
+        if kind == "flat":
+            continue
+        t0 = time.perf_counter()
+        index = build_index(xb, kind)
+        build_s = time.perf_counter() - t0
+        nbytes = faiss.serialize_index(index).nbytes
+        settings = [("efSearch", e) for e in ef_searches] if kind == "hnsw" else [("nprobe", p) for p in nprobes]
+        for name, value in settings:
+            set_search_params(index, nprobe=value if name == "nprobe" else None,
+                              ef_search=value if name == "efSearch" else None)
+            found, ms = search_timed(index, xq, k)
+            rows.append({"kind": kind, "param": f"{name}={value}", "build_s": build_s,
+                         "ms_per_query": ms, "recall": recall_at_k(truth, found), "bytes": nbytes})
+    return rows
+
+
+def print_rows(rows):
+    print(f"{'kind':<7}{'param':<14}{'build s':>9}{'ms/query':>10}{'recall':>8}{'MB':>9}")
+    for r in rows:
+        print(f"{r['kind']:<7}{r['param']:<14}{r['build_s']:>9.2f}{r['ms_per_query']:>10.3f}"
+              f"{r['recall']:>8.3f}{r['bytes'] / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Recall vs latency of FAISS backends against flat search.")
+    ap.add_argument("--embs", help=".npy file of corpus embeddings (random vectors if omitted)")
+    ap.add_argument("--n", type=int, default=100_000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--kinds", default=",".join(KINDS))
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.embs:
+        xs = np.load(args.embs, mmap_mode="r")
+        rows = rng.choice(len(xs), min(args.queries, len(xs)), replace=False)
+        xq = np.asarray(xs[rows], dtype="float32") + rng.normal(0, 0.01, (len(rows), xs.shape[1])).astype("float32")
+        xb = xs
+    else:
+        # Clustered random data behaves more like real embeddings than uniform noise.
+        centers = rng.normal(size=(max(args.n // 1000, 1), args.dim)).astype("float32")
+        xb = centers[rng.integers(len(centers), size=args.n)] + rng.normal(0, 0.3, (args.n, args.dim)).astype("float32")
+        xq = centers[rng.integers(len(centers), size=args.queries)] + rng.normal(0, 0.3, (args.queries, args.dim)).astype("float32")
+    print_rows(benchmark(xb, xq, args.k, kinds=args.kinds.split(",")))
@@ -1,4 +1,13 @@
 # web_scraper.py  all skill set
+import os
+
+from job_ingest import get_trending
+from skill_taxonomy import get_taxonomy
+
+# Skills shown and scored per domain, heaviest first; large taxonomies list hundreds per domain.
+SKILLS_PER_DOMAIN = int(os.getenv("SKILLS_PER_DOMAIN", "25"))
+
+# Built-in fallback when no taxonomy file is available.
 domain_skill_map = {
     "Data Science": ["Python", "Pandas", "NumPy", "Scikit-learn", "Matplotlib", "SQL", "Jupyter"],
     "Web Development": ["HTML", "CSS", "JavaScript", "React", "Node.js", "Bootstrap", "Git"],
@@ -8,5 +17,29 @@ domain_skill_map = {
     "Software Engineering": ["OOP", "Data Structures", "Algorithms", "Git", "C++", "Java"]
 }
 
-def get_latest_skills(domain):
+
+def get_domains():
+    tax = get_taxonomy()
+    return tax.domains() if tax and tax.by_domain else sorted(domain_skill_map)
+
+
+def get_latest_skills(domain, limit=SKILLS_PER_DOMAIN):
+    # Skills ranked from ingested job postings (python job_ingest.py <dump>), then the taxonomy.
+    trending = get_trending(domain)
+    if trending:
+        return list(trending[:limit])
+    tax = get_taxonomy()
+    if tax is not None and domain in tax.by_domain:
+        return list(tax.domain_skills(domain, limit))
     return domain_skill_map.get(domain, [])
+
+
+def get_skill_aliases(skills):
+    """alias -> canonical skill for the given skills, for skill_matcher.get_matcher."""
+    tax = get_taxonomy()
+    return tax.aliases_for(skills) if tax is not None else {}
+
+
+def taxonomy_version():
+    tax = get_taxonomy()
+    return tax.version if tax is not None else "builtin"